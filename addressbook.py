@@ -1,965 +1,2034 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
-import csv
-import os
-import tempfile
-import webbrowser
-
-# --- Data folder and files ---
-DATA_FOLDER = "data"
-if not os.path.exists(DATA_FOLDER):
-    os.makedirs(DATA_FOLDER)
-
-USER_FILE = os.path.join(DATA_FOLDER, "users.csv")
-ADDRESS_FILE = os.path.join(DATA_FOLDER, "address_book.csv")
-RECYCLE_FILE = os.path.join(DATA_FOLDER, "recycle_bin.csv")
-
-USER_FIELDS = ["Username", "Email", "Mobile", "Password"]
-ADDRESS_FIELDS = [
-    "Name", "Phone", "Email", "Address", "City",
-    "State", "Pincode", "Country", "Type"
-]
-
-# --- Indian States ---
-INDIAN_STATES = [
-    "Andhra Pradesh", "Arunachal Pradesh", "Assam", "Bihar", "Chhattisgarh",
-    "Goa", "Gujarat", "Haryana", "Himachal Pradesh", "Jharkhand",
-    "Karnataka", "Kerala", "Madhya Pradesh", "Maharashtra", "Manipur",
-    "Meghalaya", "Mizoram", "Nagaland", "Odisha", "Punjab", "Rajasthan",
-    "Sikkim", "Tamil Nadu", "Telangana", "Tripura", "Uttar Pradesh",
-    "Uttarakhand", "West Bengal", "Andaman and Nicobar Islands",
-    "Chandigarh", "Dadra and Nagar Haveli and Daman and Diu", "Delhi",
-    "Jammu & Kashmir", "Ladakh", "Lakshadweep", "Puducherry"
-]
-
-# --- Countries ---
-COUNTRIES = [
-    # List shortened for brevity; expand as needed
-    "Afghanistan","Albania","Algeria","Andorra","Angola","Argentina","Armenia","Australia","Austria","Azerbaijan",
-    "Bahamas","Bahrain","Bangladesh","Barbados","Belarus","Belgium","Belize","Bhutan","Bolivia","Bosnia and Herzegovina",
-    "Brazil","Brunei","Bulgaria","Burkina Faso","Burundi","Cambodia","Cameroon","Canada","Cape Verde","Central African Republic",
-    "Chad","Chile","China","Colombia","Comoros","Congo (Brazzaville)","Congo (Kinshasa)","Costa Rica","Croatia","Cuba",
-    "Cyprus","Czech Republic","Denmark","Djibouti","Dominica","Dominican Republic","East Timor","Ecuador","Egypt","El Salvador",
-    "Equatorial Guinea","Eritrea","Estonia","Ethiopia","Fiji","Finland","France","Gabon","Gambia","Georgia","Germany","Ghana",
-    "Greece","Grenada","Guatemala","Guinea","Guinea-Bissau","Guyana","Haiti","Honduras","Hungary","Iceland","India","Indonesia",
-    "Iran","Iraq","Ireland","Israel","Italy","Jamaica","Japan","Jordan","Kazakhstan","Kenya","Kiribati","Korea, North","Korea, South",
-    "Kuwait","Kyrgyzstan","Laos","Latvia","Lebanon","Lesotho","Liberia","Libya","Liechtenstein","Lithuania","Luxembourg","Madagascar",
-    "Malawi","Malaysia","Maldives","Mali","Malta","Marshall Islands","Mauritania","Mauritius","Mexico","Micronesia","Moldova",
-    "Monaco","Montenegro","Morocco","Mozambique","Myanmar","Namibia","Nauru","Nepal","Netherlands","New Zealand","Nicaragua",
-    "Niger","Nigeria","Norway","Oman","Pakistan","Palau","Panama","Papua New Guinea","Paraguay","Peru","Philippines","Poland",
-    "Portugal","Qatar","Romania","Russia","Rwanda","Saint Kitts and Nevis","Saint Lucia","Saint Vincent and the Grenadines","Samoa",
-    "San Marino","Sao Tome and Principe","Saudi Arabia","Senegal","Serbia","Seychelles","Sierra Leone","Singapore","Slovakia",
-    "Slovenia","Solomon Islands","Somalia","South Africa","Spain","Sri Lanka","Sudan","Suriname","Swaziland","Sweden","Switzerland",
-    "Syria","Taiwan","Tajikistan","Tanzania","Thailand","Togo","Tonga","Trinidad and Tobago","Tunisia","Turkey","Turkmenistan",
-    "Tuvalu","Uganda","Ukraine","United Arab Emirates","United Kingdom","United States","Uruguay","Uzbekistan","Vanuatu",
-    "Vatican City","Venezuela","Vietnam","Yemen","Zambia","Zimbabwe"
-]
-
-# --- Styles ---
-ENTRY_BG = "#f0f4f8"
-PRIMARY_COLOR = "#1976D2"
-SECONDARY_COLOR = "#42A5F5"
-DANGER_COLOR = "#E53935"
-SUCCESS_COLOR = "#388E3C"
-RECYCLE_BG = "#ffe9cc"
-FONT_TITLE = ('Segoe UI', 11, 'bold')
-FONT_LABEL = ('Segoe UI', 10)
-FONT_BTN = ('Segoe UI', 10, 'bold')
-FONT_HEADER = ('Segoe UI', 16, 'bold')
-
-
-# --- Utility functions ---
-
-def read_csv(filename):
-    if os.path.exists(filename):
-        with open(filename, newline='', encoding='utf-8') as f:
-            return list(csv.DictReader(f))
-    return []
-
-
-def write_csv(filename, data, fields):
-    with open(filename, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fields)
-        writer.writeheader()
-        writer.writerows(data)
-
-
-def show_print(entries):
-    if not entries:
-        messagebox.showinfo("No Entries", "No entries to print.")
-        return
-
-    html = "<html><body><h2>Address Book - Print Preview</h2>"
-    for entry in entries:
-        html += "<div style='border:1px solid #ccc; margin:10px; padding:10px;'>"
-        for k in ADDRESS_FIELDS:
-            html += f"<b>{k}:</b> {entry[k]}<br>"
-        html += "</div>"
-    html += "<script>window.print();</script></body></html>"
-
-    with tempfile.NamedTemporaryFile('w', delete=False, suffix=".html", encoding='utf-8') as f:
-        f.write(html)
-        webbrowser.open(f.name)
-
-
-class AddressBookApp:
-    def __init__(self, root):
-        self.root = root
-
-        self.user = None
-        self.user_info = None
-
-        self.widgets = {}
-        self.tab_widgets = []
-        self.entries_frame = None
-        self.recycle_window = None
-
-        self.setup_styles()
-        self.setup_ui()
-
-    def setup_styles(self):
-        style = ttk.Style()
-        style.theme_use('clam')
-        style.configure(
-            "TCombobox",
-            fieldbackground=ENTRY_BG,
-            background="white",
-            relief='flat',
-            padding=5,
-            font=FONT_LABEL,
-        )
-        style.configure(
-            "Accent.TButton",
-            background=PRIMARY_COLOR,
-            foreground="white",
-            font=FONT_BTN,
-        )
-        style.map("Accent.TButton", background=[('active', SECONDARY_COLOR)])
-
-    def setup_ui(self):
-        topbar = tk.Frame(self.root, bg="#e3f4fd", height=48)
-        topbar.pack(side='top', fill='x')
-
-        self.auth_btn = tk.Menubutton(
-            topbar,
-            text="Login/Sign-up",
-            bg=PRIMARY_COLOR,
-            fg='white',
-            font=FONT_BTN,
-            relief='flat',
-            activebackground=SECONDARY_COLOR,
-            activeforeground='white'
-        )
-        self.auth_btn.menu = tk.Menu(self.auth_btn, font=FONT_LABEL, tearoff=0)
-        self.auth_btn['menu'] = self.auth_btn.menu
-        self.auth_btn.menu.add_command(label="Login/Sign-up", command=self.show_login_signup)
-        self.auth_btn.pack(side='right', padx=10, pady=5)
-
-        self.topbar = topbar
-
-        self.main_frame = tk.Frame(self.root, bg="white")
-        self.main_frame.pack(fill='both', expand=True, padx=20, pady=15)
-
-        # Start with login/signup view
-        self.show_login_signup()
-
-    def clear_main(self):
-        for w in self.main_frame.winfo_children():
-            w.destroy()
-
-    # --- Authentication --- #
-    def show_login_signup(self):
-        self.clear_main()
-
-        frame = tk.Frame(self.main_frame, bg="white")
-        frame.pack(expand=True)
-        content = tk.Frame(frame, bg="white", padx=150, pady=40)
-        content.pack(expand=True)
-
-        label_header = tk.Label(
-            content,
-            text="Welcome! Please Login or Sign-up to use your Secure Address Book",
-            font=FONT_HEADER,
-            fg=PRIMARY_COLOR,
-            bg="white",
-            wraplength=450,
-            justify='center'
-        )
-        label_header.pack(pady=(0, 30))
-
-        tabs = ttk.Notebook(content)
-        tabs.pack(expand=True, fill='both')
-
-        self._build_login_tab(tabs)
-        self._build_signup_tab(tabs)
-        self._build_forgot_tab(tabs)
-
-    def _build_login_tab(self, notebook):
-        login_tab = tk.Frame(notebook, bg='white', padx=20, pady=20)
-        notebook.add(login_tab, text="Login")
-
-        labels = ["Username", "Password"]
-        self.login_entries = {}
-
-        for idx, label in enumerate(labels):
-            tk.Label(login_tab, text=label+":", font=FONT_LABEL, bg='white').grid(row=idx, column=0, pady=8, sticky='w')
-            ent = tk.Entry(login_tab, font=FONT_LABEL, width=32, bg=ENTRY_BG, relief='solid', bd=1)
-            if label == "Password":
-                ent.config(show="*")
-            ent.grid(row=idx, column=1, pady=8)
-            self.login_entries[label] = ent
-
-        login_btn = tk.Button(
-            login_tab,
-            text="Login",
-            font=FONT_BTN,
-            bg=SUCCESS_COLOR,
-            fg='white',
-            padx=25,
-            pady=10,
-            relief='flat',
-            command=self.login
-        )
-        login_btn.grid(row=len(labels), column=0, columnspan=2, pady=20, sticky='ew')
-
-    def _build_signup_tab(self, notebook):
-        signup_tab = tk.Frame(notebook, bg='white', padx=20, pady=20)
-        notebook.add(signup_tab, text="Sign-up")
-
-        labels = ["Username", "Email", "Mobile", "Password"]
-        self.signup_entries = {}
-
-        for idx, label in enumerate(labels):
-            tk.Label(signup_tab, text=label+":", font=FONT_LABEL, bg='white').grid(row=idx, column=0, pady=8, sticky='w')
-            ent = tk.Entry(signup_tab, font=FONT_LABEL, width=32, bg=ENTRY_BG, relief='solid', bd=1)
-            if label == "Password":
-                ent.config(show="*")
-            ent.grid(row=idx, column=1, pady=8)
-            self.signup_entries[label] = ent
-
-        signup_btn = tk.Button(
-            signup_tab,
-            text="Sign-up",
-            font=FONT_BTN,
-            bg=SUCCESS_COLOR,
-            fg='white',
-            relief='flat',
-            command=self.signup
-        )
-        signup_btn.grid(row=len(labels), column=0, columnspan=2, pady=20, sticky='ew')
-
-    def _build_forgot_tab(self, notebook):
-        forgot_tab = tk.Frame(notebook, bg='white', padx=20, pady=20)
-        notebook.add(forgot_tab, text="Forgot Password")
-
-        tk.Label(forgot_tab, text="Username:", font=FONT_LABEL, bg='white').grid(row=0, column=0, pady=8, sticky='w')
-        self.forgot_username = tk.Entry(forgot_tab, font=FONT_LABEL, width=32, bg=ENTRY_BG, relief='solid', bd=1)
-        self.forgot_username.grid(row=0, column=1, pady=8)
-
-        self.forgot_verify_btn = tk.Button(
-            forgot_tab,
-            text="Verify",
-            font=FONT_BTN,
-            bg=PRIMARY_COLOR,
-            fg='white',
-            relief='flat',
-            command=self.forgot_verify
-        )
-        self.forgot_verify_btn.grid(row=1, column=0, columnspan=2, pady=12, sticky='ew')
-
-        self.forgot_newpw_lbl = tk.Label(forgot_tab, text="New Password:", font=FONT_LABEL, bg='white')
-        self.forgot_newpw_entry = tk.Entry(forgot_tab, font=FONT_LABEL, width=32, bg=ENTRY_BG, relief='solid', bd=1, show='*')
-
-        self.forgot_confpw_lbl = tk.Label(forgot_tab, text="Confirm Password:", font=FONT_LABEL, bg='white')
-        self.forgot_confpw_entry = tk.Entry(forgot_tab, font=FONT_LABEL, width=32, bg=ENTRY_BG, relief='solid', bd=1, show='*')
-
-        self.forgot_update_btn = tk.Button(
-            forgot_tab,
-            text="Update Password",
-            font=FONT_BTN,
-            bg=SUCCESS_COLOR,
-            fg='white',
-            relief='flat',
-            command=self.forgot_update
-        )
-
-        for widget in (self.forgot_newpw_lbl,
-                       self.forgot_newpw_entry,
-                       self.forgot_confpw_lbl,
-                       self.forgot_confpw_entry,
-                       self.forgot_update_btn):
-            widget.grid_remove()
-
-    def login(self):
-        username = self.login_entries["Username"].get().strip()
-        password = self.login_entries["Password"].get()
-        if not username or not password:
-            messagebox.showerror("Error", "All fields are required.", parent=self.root)
-            return
-
-        users = read_csv(USER_FILE)
-        user = next((u for u in users if u["Username"].lower() == username.lower() and u["Password"] == password), None)
-
-        if user:
-            self.user = user["Username"]
-            self.user_info = user
-            self.auth_btn.config(text=self.user)
-            self.auth_btn.menu.delete(0, 'end')
-            self.auth_btn.menu.add_command(label="Profile", command=self.show_profile)
-            self.auth_btn.menu.add_command(label="Logout", command=self.logout)
-            self.auth_btn.menu.add_command(label="Delete Account", command=self.delete_account)
-            messagebox.showinfo("Success", f"Welcome, {self.user}!", parent=self.root)
-            self.show_address_book()
-        else:
-            messagebox.showerror("Failed", "Invalid username or password.", parent=self.root)
-
-    def signup(self):
-        data = {k: v.get().strip() for k, v in self.signup_entries.items()}
-        if not all(data.values()):
-            messagebox.showerror("Error", "All fields are required.", parent=self.root)
-            return
-
-        users = read_csv(USER_FILE)
-        if any(u["Username"].lower() == data["Username"].lower() for u in users):
-            messagebox.showerror("Error", "Username already exists.", parent=self.root)
-            return
-        if any(u["Email"].lower() == data["Email"].lower() for u in users):
-            messagebox.showerror("Error", "Email already registered.", parent=self.root)
-            return
-        if any(u["Mobile"] == data["Mobile"] for u in users):
-            messagebox.showerror("Error", "Mobile number already registered.", parent=self.root)
-            return
-
-        users.append(data)
-        write_csv(USER_FILE, users, USER_FIELDS)
-
-        messagebox.showinfo("Success", "Account created! Logged in automatically.", parent=self.root)
-
-        self.user = data["Username"]
-        self.user_info = data
-        self.auth_btn.config(text=self.user)
-        self.auth_btn.menu.delete(0, 'end')
-        self.auth_btn.menu.add_command(label="Profile", command=self.show_profile)
-        self.auth_btn.menu.add_command(label="Logout", command=self.logout)
-        self.auth_btn.menu.add_command(label="Delete Account", command=self.delete_account)
-
-        self.show_address_book()
-
-    def forgot_verify(self):
-        username = self.forgot_username.get().strip()
-        if not username:
-            messagebox.showerror("Error", "Please enter your username.", parent=self.root)
-            return
-        users = read_csv(USER_FILE)
-        self.forgot_user = next((u for u in users if u["Username"].lower() == username.lower()), None)
-        if self.forgot_user:
-            self.forgot_verify_btn['state'] = 'disabled'
-            self.forgot_username['state'] = 'readonly'
-            self.forgot_newpw_lbl.grid(row=2, column=0, pady=8, sticky='w')
-            self.forgot_newpw_entry.grid(row=2, column=1, pady=8)
-            self.forgot_confpw_lbl.grid(row=3, column=0, pady=8, sticky='w')
-            self.forgot_confpw_entry.grid(row=3, column=1, pady=8)
-            self.forgot_update_btn.grid(row=4, column=0, columnspan=2, pady=15, sticky='ew')
-        else:
-            messagebox.showerror("Error", "Username not found.", parent=self.root)
-
-    def forgot_update(self):
-        new_pw = self.forgot_newpw_entry.get()
-        conf_pw = self.forgot_confpw_entry.get()
-        if not new_pw or not conf_pw:
-            messagebox.showerror("Error", "Both password fields are required.", parent=self.root)
-            return
-        if new_pw != conf_pw:
-            messagebox.showerror("Error", "Passwords do not match.", parent=self.root)
-            return
-
-        users = read_csv(USER_FILE)
-        for idx, u in enumerate(users):
-            if u["Username"].lower() == self.forgot_user["Username"].lower():
-                users[idx]["Password"] = new_pw
-                write_csv(USER_FILE, users, USER_FIELDS)
-                messagebox.showinfo("Success", "Password changed successfully.", parent=self.root)
-                self.show_login_signup()
-                break
-
-    def logout(self):
-        self.user = None
-        self.user_info = None
-        self.auth_btn.config(text="Login/Sign-up")
-        self.auth_btn.menu.delete(0, 'end')
-        self.auth_btn.menu.add_command(label="Login/Sign-up", command=self.show_login_signup)
-        self.show_login_signup()
-
-    def delete_account(self):
-        if messagebox.askyesno("Confirm", "Delete your account? This cannot be undone.", parent=self.root):
-            users = read_csv(USER_FILE)
-            users = [u for u in users if u["Username"].lower() != self.user.lower()]
-            write_csv(USER_FILE, users, USER_FIELDS)
-            messagebox.showinfo("Deleted", "Your account was deleted.", parent=self.root)
-            self.logout()
-
-    def show_profile(self):
-        profile_win = tk.Toplevel(self.root)
-        profile_win.title("Profile")
-        profile_win.geometry("440x470")
-        profile_win.configure(bg='white')
-
-        fields = ["Username", "Email", "Mobile", "Old Password", "New Password"]
-        entries = {}
-
-        for i, field in enumerate(fields):
-            tk.Label(profile_win, text=field + ':', font=FONT_LABEL, bg='white').grid(row=i, column=0, padx=15, pady=10, sticky='w')
-            ent = tk.Entry(profile_win, font=FONT_LABEL, width=32, bg=ENTRY_BG, relief='solid', bd=1)
-            if 'Password' in field:
-                ent.config(show='*')
-            if self.user_info and field in self.user_info and "Password" not in field:
-                ent.insert(0, self.user_info[field])
-            ent.grid(row=i, column=1, padx=15, pady=10)
-            entries[field] = ent
-
-        def save_profile():
-            uname = entries["Username"].get().strip()
-            email = entries["Email"].get().strip()
-            mobile = entries["Mobile"].get().strip()
-            old_pw = entries["Old Password"].get()
-            new_pw = entries["New Password"].get()
-
-            if not uname or not email or not mobile:
-                messagebox.showerror("Error", "Username, Email, and Mobile are required.", parent=profile_win)
-                return
-            users = read_csv(USER_FILE)
-            idx = next((i for i,u in enumerate(users) if u["Username"].lower() == self.user.lower()), None)
-            if idx is None:
-                messagebox.showerror("Error", "User not found.", parent=profile_win)
-                return
-
-            for i, u in enumerate(users):
-                if i != idx:
-                    if u["Username"].lower() == uname.lower():
-                        messagebox.showerror("Error", "Username already taken.", parent=profile_win)
-                        return
-                    if u["Email"].lower() == email.lower():
-                        messagebox.showerror("Error", "Email already taken.", parent=profile_win)
-                        return
-                    if u["Mobile"] == mobile:
-                        messagebox.showerror("Error", "Mobile number already taken.", parent=profile_win)
-                        return
-
-            if new_pw:
-                if not old_pw:
-                    messagebox.showerror("Error", "Please provide your current password to set a new password.", parent=profile_win)
-                    return
-                if users[idx]["Password"] != old_pw:
-                    messagebox.showerror("Error", "Current password is incorrect.", parent=profile_win)
-                    return
-                users[idx]["Password"] = new_pw
-
-            users[idx]["Username"] = uname
-            users[idx]["Email"] = email
-            users[idx]["Mobile"] = mobile
-
-            write_csv(USER_FILE, users, USER_FIELDS)
-
-            self.user = uname
-            self.user_info = users[idx]
-
-            self.auth_btn.config(text=self.user)
-            messagebox.showinfo("Success", "Profile updated.", parent=profile_win)
-            profile_win.destroy()
-
-        save_btn = tk.Button(profile_win, text="Update", font=FONT_BTN, bg=PRIMARY_COLOR, fg='white', relief='flat', command=save_profile)
-        save_btn.grid(row=len(fields), column=0, columnspan=2, pady=20, padx=12, sticky='ew')
-
-    # --- Address Book ---
-
-    def show_address_book(self):
-        self.clear_main()
-
-        top_bar_frame = tk.Frame(self.main_frame, bg='white')
-        top_bar_frame.pack(fill='x')
-
-        btn_recycle = tk.Button(top_bar_frame,
-                                text="Recycle Bin",
-                                bg='#FFA726', fg='white', font=FONT_BTN,
-                                relief='flat', command=self.open_recycle_bin)
-        btn_recycle.pack(side='right', padx=6, pady=6)
-
-        btn_print = tk.Button(top_bar_frame,
-                              text="Print All",
-                              bg='#7E57C2', fg='white', font=FONT_BTN,
-                              relief='flat', command=lambda: show_print(read_csv(ADDRESS_FILE)))
-        btn_print.pack(side='right', padx=6, pady=6)
-
-        btn_delete_all = tk.Button(top_bar_frame,
-                                   text="Delete All",
-                                   bg='#789C9C', fg='white', font=FONT_BTN,
-                                   relief='flat', command=self.delete_all_entries)
-        btn_delete_all.pack(side='right', padx=6, pady=6)
-
-        btn_exit = tk.Button(top_bar_frame,
-                             text="Exit",
-                             bg=DANGER_COLOR, fg='white', font=FONT_BTN,
-                             relief='flat', command=self.root.quit)
-        btn_exit.pack(side='right', padx=6, pady=6)
-
-        container = tk.Frame(self.main_frame, bg="white")
-        container.pack(fill='both', expand=True, pady=(10, 0))
-
-        container.columnconfigure(0, weight=1)
-        container.columnconfigure(1, weight=3)
-
-        self.build_form(container)
-        self.build_address_list(container)
-
-    def build_form(self, parent):
-        form_frame = tk.LabelFrame(parent, text="Add New Entry",
-                                   bg='white',
-                                   font=FONT_TITLE,
-                                   relief='groove')
-        form_frame.grid(row=0, column=0, sticky='nsew', padx=10, pady=10)
-        form_frame.columnconfigure(1, weight=1)
-
-        self.widgets.clear()
-        self.tab_widgets.clear()
-
-        for i, field in enumerate(ADDRESS_FIELDS):
-            lbl = tk.Label(form_frame, text=field + ":",
-                           font=FONT_LABEL,
-                           bg='white')
-            lbl.grid(row=i, column=0, sticky='w', padx=10, pady=6)
-            widget = self.make_widget_for_field(form_frame, field)
-            widget.grid(row=i, column=1, sticky='ew', padx=10, pady=2)
-            self.widgets[field] = widget
-            self.tab_widgets.append(widget)
-
-        save_btn = tk.Button(form_frame,
-                             text="Save Entry",
-                             font=FONT_BTN,
-                             bg=SECONDARY_COLOR,
-                             fg='white',
-                             relief='flat',
-                             command=self.save_entry)
-        save_btn.grid(row=len(ADDRESS_FIELDS), column=0,
-                      columnspan=2,
-                      pady=16,
-                      padx=10,
-                      sticky='ew')
-
-        # Navigation keys for form
-        for idx, widget in enumerate(self.tab_widgets):
-            def handler(event, index=idx):
-                self.focus_next_field(index)
-                return "break"
-            if isinstance(widget, tk.Text):
-                widget.bind("<Control-Return>", handler)
-                widget.bind("<Shift-Return>", handler)
-                widget.bind("<Return>", lambda e: None)
-            else:
-                widget.bind("<Return>", handler)
-
-    def make_widget_for_field(self, parent, field):
-        if field == "Address":
-            text = tk.Text(parent, height=3, width=28,
-                           font=FONT_LABEL,
-                           bg=ENTRY_BG,
-                           relief='flat',
-                           highlightthickness=1,
-                           highlightbackground='#c0c0c0')
-            return text
-        elif field == "State":
-            combo = ttk.Combobox(parent,
-                                 values=INDIAN_STATES,
-                                 width=25,
-                                 font=FONT_LABEL)
-            combo.set("Delhi")
-            return combo
-        elif field == "Country":
-            combo = ttk.Combobox(parent,
-                                 values=COUNTRIES,
-                                 width=25,
-                                 font=FONT_LABEL)
-            combo.set("India")
-            return combo
-        elif field == "Type":
-            combo = ttk.Combobox(parent,
-                                 values=["Personal", "Business"],
-                                 width=25,
-                                 font=FONT_LABEL)
-            combo.set("Personal")
-            return combo
-        else:
-            ent = tk.Entry(parent,
-                           width=30,
-                           font=FONT_LABEL,
-                           bg=ENTRY_BG,
-                           relief='flat',
-                           highlightthickness=1,
-                           highlightbackground='#c0c0c0')
-            return ent
-
-    def focus_next_field(self, idx):
-        next_idx = (idx + 1) % len(self.tab_widgets)
-        w = self.tab_widgets[next_idx]
-        w.focus_set()
-        if isinstance(w, tk.Text):
-            w.mark_set("insert", "end")
-
-    def build_address_list(self, parent):
-        right_frame = tk.Frame(parent, bg='white')
-        right_frame.grid(row=0, column=1, sticky='nsew', padx=10)
-        right_frame.columnconfigure(0, weight=1)
-        right_frame.rowconfigure(0, weight=1)
-
-        canvas = tk.Canvas(right_frame,
-                           bg='white',
-                           highlightthickness=0)
-        vscroll = ttk.Scrollbar(right_frame,
-                                orient='vertical',
-                                command=canvas.yview)
-
-        self.entries_frame = tk.Frame(canvas, bg='white')
-
-        self.entries_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(
-                scrollregion=canvas.bbox("all")
-            )
-        )
-
-        canvas.create_window((0, 0), window=self.entries_frame, anchor="nw")
-
-        canvas.configure(yscrollcommand=vscroll.set)
-
-        canvas.grid(row=0, column=0, sticky="nsew")
-        vscroll.grid(row=0, column=1, sticky="ns")
-
-        self.refresh_entries()
-
-    def refresh_entries(self):
-        for w in self.entries_frame.winfo_children():
-            w.destroy()
-
-        addresses = read_csv(ADDRESS_FILE)
-
-        for idx, entry in enumerate(addresses):
-            self.render_entry(entry, idx)
-
-    def render_entry(self, entry, idx):
-        fr = tk.Frame(self.entries_frame,
-                      bg="#e6f2ff",
-                      bd=1,
-                      relief='ridge')
-        fr.pack(fill='x', pady=4)
-
-        text = '\n'.join(f"{k}: {entry[k]}" for k in ADDRESS_FIELDS)
-        lbl = tk.Label(fr,
-                       text=text,
-                       font=FONT_LABEL,
-                       bg="#e6f2ff",
-                       justify='left')
-        lbl.pack(side='left', padx=8, pady=8, fill='x', expand=True)
-
-        btn_frame = tk.Frame(fr, bg="#e6f2ff")
-        btn_frame.pack(side="right", padx=8, pady=8)
-
-        btn_edit = tk.Button(btn_frame,
-                             text="Edit",
-                             fg='white',
-                             bg=PRIMARY_COLOR,
-                             font=FONT_BTN,
-                             relief='flat',
-                             command=lambda i=idx: self.edit_entry(i))
-        btn_edit.pack(side='left', padx=4)
-
-        btn_print = tk.Button(btn_frame,
-                              text="Print",
-                              fg='white',
-                              bg='#7B1FA2',
-                              font=FONT_BTN,
-                              relief='flat',
-                              command=lambda e=entry: show_print([e]))
-        btn_print.pack(side='left', padx=4)
-
-        btn_delete = tk.Button(btn_frame,
-                               text="Delete",
-                               fg='white',
-                               bg=DANGER_COLOR,
-                               font=FONT_BTN,
-                               relief='flat',
-                               command=lambda i=idx: self.delete_entry(i))
-        btn_delete.pack(side='left', padx=4)
-
-    def save_entry(self):
-        if not self.user:
-            messagebox.showwarning("Access Denied", "Please login first to add entries.", parent=self.root)
-            return
-
-        entry = {}
-        for k, w in self.widgets.items():
-            if k == "Address":
-                val = w.get("1.0", "end").strip()
-            else:
-                val = w.get().strip()
-            entry[k] = val
-
-        if any(not v for v in entry.values()):
-            messagebox.showerror("Error", "All fields are required.", parent=self.root)
-            return
-
-        addresses = read_csv(ADDRESS_FILE)
-        addresses.append(entry)
-        write_csv(ADDRESS_FILE, addresses, ADDRESS_FIELDS)
-
-        self.clear_form()
-        self.refresh_entries()
-        messagebox.showinfo("Success", "Entry saved.", parent=self.root)
-
-    def clear_form(self):
-        for k, w in self.widgets.items():
-            if k == "Address":
-                w.delete("1.0", "end")
-            else:
-                w.delete(0, "end")
-
-    def edit_entry(self, idx):
-        addresses = read_csv(ADDRESS_FILE)
-        edit_data = addresses[idx]
-
-        win = tk.Toplevel(self.root)
-        win.title("Edit Entry")
-        win.geometry("450x650")
-        win.configure(bg='white')
-
-        entry_widgets = {}
-
-        for i, field in enumerate(ADDRESS_FIELDS):
-            tk.Label(win, text=field + ":", bg='white', font=FONT_LABEL).grid(row=i, column=0, sticky='w', padx=10, pady=5)
-
-            if field == "Address":
-                txt = tk.Text(win,
-                              width=30,
-                              height=3,
-                              font=FONT_LABEL,
-                              bg=ENTRY_BG,
-                              relief='flat',
-                              highlightbackground='#c0c0c0',
-                              highlightthickness=1)
-                txt.insert('1.0', edit_data[field])
-                txt.grid(row=i, column=1, padx=10, pady=5, sticky='ew')
-                entry_widgets[field] = txt
-            elif field == "State":
-                combo = ttk.Combobox(win,
-                                     values=INDIAN_STATES,
-                                     font=FONT_LABEL,
-                                     width=25)
-                combo.set(edit_data[field])
-                combo.grid(row=i, column=1, padx=10, pady=5, sticky='ew')
-                entry_widgets[field] = combo
-            elif field == "Country":
-                combo = ttk.Combobox(win,
-                                     values=COUNTRIES,
-                                     font=FONT_LABEL,
-                                     width=25)
-                combo.set(edit_data[field])
-                combo.grid(row=i, column=1, padx=10, pady=5, sticky='ew')
-                entry_widgets[field] = combo
-            elif field == "Type":
-                combo = ttk.Combobox(win,
-                                     values=["Personal", "Business"],
-                                     font=FONT_LABEL,
-                                     width=25)
-                combo.set(edit_data[field])
-                combo.grid(row=i, column=1, padx=10, pady=5, sticky='ew')
-                entry_widgets[field] = combo
-            else:
-                ent = tk.Entry(win,
-                               font=FONT_LABEL,
-                               bg=ENTRY_BG,
-                               relief='flat',
-                               highlightbackground='#c0c0c0',
-                               highlightthickness=1,
-                               width=32)
-                ent.insert(0, edit_data[field])
-                ent.grid(row=i, column=1, padx=10, pady=5, sticky='ew')
-                entry_widgets[field] = ent
-
-        def save_changes():
-            updated_entry = {}
-            for field, widget in entry_widgets.items():
-                if field == "Address":
-                    val = widget.get("1.0", "end").strip()
-                else:
-                    val = widget.get().strip()
-                if not val:
-                    messagebox.showerror("Error", f"Field '{field}' is required.", parent=win)
-                    return
-                updated_entry[field] = val
-
-            addresses[idx] = updated_entry
-            write_csv(ADDRESS_FILE, addresses, ADDRESS_FIELDS)
-            self.refresh_entries()
-
-            messagebox.showinfo("Success", "Entry updated.", parent=win)
-            win.destroy()  # Close the edit window
-
-        save_btn = tk.Button(win,
-                             text="Save Changes",
-                             font=FONT_BTN,
-                             bg=SUCCESS_COLOR,
-                             fg='white',
-                             relief='flat',
-                             command=save_changes)
-        save_btn.grid(row=len(ADDRESS_FIELDS), column=0, columnspan=2, pady=15, padx=10, sticky='ew')
-
-    def delete_entry(self, idx):
-        if messagebox.askyesno("Confirm", "Move this entry to Recycle Bin?", parent=self.root):
-            addresses = read_csv(ADDRESS_FILE)
-            recycle = read_csv(RECYCLE_FILE)
-            recycle.append(addresses.pop(idx))
-            write_csv(ADDRESS_FILE, addresses, ADDRESS_FIELDS)
-            write_csv(RECYCLE_FILE, recycle, ADDRESS_FIELDS)
-            self.refresh_entries()
-
-    def delete_all_entries(self):
-        if messagebox.askyesno("Confirm", "Move all entries to Recycle Bin?", parent=self.root):
-            addresses = read_csv(ADDRESS_FILE)
-            recycle = read_csv(RECYCLE_FILE)
-            recycle.extend(addresses)
-            write_csv(ADDRESS_FILE, [], ADDRESS_FIELDS)
-            write_csv(RECYCLE_FILE, recycle, ADDRESS_FIELDS)
-            self.refresh_entries()
-
-    # --- Recycle Bin Operations ---
-
-    def open_recycle_bin(self):
-        if self.recycle_window is not None:
-            self.recycle_window.lift()
-            return
-
-        self.recycle_window = tk.Toplevel(self.root)
-        self.recycle_window.title("Recycle Bin")
-        self.recycle_window.geometry("920x620")
-        self.recycle_window.configure(bg='white')
-        self.recycle_window.protocol("WM_DELETE_WINDOW", self._on_recycle_close)
-
-        top_frame = tk.Frame(self.recycle_window, bg='white')
-        top_frame.pack(fill='x', padx=10, pady=6)
-
-        ttk.Button(top_frame, text="Recover All", style="Accent.TButton", command=self._recover_all).pack(side='left', padx=8)
-        ttk.Button(top_frame, text="Delete All Permanently", command=self._delete_all_permanent).pack(side='left', padx=8)
-
-        list_frame = tk.Frame(self.recycle_window, bg='white')
-        list_frame.pack(fill='both', expand=True, padx=10, pady=6)
-
-        canvas = tk.Canvas(list_frame, bg='white', highlightthickness=0)
-        scrollbar = ttk.Scrollbar(list_frame, orient='vertical', command=canvas.yview)
-
-        self.recycle_entries_frame = tk.Frame(canvas, bg='white')
-        self.recycle_entries_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-
-        canvas.create_window((0, 0), window=self.recycle_entries_frame, anchor='nw')
-        canvas.configure(yscrollcommand=scrollbar.set)
-
-        canvas.pack(side='left', fill='both', expand=True)
-        scrollbar.pack(side='right', fill='y')
-
-        self._populate_recycle_entries()
-
-    def _populate_recycle_entries(self):
-        for w in self.recycle_entries_frame.winfo_children():
-            w.destroy()
-
-        recycle_items = read_csv(RECYCLE_FILE)
-        if not recycle_items:
-            lbl = tk.Label(self.recycle_entries_frame, text="Recycle Bin is Empty", font=FONT_TITLE, bg='white')
-            lbl.pack(pady=20)
-            return
-
-        for idx, entry in enumerate(recycle_items):
-            frame = tk.Frame(self.recycle_entries_frame, bg=RECYCLE_BG, bd=1, relief='ridge')
-            frame.pack(fill='x', pady=5, padx=5)
-
-            text = "\n".join(f"{k}: {v}" for k, v in entry.items())
-            lbl = tk.Label(frame, text=text, font=FONT_LABEL, bg=RECYCLE_BG, justify='left')
-            lbl.pack(side='left', padx=8, pady=6, fill='both', expand=True)
-
-            buttons_frame = tk.Frame(frame, bg=RECYCLE_BG)
-            buttons_frame.pack(side='right', padx=8, pady=6)
-
-            btn_rec = tk.Button(buttons_frame, text="Recover", font=FONT_BTN, fg='white', bg=SUCCESS_COLOR,
-                                relief='flat', command=lambda i=idx: self._recover_one(i))
-            btn_del = tk.Button(buttons_frame, text="Delete", font=FONT_BTN, fg='white', bg=DANGER_COLOR,
-                                relief='flat', command=lambda i=idx: self._delete_one(i))
-
-            btn_rec.pack(side='left', padx=4)
-            btn_del.pack(side='left', padx=4)
-
-    def _recover_one(self, index):
-        recycle = read_csv(RECYCLE_FILE)
-        if index >= len(recycle):
-            return
-        entry = recycle.pop(index)
-        addresses = read_csv(ADDRESS_FILE)
-        addresses.append(entry)
-        write_csv(ADDRESS_FILE, addresses, ADDRESS_FIELDS)
-        write_csv(RECYCLE_FILE, recycle, ADDRESS_FIELDS)
-        messagebox.showinfo("Recovered", "Entry has been recovered.", parent=self.recycle_window)
-        self._close_recycle_window()
-        self.refresh_entries()
-
-    def _delete_one(self, index):
-        recycle = read_csv(RECYCLE_FILE)
-        if index >= len(recycle):
-            return
-        answer = messagebox.askyesno("Confirm Delete", "Delete the selected entry permanently?", parent=self.recycle_window)
-        if answer:
-            recycle.pop(index)
-            write_csv(RECYCLE_FILE, recycle, ADDRESS_FIELDS)
-            messagebox.showinfo("Deleted", "Entry deleted permanently.", parent=self.recycle_window)
-            self._close_recycle_window()
-
-    def _recover_all(self):
-        recycle = read_csv(RECYCLE_FILE)
-        if not recycle:
-            messagebox.showinfo("Empty", "Recycle bin is empty.", parent=self.recycle_window)
-            return
-        addresses = read_csv(ADDRESS_FILE)
-        addresses.extend(recycle)
-        write_csv(ADDRESS_FILE, addresses, ADDRESS_FIELDS)
-        write_csv(RECYCLE_FILE, [], ADDRESS_FIELDS)
-        messagebox.showinfo("Recovered", "All entries have been recovered.", parent=self.recycle_window)
-        self._close_recycle_window()
-        self.refresh_entries()
-
-    def _delete_all_permanent(self):
-        recycle = read_csv(RECYCLE_FILE)
-        if not recycle:
-            messagebox.showinfo("Empty", "Recycle bin is empty.", parent=self.recycle_window)
-            return
-        answer = messagebox.askyesno("Confirm Delete", "Delete all entries permanently?", parent=self.recycle_window)
-        if answer:
-            write_csv(RECYCLE_FILE, [], ADDRESS_FIELDS)
-            messagebox.showinfo("Deleted", "All entries deleted permanently.", parent=self.recycle_window)
-            self._close_recycle_window()
-
-    def _close_recycle_window(self):
-        if self.recycle_window is not None:
-            self.recycle_window.destroy()
-            self.recycle_window = None
-
-    def _on_recycle_close(self):
-        self.recycle_window = None
-        self.recycle_window.destroy()
-
-
-if __name__ == "__main__":
-    # Ensure data folder and files exist
-    for filepath, fields in [(USER_FILE, USER_FIELDS), (ADDRESS_FILE, ADDRESS_FIELDS), (RECYCLE_FILE, ADDRESS_FIELDS)]:
-        if not os.path.exists(filepath):
-            write_csv(filepath, [], fields)
-
-    root = tk.Tk()
-    root.geometry("1230x740")
-    root.title("Secure Address Book")
-    app = AddressBookApp(root)
-    root.mainloop()
+import argparse
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import webbrowser
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import tkinter as tk
+    from tkinter import ttk, messagebox, filedialog
+except ImportError:
+    # The command line interface works without Tk
+    tk = ttk = messagebox = filedialog = None
+
+# Storage and the rest of the headless core; re-exported so that
+# addressbook.AddressStore and friends keep working for scripts
+from addressbook_core import *  # noqa: F401,F403
+
+# --- Styles ---
+ENTRY_BG = "#f0f4f8"
+PRIMARY_COLOR = "#1976D2"
+SECONDARY_COLOR = "#42A5F5"
+DANGER_COLOR = "#E53935"
+SUCCESS_COLOR = "#388E3C"
+RECYCLE_BG = "#ffe9cc"
+FONT_TITLE = ('Segoe UI', 11, 'bold')
+FONT_LABEL = ('Segoe UI', 10)
+FONT_BTN = ('Segoe UI', 10, 'bold')
+FONT_HEADER = ('Segoe UI', 16, 'bold')
+
+
+
+# --- Background tasks ---
+
+class Task:
+    """Handle for work submitted to a TaskRunner.
+
+    ``work(task)`` runs on a worker thread; long-running work should poll
+    ``task.cancelled`` and may report ``task.progress(value)``.
+    """
+
+    def __init__(self, runner, work, on_done, on_progress):
+        self.runner = runner
+        self.work = work
+        self.on_done = on_done
+        self.on_progress = on_progress
+        self.cancelled = threading.Event()
+        self.future = None
+
+    def cancel(self):
+        self.cancelled.set()
+        if self.future is not None and self.future.cancel():
+            # Never started, so no result will arrive
+            self.runner._finish(self)
+
+    def progress(self, value):
+        self.runner.results.put((self, "progress", value))
+
+    def run(self):
+        try:
+            result, error = self.work(self), None
+        except Exception as exc:
+            result, error = None, exc
+        self.runner.results.put((self, "done", (result, error)))
+
+
+class TaskRunner:
+    """Run work off the Tk thread and deliver results on the mainloop.
+
+    Storage work goes to a single "serial" worker so writes reach the backend
+    in the order they were submitted; other work (rendering, hashing) uses a
+    small pool. Workers post results to a queue that the mainloop drains with
+    ``root.after`` while anything is pending, handling a bounded number of
+    messages per tick so a burst of progress updates cannot stall a frame.
+    ``on_busy`` is told when the first busy task starts and the last one
+    ends; background polls submitted with busy=False do not count.
+    """
+
+    POLL_MS = 16
+    MAX_PER_TICK = 50
+
+    def __init__(self, root, workers=4, on_busy=None):
+        self.root = root
+        self.on_busy = on_busy
+        self.serial = ThreadPoolExecutor(max_workers=1, thread_name_prefix="storage")
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="worker")
+        self.results = queue.Queue()
+        self.pending = set()
+        # The pending tasks the user is waiting for
+        self.busy = set()
+        self._polling = False
+
+    def submit(self, work, on_done=None, on_progress=None, serial=True, busy=True):
+        """Queue work(task); on_done(result, error) is called on the mainloop."""
+        task = Task(self, work, on_done, on_progress)
+        self.pending.add(task)
+        task.future = (self.serial if serial else self.pool).submit(task.run)
+        if busy:
+            self.busy.add(task)
+            if len(self.busy) == 1 and self.on_busy:
+                self.on_busy(True)
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.POLL_MS, self._drain)
+        return task
+
+    def _finish(self, task):
+        self.pending.discard(task)
+        if task in self.busy:
+            self.busy.discard(task)
+            if not self.busy and self.on_busy:
+                self.on_busy(False)
+
+    def _drain(self):
+        latest = {}
+        done = []
+        try:
+            for _ in range(self.MAX_PER_TICK):
+                task, kind, value = self.results.get_nowait()
+                if kind == "progress":
+                    latest[task] = value
+                else:
+                    latest.pop(task, None)
+                    done.append((task, value))
+        except queue.Empty:
+            pass
+
+        for task, value in latest.items():
+            if task.on_progress and task in self.pending:
+                task.on_progress(value)
+        for task, (result, error) in done:
+            self._finish(task)
+            if task.on_done:
+                task.on_done(result, error)
+
+        if self.pending or not self.results.empty():
+            self.root.after(self.POLL_MS, self._drain)
+        else:
+            self._polling = False
+
+    def shutdown(self):
+        """Cancel queued work and wait for running work to finish."""
+        for task in list(self.pending):
+            task.cancelled.set()
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self.serial.shutdown(wait=True)
+
+
+# --- Widgets ---
+
+def defer_values(combo, values):
+    """Give combo its dropdown values when it is first used instead of when built.
+
+    Long lists (states, countries) are then not converted to Tcl for every
+    combobox drawn, only for the ones somebody opens, scrolls or tabs into.
+    """
+    def fill(event=None):
+        if not filled:
+            filled.append(True)
+            combo.configure(values=values)
+
+    filled = []
+    combo.configure(postcommand=fill)
+    combo.bind("<Enter>", fill, add="+")
+    combo.bind("<FocusIn>", fill, add="+")
+
+
+class VirtualList:
+    """Scrollable list that only builds widgets for the rows in the viewport.
+
+    Rows are created by ``make_row(parent)`` and recycled while scrolling:
+    ``bind_row(row, idx, item)`` points a pooled row at new data, so the redraw
+    cost depends on the window height rather than on the number of items.
+    All rows share one fixed height, measured from the first bound row.
+    """
+
+    ROW_GAP = 8
+
+    # insert_row/update_row/remove_row patch the list in place; render() only
+    # rebinds pooled rows whose (index, item) changed, so they cost O(visible).
+
+    def __init__(self, parent, make_row, bind_row, bg='white'):
+        self.make_row = make_row
+        self.bind_row = bind_row
+        self.row_height = None
+        self.items = []
+        self.pool = []
+        self.bound = {}
+        self._render_pending = False
+
+        self.canvas = tk.Canvas(parent, bg=bg, highlightthickness=0)
+        self.vscroll = ttk.Scrollbar(parent, orient='vertical', command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self._on_yscroll)
+        self.canvas.bind("<Configure>", lambda e: self.schedule_render())
+
+    def _on_yscroll(self, first, last):
+        self.vscroll.set(first, last)
+        self.schedule_render()
+
+    def _measure_row_height(self):
+        row = self.make_row(self.canvas)
+        self.bind_row(row, 0, self.items[0])
+        row.update_idletasks()
+        self.row_height = row.winfo_reqheight() + self.ROW_GAP
+        row.destroy()
+
+    def set_items(self, items):
+        self.items = list(items)
+        self.bound.clear()
+        self._resize()
+        self.render()
+
+    def insert_row(self, idx, item):
+        self.items.insert(idx, item)
+        self._resize()
+        self.schedule_render()
+
+    def update_row(self, idx, item):
+        self.items[idx] = item
+        self.schedule_render()
+
+    def remove_row(self, idx):
+        del self.items[idx]
+        self._resize()
+        self.schedule_render()
+
+    def _resize(self):
+        if self.row_height is None and self.items:
+            self._measure_row_height()
+        self.canvas.configure(scrollregion=(0, 0, 0, len(self.items) * (self.row_height or 0)))
+
+    def schedule_render(self):
+        if not self._render_pending:
+            self._render_pending = True
+            self.canvas.after_idle(self.render)
+
+    def render(self):
+        self._render_pending = False
+        if self.row_height is None:
+            return
+
+        width = self.canvas.winfo_width()
+        height = max(self.canvas.winfo_height(), self.row_height)
+        first = max(int(self.canvas.canvasy(0)) // self.row_height, 0)
+        count = height // self.row_height + 2
+
+        while len(self.pool) < count:
+            row = self.make_row(self.canvas)
+            window = self.canvas.create_window(0, 0, window=row, anchor='nw', state='hidden')
+            self.pool.append((row, window))
+
+        for offset, (row, window) in enumerate(self.pool):
+            idx = first + offset
+            if idx >= len(self.items):
+                self.canvas.itemconfigure(window, state='hidden')
+                self.bound.pop(window, None)
+                continue
+            item = self.items[idx]
+            previous = self.bound.get(window)
+            if previous is None or previous[0] != idx or previous[1] is not item:
+                self.bind_row(row, idx, item)
+                self.bound[window] = (idx, item)
+            self.canvas.coords(window, 0, idx * self.row_height + self.ROW_GAP // 2)
+            self.canvas.itemconfigure(window,
+                                      width=width,
+                                      height=self.row_height - self.ROW_GAP,
+                                      state='normal')
+
+
+class AddressBookApp:
+    # How often the open book is checked for other instances' changes
+    SYNC_MS = 1000
+    # List patch for each journal op applied by sync()
+    SYNC_PATCHES = {"add": "insert", "update": "update", "delete": "remove"}
+    # When the recycle bin's retention limits are applied: shortly after the
+    # book is first shown, then every hour while logged in
+    PURGE_FIRST_MS = 5000
+    PURGE_MS = 60 * 60 * 1000
+    # The search box searches once typing pauses for this long
+    SEARCH_DEBOUNCE_MS = 150
+    # Rows of a search shown before the rest of its matches are put in order
+    SEARCH_FIRST_PAGE = 50
+
+    def __init__(self, root):
+        self.root = root
+
+        self.user = None
+        self.user_info = None
+
+        self.widgets = {}
+        self.tab_widgets = []
+        self.address_list = None
+        self.list_generation = None
+        self.search_var = None
+        self.search_job = None
+        self.refresh_task = None
+        self.sort_var = None
+        self.descending_var = None
+        self.filter_vars = {}
+        self.import_task = None
+        self.import_btn = None
+        self.status_label = None
+        self.print_cache = {}
+        self.recycle_window = None
+        self.recycle_list = None
+        self.recycle_count_label = None
+        self.recycle_empty_label = None
+        self.sync_job = None
+        self.synced_generation = None
+        self.purge_job = None
+
+        config = load_config()
+        self.recycle_limits = recycle_limits(config)
+        self.books = None
+        self.users = None
+        # Only the logged-in user's book is loaded (see _open_book)
+        self.store = None
+        self.hasher = PasswordHasher.from_config(config)
+        # Storage and rendering run on workers; handlers only touch widgets
+        self.tasks = TaskRunner(root, on_busy=self._set_busy)
+
+        self.setup_styles()
+        self.setup_ui()
+        # Storage is opened on the worker while the first frame is drawn;
+        # every later storage task is queued behind this one
+        self.tasks.submit(lambda task: self._open_backends(config), self._backends_opened)
+        # Previews of this session stay until the next start, as the
+        # browser may still be loading them
+        self.tasks.submit(lambda task: remove_stale_print_dirs(), serial=False, busy=False)
+
+    def _open_backends(self, config):
+        books, user_backend = open_backends(config)
+        self.books = books
+        self.users = UserIndex(user_backend)
+
+    def _backends_opened(self, result, error):
+        if error:
+            messagebox.showerror("Error", f"Could not open the address book data: {error}", parent=self.root)
+
+    def close(self):
+        self.tasks.shutdown()
+        self._release_book()
+        if self.books is not None:
+            self.books.close()
+
+    def _open_book(self, username):
+        # Runs on the storage worker. Entries are read by the first
+        # refresh_entries, once the address book has been drawn
+        self._release_book()
+        self.store = AddressStore(self.books.open(username))
+
+    def _release_book(self):
+        store, self.store = self.store, None
+        if store is not None:
+            store.backend.close()
+
+    def setup_styles(self):
+        style = ttk.Style()
+        style.theme_use('clam')
+        style.configure(
+            "TCombobox",
+            fieldbackground=ENTRY_BG,
+            background="white",
+            relief='flat',
+            padding=5,
+            font=FONT_LABEL,
+        )
+        style.configure(
+            "Accent.TButton",
+            background=PRIMARY_COLOR,
+            foreground="white",
+            font=FONT_BTN,
+        )
+        style.map("Accent.TButton", background=[('active', SECONDARY_COLOR)])
+
+    def setup_ui(self):
+        topbar = tk.Frame(self.root, bg="#e3f4fd", height=48)
+        topbar.pack(side='top', fill='x')
+
+        self.auth_btn = tk.Menubutton(
+            topbar,
+            text="Login/Sign-up",
+            bg=PRIMARY_COLOR,
+            fg='white',
+            font=FONT_BTN,
+            relief='flat',
+            activebackground=SECONDARY_COLOR,
+            activeforeground='white'
+        )
+        self.auth_btn.menu = tk.Menu(self.auth_btn, font=FONT_LABEL, tearoff=0)
+        self.auth_btn['menu'] = self.auth_btn.menu
+        self.auth_btn.menu.add_command(label="Login/Sign-up", command=self.show_login_signup)
+        self.auth_btn.pack(side='right', padx=10, pady=5)
+
+        self.topbar = topbar
+
+        self.main_frame = tk.Frame(self.root, bg="white")
+        self.main_frame.pack(fill='both', expand=True, padx=20, pady=15)
+
+        # Start with login/signup view
+        self.show_login_signup()
+
+    def clear_main(self):
+        for w in self.main_frame.winfo_children():
+            w.destroy()
+
+    # --- Authentication --- #
+    def show_login_signup(self):
+        self.clear_main()
+
+        frame = tk.Frame(self.main_frame, bg="white")
+        frame.pack(expand=True)
+        content = tk.Frame(frame, bg="white", padx=150, pady=40)
+        content.pack(expand=True)
+
+        label_header = tk.Label(
+            content,
+            text="Welcome! Please Login or Sign-up to use your Secure Address Book",
+            font=FONT_HEADER,
+            fg=PRIMARY_COLOR,
+            bg="white",
+            wraplength=450,
+            justify='center'
+        )
+        label_header.pack(pady=(0, 30))
+
+        tabs = ttk.Notebook(content)
+        tabs.pack(expand=True, fill='both')
+
+        # Only the login tab is built up front; the others on first selection
+        builders = {}
+        for text, build in (("Login", self._build_login_tab),
+                            ("Sign-up", self._build_signup_tab),
+                            ("Forgot Password", self._build_forgot_tab)):
+            tab = tk.Frame(tabs, bg='white', padx=20, pady=20)
+            tabs.add(tab, text=text)
+            builders[str(tab)] = build
+
+        def build_selected(event=None):
+            build = builders.pop(str(tabs.select()), None)
+            if build is not None:
+                build(tabs.nametowidget(tabs.select()))
+
+        build_selected()
+        tabs.bind("<<NotebookTabChanged>>", build_selected)
+
+    def _build_login_tab(self, login_tab):
+
+        labels = ["Username", "Password"]
+        self.login_entries = {}
+
+        for idx, label in enumerate(labels):
+            tk.Label(login_tab, text=label+":", font=FONT_LABEL, bg='white').grid(row=idx, column=0, pady=8, sticky='w')
+            ent = tk.Entry(login_tab, font=FONT_LABEL, width=32, bg=ENTRY_BG, relief='solid', bd=1)
+            if label == "Password":
+                ent.config(show="*")
+            ent.grid(row=idx, column=1, pady=8)
+            self.login_entries[label] = ent
+
+        login_btn = tk.Button(
+            login_tab,
+            text="Login",
+            font=FONT_BTN,
+            bg=SUCCESS_COLOR,
+            fg='white',
+            padx=25,
+            pady=10,
+            relief='flat',
+            command=self.login
+        )
+        login_btn.grid(row=len(labels), column=0, columnspan=2, pady=20, sticky='ew')
+
+    def _build_signup_tab(self, signup_tab):
+
+        labels = ["Username", "Email", "Mobile", "Password"]
+        self.signup_entries = {}
+
+        for idx, label in enumerate(labels):
+            tk.Label(signup_tab, text=label+":", font=FONT_LABEL, bg='white').grid(row=idx, column=0, pady=8, sticky='w')
+            ent = tk.Entry(signup_tab, font=FONT_LABEL, width=32, bg=ENTRY_BG, relief='solid', bd=1)
+            if label == "Password":
+                ent.config(show="*")
+            ent.grid(row=idx, column=1, pady=8)
+            self.signup_entries[label] = ent
+
+        signup_btn = tk.Button(
+            signup_tab,
+            text="Sign-up",
+            font=FONT_BTN,
+            bg=SUCCESS_COLOR,
+            fg='white',
+            relief='flat',
+            command=self.signup
+        )
+        signup_btn.grid(row=len(labels), column=0, columnspan=2, pady=20, sticky='ew')
+
+    def _build_forgot_tab(self, forgot_tab):
+
+        tk.Label(forgot_tab, text="Username:", font=FONT_LABEL, bg='white').grid(row=0, column=0, pady=8, sticky='w')
+        self.forgot_username = tk.Entry(forgot_tab, font=FONT_LABEL, width=32, bg=ENTRY_BG, relief='solid', bd=1)
+        self.forgot_username.grid(row=0, column=1, pady=8)
+
+        self.forgot_verify_btn = tk.Button(
+            forgot_tab,
+            text="Verify",
+            font=FONT_BTN,
+            bg=PRIMARY_COLOR,
+            fg='white',
+            relief='flat',
+            command=self.forgot_verify
+        )
+        self.forgot_verify_btn.grid(row=1, column=0, columnspan=2, pady=12, sticky='ew')
+
+        self.forgot_newpw_lbl = tk.Label(forgot_tab, text="New Password:", font=FONT_LABEL, bg='white')
+        self.forgot_newpw_entry = tk.Entry(forgot_tab, font=FONT_LABEL, width=32, bg=ENTRY_BG, relief='solid', bd=1, show='*')
+
+        self.forgot_confpw_lbl = tk.Label(forgot_tab, text="Confirm Password:", font=FONT_LABEL, bg='white')
+        self.forgot_confpw_entry = tk.Entry(forgot_tab, font=FONT_LABEL, width=32, bg=ENTRY_BG, relief='solid', bd=1, show='*')
+
+        self.forgot_update_btn = tk.Button(
+            forgot_tab,
+            text="Update Password",
+            font=FONT_BTN,
+            bg=SUCCESS_COLOR,
+            fg='white',
+            relief='flat',
+            command=self.forgot_update
+        )
+
+        for widget in (self.forgot_newpw_lbl,
+                       self.forgot_newpw_entry,
+                       self.forgot_confpw_lbl,
+                       self.forgot_confpw_entry,
+                       self.forgot_update_btn):
+            widget.grid_remove()
+
+    def login(self):
+        username = self.login_entries["Username"].get().strip()
+        password = self.login_entries["Password"].get()
+        if not username or not password:
+            messagebox.showerror("Error", "All fields are required.", parent=self.root)
+            return
+
+        # Hashing is deliberately slow, so it stays off the Tk thread too
+        def work(task):
+            user = authenticate(self.users, self.hasher, username, password)
+            if user is None:
+                return None
+            self._open_book(user["Username"])
+            return user, shared_book_size(self.books)
+
+        def done(result, error):
+            if error:
+                messagebox.showerror("Error", str(error), parent=self.root)
+                return
+            if result is None:
+                messagebox.showerror("Failed", "Invalid username or password.", parent=self.root)
+                return
+            user, shared = result
+            self.user = user["Username"]
+            self.user_info = user
+            self.auth_btn.config(text=self.user)
+            self.auth_btn.menu.delete(0, 'end')
+            self.auth_btn.menu.add_command(label="Profile", command=self.show_profile)
+            self.auth_btn.menu.add_command(label="Logout", command=self.logout)
+            self.auth_btn.menu.add_command(label="Delete Account", command=self.delete_account)
+            messagebox.showinfo("Success", f"Welcome, {self.user}!", parent=self.root)
+            self.show_address_book()
+            if shared:
+                self._offer_shared_book(shared)
+
+        self.tasks.submit(work, done)
+
+    def _offer_shared_book(self, count):
+        # The book everyone shared before accounts had their own stays put
+        # until one account takes it
+        if not messagebox.askyesno(
+                "Shared Address Book",
+                f"The address book shared by all accounts before each had its own "
+                f"still holds {count} entries. Move them into your address book?\n\n"
+                f"They will then no longer be offered to other accounts.",
+                parent=self.root):
+            return
+        store, books = self.store, self.books
+
+        def work(task):
+            shared = AddressStore(books.open(None))
+            try:
+                return store.absorb(shared)
+            finally:
+                shared.backend.close()
+
+        def done(moved, error):
+            if error:
+                messagebox.showerror("Error", str(error), parent=self.root)
+                return
+            if self.store is store:
+                self.refresh_entries()
+            messagebox.showinfo("Success", f"Moved {moved} entries into your address book.", parent=self.root)
+
+        self.tasks.submit(work, done)
+
+    def signup(self):
+        data = {k: v.get().strip() for k, v in self.signup_entries.items()}
+        if not all(data.values()):
+            messagebox.showerror("Error", "All fields are required.", parent=self.root)
+            return
+
+        def work(task):
+            # Checked and added in one task so two signups cannot both pass
+            conflict = self.users.conflict(data)
+            if conflict is None:
+                data["Password"] = self.hasher.hash(data["Password"])
+                self.users.add(data)
+                self._open_book(data["Username"])
+            return conflict
+
+        def done(conflict, error):
+            if error:
+                messagebox.showerror("Error", str(error), parent=self.root)
+                return
+            if conflict == "Username":
+                messagebox.showerror("Error", "Username already exists.", parent=self.root)
+                return
+            if conflict == "Email":
+                messagebox.showerror("Error", "Email already registered.", parent=self.root)
+                return
+            if conflict == "Mobile":
+                messagebox.showerror("Error", "Mobile number already registered.", parent=self.root)
+                return
+
+            messagebox.showinfo("Success", "Account created! Logged in automatically.", parent=self.root)
+
+            self.user = data["Username"]
+            self.user_info = data
+            self.auth_btn.config(text=self.user)
+            self.auth_btn.menu.delete(0, 'end')
+            self.auth_btn.menu.add_command(label="Profile", command=self.show_profile)
+            self.auth_btn.menu.add_command(label="Logout", command=self.logout)
+            self.auth_btn.menu.add_command(label="Delete Account", command=self.delete_account)
+
+            self.show_address_book()
+
+        self.tasks.submit(work, done)
+
+    def forgot_verify(self):
+        username = self.forgot_username.get().strip()
+        if not username:
+            messagebox.showerror("Error", "Please enter your username.", parent=self.root)
+            return
+
+        def done(user, error):
+            self.forgot_user = user
+            if error:
+                messagebox.showerror("Error", str(error), parent=self.root)
+            elif self.forgot_user:
+                self.forgot_verify_btn['state'] = 'disabled'
+                self.forgot_username['state'] = 'readonly'
+                self.forgot_newpw_lbl.grid(row=2, column=0, pady=8, sticky='w')
+                self.forgot_newpw_entry.grid(row=2, column=1, pady=8)
+                self.forgot_confpw_lbl.grid(row=3, column=0, pady=8, sticky='w')
+                self.forgot_confpw_entry.grid(row=3, column=1, pady=8)
+                self.forgot_update_btn.grid(row=4, column=0, columnspan=2, pady=15, sticky='ew')
+            else:
+                messagebox.showerror("Error", "Username not found.", parent=self.root)
+
+        self.tasks.submit(lambda task: self.users.find(username), done)
+
+    def forgot_update(self):
+        new_pw = self.forgot_newpw_entry.get()
+        conf_pw = self.forgot_confpw_entry.get()
+        if not new_pw or not conf_pw:
+            messagebox.showerror("Error", "Both password fields are required.", parent=self.root)
+            return
+        if new_pw != conf_pw:
+            messagebox.showerror("Error", "Passwords do not match.", parent=self.root)
+            return
+
+        username = self.forgot_user["Username"]
+
+        def work(task):
+            user = self.users.find(username)
+            if user:
+                self.users.update(user, Password=self.hasher.hash(new_pw))
+            return user
+
+        def done(user, error):
+            if error:
+                messagebox.showerror("Error", str(error), parent=self.root)
+            elif user:
+                messagebox.showinfo("Success", "Password changed successfully.", parent=self.root)
+                self.show_login_signup()
+
+        self.tasks.submit(work, done)
+
+    def logout(self):
+        if self.import_task is not None:
+            self.import_task.cancel()
+        self._close_recycle_window()
+        self._clear_print_cache()
+        self.user = None
+        self.user_info = None
+        if self.sync_job is not None:
+            self.root.after_cancel(self.sync_job)
+            self.sync_job = None
+        if self.purge_job is not None:
+            self.root.after_cancel(self.purge_job)
+            self.purge_job = None
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+            self.search_job = None
+        self.synced_generation = None
+        self.auth_btn.config(text="Login/Sign-up")
+        self.auth_btn.menu.delete(0, 'end')
+        self.auth_btn.menu.add_command(label="Login/Sign-up", command=self.show_login_signup)
+        self.show_login_signup()
+        # Queued after any pending writes, then the book's memory is freed
+        self.tasks.submit(lambda task: self._release_book())
+
+    def delete_account(self):
+        if not messagebox.askyesno("Confirm", "Delete your account? This cannot be undone.", parent=self.root):
+            return
+        username = self.user
+
+        def work(task):
+            user = self.users.find(username)
+            if user:
+                self.users.remove(user)
+                self._release_book()
+                self.books.remove(username)
+
+        def done(result, error):
+            if error:
+                messagebox.showerror("Error", str(error), parent=self.root)
+                return
+            messagebox.showinfo("Deleted", "Your account was deleted.", parent=self.root)
+            self.logout()
+
+        self.tasks.submit(work, done)
+
+    def show_profile(self):
+        profile_win = tk.Toplevel(self.root)
+        profile_win.title("Profile")
+        profile_win.geometry("440x470")
+        profile_win.configure(bg='white')
+
+        fields = ["Username", "Email", "Mobile", "Old Password", "New Password"]
+        entries = {}
+
+        for i, field in enumerate(fields):
+            tk.Label(profile_win, text=field + ':', font=FONT_LABEL, bg='white').grid(row=i, column=0, padx=15, pady=10, sticky='w')
+            ent = tk.Entry(profile_win, font=FONT_LABEL, width=32, bg=ENTRY_BG, relief='solid', bd=1)
+            if 'Password' in field:
+                ent.config(show='*')
+            if self.user_info and field in self.user_info and "Password" not in field:
+                ent.insert(0, self.user_info[field])
+            ent.grid(row=i, column=1, padx=15, pady=10)
+            entries[field] = ent
+
+        def save_profile():
+            uname = entries["Username"].get().strip()
+            email = entries["Email"].get().strip()
+            mobile = entries["Mobile"].get().strip()
+            old_pw = entries["Old Password"].get()
+            new_pw = entries["New Password"].get()
+
+            if not uname or not email or not mobile:
+                messagebox.showerror("Error", "Username, Email, and Mobile are required.", parent=profile_win)
+                return
+            if new_pw and not old_pw:
+                messagebox.showerror("Error", "Please provide your current password to set a new password.", parent=profile_win)
+                return
+            username = self.user
+
+            def work(task):
+                user = self.users.find(username)
+                if user is None:
+                    return None, "User not found."
+
+                conflict = self.users.conflict({"Username": uname, "Email": email, "Mobile": mobile}, ignore=user)
+                if conflict == "Username":
+                    return None, "Username already taken."
+                if conflict == "Email":
+                    return None, "Email already taken."
+                if conflict == "Mobile":
+                    return None, "Mobile number already taken."
+
+                changes = {"Username": uname, "Email": email, "Mobile": mobile}
+                if new_pw:
+                    if not self.hasher.verify(old_pw, user["Password"]):
+                        return None, "Current password is incorrect."
+                    changes["Password"] = self.hasher.hash(new_pw)
+
+                if owner_key(username) == owner_key(uname):
+                    self.users.update(user, **changes)
+                    return user, None
+
+                # The book is keyed by username, so it moves with the account;
+                # it is moved first and moved back if the account update fails
+                self._release_book()
+                self.books.rename(username, uname)
+                try:
+                    self.users.update(user, **changes)
+                except Exception:
+                    self.books.rename(uname, username)
+                    self._open_book(username)
+                    raise
+                self._open_book(uname)
+                return user, None
+
+            def done(result, error):
+                if error:
+                    messagebox.showerror("Error", str(error), parent=profile_win)
+                    return
+                user, problem = result
+                if problem:
+                    messagebox.showerror("Error", problem, parent=profile_win)
+                    return
+
+                self.user = uname
+                self.user_info = user
+                if self.address_list is not None and self.address_list.canvas.winfo_exists():
+                    self._clear_print_cache()
+                    self.refresh_entries()
+
+                self.auth_btn.config(text=self.user)
+                messagebox.showinfo("Success", "Profile updated.", parent=profile_win)
+                profile_win.destroy()
+
+            self.tasks.submit(work, done)
+
+        save_btn = tk.Button(profile_win, text="Update", font=FONT_BTN, bg=PRIMARY_COLOR, fg='white', relief='flat', command=save_profile)
+        save_btn.grid(row=len(fields), column=0, columnspan=2, pady=20, padx=12, sticky='ew')
+
+    # --- Address Book ---
+
+    def show_address_book(self):
+        self.clear_main()
+        self._schedule_sync()
+        self._schedule_purge(self.PURGE_FIRST_MS)
+
+        top_bar_frame = tk.Frame(self.main_frame, bg='white')
+        top_bar_frame.pack(fill='x')
+
+        btn_recycle = tk.Button(top_bar_frame,
+                                text="Recycle Bin",
+                                bg='#FFA726', fg='white', font=FONT_BTN,
+                                relief='flat', command=self.open_recycle_bin)
+        btn_recycle.pack(side='right', padx=6, pady=6)
+
+        btn_print = tk.Button(top_bar_frame,
+                              text="Print All",
+                              bg='#7E57C2', fg='white', font=FONT_BTN,
+                              relief='flat', command=self.print_all)
+        btn_print.pack(side='right', padx=6, pady=6)
+
+        btn_delete_all = tk.Button(top_bar_frame,
+                                   text="Delete All",
+                                   bg='#789C9C', fg='white', font=FONT_BTN,
+                                   relief='flat', command=self.delete_all_entries)
+        btn_delete_all.pack(side='right', padx=6, pady=6)
+
+        btn_exit = tk.Button(top_bar_frame,
+                             text="Exit",
+                             bg=DANGER_COLOR, fg='white', font=FONT_BTN,
+                             relief='flat', command=self.root.quit)
+        btn_exit.pack(side='right', padx=6, pady=6)
+
+        self.import_btn = tk.Button(top_bar_frame,
+                                    text="Cancel Import" if self.import_task else "Import",
+                                    bg='#26A69A', fg='white', font=FONT_BTN,
+                                    relief='flat', command=self.import_contacts)
+        self.import_btn.pack(side='right', padx=6, pady=6)
+
+        self.status_label = tk.Label(top_bar_frame, text="", font=FONT_LABEL, bg='white', fg='#555555')
+        self.status_label.pack(side='right', padx=6)
+
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", lambda *args: self._schedule_search())
+        search_entry = tk.Entry(top_bar_frame,
+                                textvariable=self.search_var,
+                                font=FONT_LABEL,
+                                width=32,
+                                bg=ENTRY_BG,
+                                relief='solid',
+                                bd=1)
+        search_entry.pack(side='left', padx=6, pady=6, ipady=4)
+        search_entry.bind("<Return>", lambda e: self.refresh_entries())
+
+        btn_search = tk.Button(top_bar_frame,
+                               text="Search",
+                               bg=PRIMARY_COLOR, fg='white', font=FONT_BTN,
+                               relief='flat', command=self.refresh_entries)
+        btn_search.pack(side='left', padx=6, pady=6)
+
+        btn_clear = tk.Button(top_bar_frame,
+                              text="Clear",
+                              bg='#90A4AE', fg='white', font=FONT_BTN,
+                              relief='flat', command=self.clear_search)
+        btn_clear.pack(side='left', padx=6, pady=6)
+
+        self.build_view_bar()
+
+        container = tk.Frame(self.main_frame, bg="white")
+        container.pack(fill='both', expand=True, pady=(10, 0))
+
+        container.columnconfigure(0, weight=1)
+        container.columnconfigure(1, weight=3)
+
+        self.build_form(container)
+        self.build_address_list(container)
+
+    def build_view_bar(self):
+        view_bar = tk.Frame(self.main_frame, bg='white')
+        view_bar.pack(fill='x')
+
+        tk.Label(view_bar, text="Sort by:", font=FONT_LABEL, bg='white').pack(side='left', padx=(6, 2))
+        self.sort_var = tk.StringVar(value="Book order")
+        sort_combo = ttk.Combobox(view_bar,
+                                  textvariable=self.sort_var,
+                                  values=["Book order"] + SORT_FIELDS,
+                                  state='readonly',
+                                  width=12,
+                                  font=FONT_LABEL)
+        sort_combo.pack(side='left', padx=4, pady=4)
+        sort_combo.bind("<<ComboboxSelected>>", lambda e: self.refresh_entries())
+
+        self.descending_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(view_bar, text="Descending", variable=self.descending_var,
+                       font=FONT_LABEL, bg='white',
+                       command=self.refresh_entries).pack(side='left', padx=4)
+
+        self.filter_vars = {}
+        for field in FILTER_FIELDS:
+            tk.Label(view_bar, text=field + ":", font=FONT_LABEL, bg='white').pack(side='left', padx=(12, 2))
+            var = tk.StringVar(value="All")
+            combo = ttk.Combobox(view_bar,
+                                 textvariable=var,
+                                 state='readonly',
+                                 width=14,
+                                 font=FONT_LABEL)
+            defer_values(combo, ["All"] + FIELD_VALUES[field])
+            combo.pack(side='left', padx=4, pady=4)
+            combo.bind("<<ComboboxSelected>>", lambda e: self.refresh_entries())
+            self.filter_vars[field] = var
+
+    def _view_options(self):
+        sort = self.sort_var.get() if self.sort_var else "Book order"
+        return {
+            "sort": None if sort == "Book order" else sort,
+            "descending": bool(self.descending_var and self.descending_var.get()),
+            "filters": {field: var.get() for field, var in self.filter_vars.items() if var.get() != "All"},
+        }
+
+    def build_form(self, parent):
+        form_frame = tk.LabelFrame(parent, text="Add New Entry",
+                                   bg='white',
+                                   font=FONT_TITLE,
+                                   relief='groove')
+        form_frame.grid(row=0, column=0, sticky='nsew', padx=10, pady=10)
+        form_frame.columnconfigure(1, weight=1)
+
+        self.widgets.clear()
+        self.tab_widgets.clear()
+
+        for i, field in enumerate(ADDRESS_FIELDS):
+            lbl = tk.Label(form_frame, text=field + ":",
+                           font=FONT_LABEL,
+                           bg='white')
+            lbl.grid(row=i, column=0, sticky='w', padx=10, pady=6)
+            widget = self.make_widget_for_field(form_frame, field)
+            widget.grid(row=i, column=1, sticky='ew', padx=10, pady=2)
+            self.widgets[field] = widget
+            self.tab_widgets.append(widget)
+
+        save_btn = tk.Button(form_frame,
+                             text="Save Entry",
+                             font=FONT_BTN,
+                             bg=SECONDARY_COLOR,
+                             fg='white',
+                             relief='flat',
+                             command=self.save_entry)
+        save_btn.grid(row=len(ADDRESS_FIELDS), column=0,
+                      columnspan=2,
+                      pady=16,
+                      padx=10,
+                      sticky='ew')
+
+        # Navigation keys for form
+        for idx, widget in enumerate(self.tab_widgets):
+            def handler(event, index=idx):
+                self.focus_next_field(index)
+                return "break"
+            if isinstance(widget, tk.Text):
+                widget.bind("<Control-Return>", handler)
+                widget.bind("<Shift-Return>", handler)
+                widget.bind("<Return>", lambda e: None)
+            else:
+                widget.bind("<Return>", handler)
+
+    def make_widget_for_field(self, parent, field):
+        if field == "Address":
+            text = tk.Text(parent, height=3, width=28,
+                           font=FONT_LABEL,
+                           bg=ENTRY_BG,
+                           relief='flat',
+                           highlightthickness=1,
+                           highlightbackground='#c0c0c0')
+            return text
+        elif field == "State":
+            combo = ttk.Combobox(parent,
+                                 width=25,
+                                 font=FONT_LABEL)
+            defer_values(combo, INDIAN_STATES)
+            combo.set("Delhi")
+            return combo
+        elif field == "Country":
+            combo = ttk.Combobox(parent,
+                                 width=25,
+                                 font=FONT_LABEL)
+            defer_values(combo, COUNTRIES)
+            combo.set("India")
+            return combo
+        elif field == "Type":
+            combo = ttk.Combobox(parent,
+                                 values=ADDRESS_TYPES,
+                                 width=25,
+                                 font=FONT_LABEL)
+            combo.set("Personal")
+            return combo
+        else:
+            ent = tk.Entry(parent,
+                           width=30,
+                           font=FONT_LABEL,
+                           bg=ENTRY_BG,
+                           relief='flat',
+                           highlightthickness=1,
+                           highlightbackground='#c0c0c0')
+            return ent
+
+    def focus_next_field(self, idx):
+        next_idx = (idx + 1) % len(self.tab_widgets)
+        w = self.tab_widgets[next_idx]
+        w.focus_set()
+        if isinstance(w, tk.Text):
+            w.mark_set("insert", "end")
+
+    def build_address_list(self, parent):
+        right_frame = tk.Frame(parent, bg='white')
+        right_frame.grid(row=0, column=1, sticky='nsew', padx=10)
+        right_frame.columnconfigure(0, weight=1)
+        right_frame.rowconfigure(0, weight=1)
+
+        self.address_list = VirtualList(right_frame, self.make_entry_row, self.bind_entry_row)
+        self.address_list.canvas.grid(row=0, column=0, sticky="nsew")
+        self.address_list.vscroll.grid(row=0, column=1, sticky="ns")
+
+        # Loading the book waits until the view has been drawn
+        self.root.after_idle(self.refresh_entries)
+
+    def _schedule_search(self):
+        # Every key restarts the wait, so only the query typed last is run
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(self.SEARCH_DEBOUNCE_MS, self.refresh_entries)
+
+    def refresh_entries(self):
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+            self.search_job = None
+        # A newer list supersedes one still queued or being worked out
+        if self.refresh_task is not None:
+            self.refresh_task.cancel()
+        query = self.search_var.get().strip() if self.search_var else ""
+        options = self._view_options()
+        first_page = self.SEARCH_FIRST_PAGE
+
+        def work(task):
+            if task.cancelled.is_set():
+                return None
+            if query:
+                # The first page is shown while the rest are found and ordered
+                head = self.store.view_head(first_page, query, **options)
+                if len(head) < first_page:
+                    return head, self.store.generation
+                task.progress((head, self.store.generation))
+                if task.cancelled.is_set():
+                    return None
+            rows = list(self.store.view(query, **options))
+            return rows, self.store.generation
+
+        def show(result):
+            if self.address_list is None or not self.address_list.canvas.winfo_exists():
+                return
+            rows, self.list_generation = result
+            self.address_list.set_items(rows)
+
+        def progress(result):
+            if task is self.refresh_task:
+                show(result)
+
+        def done(result, error):
+            if task is not self.refresh_task:
+                return
+            self.refresh_task = None
+            if error:
+                messagebox.showerror("Error", str(error), parent=self.root)
+            elif result is not None:
+                show(result)
+
+        task = self.refresh_task = self.tasks.submit(work, done, on_progress=progress)
+
+    def clear_search(self):
+        self.search_var.set("")
+        self.refresh_entries()
+
+    def _list_is_positional(self, generation):
+        # Searched, sorted, filtered or reversed lists are not in book order,
+        # and outside changes since generation leave the list behind. Nor
+        # can a list about to be replaced by a search be relied on
+        options = self._view_options()
+        return (self.list_generation == generation and self.search_job is None and self.refresh_task is None and
+                not self.search_var.get().strip() and
+                not options["sort"] and not options["filters"] and not options["descending"])
+
+    def patch_entries(self, op, idx, entry=None, generation=None):
+        # Lists that do not match the book position for position are redrawn
+        # from the store instead
+        if self.address_list is None or not self.address_list.canvas.winfo_exists():
+            return
+        if not self._list_is_positional(generation):
+            self.refresh_entries()
+        elif op == "insert":
+            self.address_list.insert_row(idx, entry)
+        elif op == "update":
+            self.address_list.update_row(idx, entry)
+        elif op == "remove":
+            self.address_list.remove_row(idx)
+
+    def _schedule_sync(self):
+        if self.sync_job is None:
+            self.sync_job = self.root.after(self.SYNC_MS, self._sync_changes)
+
+    def _sync_changes(self):
+        # Follows changes other instances make to the book while it is open
+        self.sync_job = None
+        if self.user is None:
+            return
+        self._schedule_sync()
+        # Skipped while this app's own storage work is queued, and while
+        # nothing changed; it catches up on the next tick
+        if self.store is None or self.tasks.pending or not self.store.outdated():
+            return
+
+        def done(result, error):
+            if error or self.user is None:
+                # Retried on the next tick
+                return
+            since, generation, changes = result
+            reloaded = not changes and generation != self.synced_generation
+            self.synced_generation = generation
+            if self.address_list is not None and self.address_list.canvas.winfo_exists():
+                if changes and self._list_is_positional(since):
+                    self.list_generation = generation
+                    for table, op, pos, entry in changes:
+                        if table != "address":
+                            continue
+                        if op == "clear":
+                            self.refresh_entries()
+                            break
+                        self.patch_entries(self.SYNC_PATCHES[op], pos, entry, generation)
+                elif self.list_generation is not None and self.list_generation != generation:
+                    self.refresh_entries()
+            if self.recycle_window is not None and (
+                    reloaded or any(table == "recycle" for table, _, _, _ in changes)):
+                self._populate_recycle_entries()
+
+        self.tasks.submit(lambda task: self.store.sync(), done, busy=False)
+
+    def _schedule_purge(self, delay=None):
+        if self.purge_job is None:
+            self.purge_job = self.root.after(self.PURGE_MS if delay is None else delay, self._purge_expired)
+
+    def _purge_expired(self):
+        # Applies the recycle bin's retention limits on the storage worker
+        self.purge_job = None
+        if self.user is None:
+            return
+        self._schedule_purge()
+        max_age, max_entries = self.recycle_limits
+        if self.store is None or (max_age is None and max_entries is None):
+            return
+
+        def done(purged, error):
+            # Errors are left for the next run
+            if purged and self.recycle_window is not None:
+                self._populate_recycle_entries()
+
+        self.tasks.submit(lambda task: self.store.expire(max_age, max_entries), done, busy=False)
+
+    def make_entry_row(self, parent):
+        fr = tk.Frame(parent,
+                      bg="#e6f2ff",
+                      bd=1,
+                      relief='ridge')
+
+        fr.label = tk.Label(fr,
+                            font=FONT_LABEL,
+                            bg="#e6f2ff",
+                            justify='left',
+                            anchor='w')
+        fr.label.pack(side='left', padx=8, pady=8, fill='x', expand=True)
+
+        btn_frame = tk.Frame(fr, bg="#e6f2ff")
+        btn_frame.pack(side="right", padx=8, pady=8)
+
+        fr.btn_edit = tk.Button(btn_frame,
+                                text="Edit",
+                                fg='white',
+                                bg=PRIMARY_COLOR,
+                                font=FONT_BTN,
+                                relief='flat')
+        fr.btn_edit.pack(side='left', padx=4)
+
+        fr.btn_print = tk.Button(btn_frame,
+                                 text="Print",
+                                 fg='white',
+                                 bg='#7B1FA2',
+                                 font=FONT_BTN,
+                                 relief='flat')
+        fr.btn_print.pack(side='left', padx=4)
+
+        fr.btn_delete = tk.Button(btn_frame,
+                                  text="Delete",
+                                  fg='white',
+                                  bg=DANGER_COLOR,
+                                  font=FONT_BTN,
+                                  relief='flat')
+        fr.btn_delete.pack(side='left', padx=4)
+        return fr
+
+    def bind_entry_row(self, fr, idx, entry):
+        # Rows have a fixed height, so multi-line addresses are shown on one line
+        text = '\n'.join(f"{k}: {' '.join(entry[k].split())}" for k in ADDRESS_FIELDS)
+        fr.label.config(text=text)
+        # Rows are acted on by record id, whatever the list is showing; the
+        # task that changes one finds its position in the book
+        fr.btn_edit.config(command=lambda e=entry: self.edit_entry(e))
+        fr.btn_print.config(command=lambda e=entry: self.print_entries([e]))
+        fr.btn_delete.config(command=lambda e=entry: self.delete_entry(e))
+
+    def _entry_changed(self, parent):
+        messagebox.showerror("Error", "This entry was changed elsewhere; the list has been reloaded.", parent=parent)
+        self.refresh_entries()
+
+    def save_entry(self):
+        if not self.user:
+            messagebox.showwarning("Access Denied", "Please login first to add entries.", parent=self.root)
+            return
+
+        entry = {}
+        for k, w in self.widgets.items():
+            if k == "Address":
+                val = w.get("1.0", "end").strip()
+            else:
+                val = w.get().strip()
+            entry[k] = val
+
+        if any(not v for v in entry.values()):
+            messagebox.showerror("Error", "All fields are required.", parent=self.root)
+            return
+
+        self._add_entry(entry, check_duplicates=True)
+
+    def _add_entry(self, entry, check_duplicates):
+        def work(task):
+            if check_duplicates:
+                matches = self.store.duplicates_of(entry)
+                if matches:
+                    return "duplicate", matches[0]
+            record = self.store.add(entry)
+            return "added", (self.store.position(record), record, self.store.generation)
+
+        def done(result, error):
+            if error:
+                messagebox.showerror("Error", str(error), parent=self.root)
+                return
+            kind, value = result
+            if kind == "duplicate":
+                self._resolve_duplicate(entry, *value)
+                return
+            idx, record, generation = value
+            self.clear_form()
+            self.patch_entries("insert", idx, record, generation)
+            messagebox.showinfo("Success", "Entry saved.", parent=self.root)
+
+        self.tasks.submit(work, done)
+
+    def _resolve_duplicate(self, entry, idx, existing, reasons):
+        merged = merge_entries(existing, entry)
+
+        def summary(e):
+            return "\n".join(f"{k}: {' '.join(e[k].split())}" for k in ("Name", "Phone", "Email", "Pincode"))
+
+        answer = messagebox.askyesnocancel(
+            "Possible Duplicate",
+            f"This looks like an existing entry ({', '.join(reasons)}):\n\n{summary(existing)}\n\n"
+            f"Merged, it would read:\n\n{summary(merged)}\n\n"
+            "Yes: merge into the existing entry\nNo: save as a new entry\nCancel: keep editing",
+            parent=self.root)
+        if answer is None:
+            return
+        if not answer:
+            self._add_entry(entry, check_duplicates=False)
+            return
+
+        def work(task):
+            record, = self.store.merge([(existing.id, [], merged)])
+            idx = None if record is None else self.store.position(record)
+            return idx, record, self.store.generation
+
+        def done(result, error):
+            if error:
+                messagebox.showerror("Error", str(error), parent=self.root)
+                return
+            idx, record, generation = result
+            if idx is None:
+                self._entry_changed(self.root)
+                return
+            self.clear_form()
+            self.patch_entries("update", idx, record, generation)
+            messagebox.showinfo("Success", "Entry merged.", parent=self.root)
+
+        self.tasks.submit(work, done)
+
+    def clear_form(self):
+        for k, w in self.widgets.items():
+            if k == "Address":
+                w.delete("1.0", "end")
+            else:
+                w.delete(0, "end")
+
+    def edit_entry(self, edit_data):
+
+        win = tk.Toplevel(self.root)
+        win.title("Edit Entry")
+        win.geometry("450x650")
+        win.configure(bg='white')
+
+        entry_widgets = {}
+
+        for i, field in enumerate(ADDRESS_FIELDS):
+            tk.Label(win, text=field + ":", bg='white', font=FONT_LABEL).grid(row=i, column=0, sticky='w', padx=10, pady=5)
+
+            if field == "Address":
+                txt = tk.Text(win,
+                              width=30,
+                              height=3,
+                              font=FONT_LABEL,
+                              bg=ENTRY_BG,
+                              relief='flat',
+                              highlightbackground='#c0c0c0',
+                              highlightthickness=1)
+                txt.insert('1.0', edit_data[field])
+                txt.grid(row=i, column=1, padx=10, pady=5, sticky='ew')
+                entry_widgets[field] = txt
+            elif field == "State":
+                combo = ttk.Combobox(win,
+                                     values=INDIAN_STATES,
+                                     font=FONT_LABEL,
+                                     width=25)
+                combo.set(edit_data[field])
+                combo.grid(row=i, column=1, padx=10, pady=5, sticky='ew')
+                entry_widgets[field] = combo
+            elif field == "Country":
+                combo = ttk.Combobox(win,
+                                     values=COUNTRIES,
+                                     font=FONT_LABEL,
+                                     width=25)
+                combo.set(edit_data[field])
+                combo.grid(row=i, column=1, padx=10, pady=5, sticky='ew')
+                entry_widgets[field] = combo
+            elif field == "Type":
+                combo = ttk.Combobox(win,
+                                     values=ADDRESS_TYPES,
+                                     font=FONT_LABEL,
+                                     width=25)
+                combo.set(edit_data[field])
+                combo.grid(row=i, column=1, padx=10, pady=5, sticky='ew')
+                entry_widgets[field] = combo
+            else:
+                ent = tk.Entry(win,
+                               font=FONT_LABEL,
+                               bg=ENTRY_BG,
+                               relief='flat',
+                               highlightbackground='#c0c0c0',
+                               highlightthickness=1,
+                               width=32)
+                ent.insert(0, edit_data[field])
+                ent.grid(row=i, column=1, padx=10, pady=5, sticky='ew')
+                entry_widgets[field] = ent
+
+        def save_changes():
+            updated_entry = {}
+            for field, widget in entry_widgets.items():
+                if field == "Address":
+                    val = widget.get("1.0", "end").strip()
+                else:
+                    val = widget.get().strip()
+                if not val:
+                    messagebox.showerror("Error", f"Field '{field}' is required.", parent=win)
+                    return
+                updated_entry[field] = val
+
+            def work(task):
+                record = self.store.update(edit_data.id, updated_entry)
+                idx = None if record is None else self.store.position(record)
+                return idx, record, self.store.generation
+
+            def done(result, error):
+                if error:
+                    messagebox.showerror("Error", str(error), parent=win)
+                    return
+                idx, record, generation = result
+                if idx is None:
+                    win.destroy()
+                    self._entry_changed(self.root)
+                    return
+                self.patch_entries("update", idx, record, generation)
+
+                messagebox.showinfo("Success", "Entry updated.", parent=win)
+                win.destroy()  # Close the edit window
+
+            self.tasks.submit(work, done)
+
+        save_btn = tk.Button(win,
+                             text="Save Changes",
+                             font=FONT_BTN,
+                             bg=SUCCESS_COLOR,
+                             fg='white',
+                             relief='flat',
+                             command=save_changes)
+        save_btn.grid(row=len(ADDRESS_FIELDS), column=0, columnspan=2, pady=15, padx=10, sticky='ew')
+
+    def import_contacts(self):
+        if self.import_task is not None:
+            self.import_task.cancel()
+            return
+
+        path = filedialog.askopenfilename(
+            parent=self.root,
+            title="Import Contacts",
+            filetypes=[("Contacts", "*.csv *.vcf *.vcard"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+
+        # Imports write storage, so they run on the serial worker like every
+        # other write; saves made meanwhile wait for the import to finish
+        store = self.store
+
+        def work(task):
+            return import_file(store, path, progress=task.progress, cancel=task.cancelled)
+
+        def progress(stats):
+            self._set_status(f"Importing: {stats.imported} added, {stats.rows_per_sec:,.0f} rows/sec")
+
+        def done(stats, error):
+            self.import_task = None
+            self._set_status("")
+            if self.import_btn is not None and self.import_btn.winfo_exists():
+                self.import_btn.config(text="Import")
+            if self.address_list is not None and self.address_list.canvas.winfo_exists():
+                self.refresh_entries()
+            if error:
+                messagebox.showerror("Import Failed", str(error), parent=self.root)
+            else:
+                messagebox.showinfo("Import Finished", stats.summary(), parent=self.root)
+
+        self.import_task = self.tasks.submit(work, done, progress)
+        self.import_btn.config(text="Cancel Import")
+        self._set_status("Importing...")
+
+    def print_all(self):
+        def work(task):
+            # The rendered pages are reused until the book changes
+            return list(self.store.addresses()), (self.store.generation, self.store.version)
+
+        def done(result, error):
+            if error:
+                messagebox.showerror("Print Failed", str(error), parent=self.root)
+                return
+            entries, key = result
+            self.print_entries(entries, cache_key=key)
+
+        self.tasks.submit(work, done)
+
+    def print_entries(self, entries, cache_key=None):
+        if not entries:
+            messagebox.showinfo("No Entries", "No entries to print.", parent=self.root)
+            return
+
+        cached = self.print_cache.get(cache_key)
+        if cached and os.path.exists(cached):
+            webbrowser.open(cached)
+            return
+
+        entries = list(entries)
+        directory = tempfile.mkdtemp(prefix=PRINT_DIR_PREFIX)
+        user = self.user
+        self._set_status("Preparing print preview...")
+
+        def done(path, error):
+            self._set_status("")
+            if error:
+                shutil.rmtree(directory, ignore_errors=True)
+                messagebox.showerror("Print Failed", str(error), parent=self.root)
+                return
+            if self.user != user:
+                return  # Logged out meanwhile
+            if cache_key is not None:
+                self.print_cache = {cache_key: path}
+            webbrowser.open(path)
+
+        self.tasks.submit(lambda task: render_print_pages(entries, directory), done, serial=False)
+
+    def _clear_print_cache(self):
+        # The files stay until remove_stale_print_dirs at the next start
+        self.print_cache = {}
+
+    def _set_status(self, text):
+        if self.status_label is not None and self.status_label.winfo_exists():
+            self.status_label.config(text=text)
+
+    def _set_busy(self, busy):
+        self.root.config(cursor="watch" if busy else "")
+        # Tasks that report their own status (import, print) keep it
+        if self.status_label is not None and self.status_label.winfo_exists():
+            current = self.status_label.cget("text")
+            if busy and not current:
+                self.status_label.config(text="Working...")
+            elif not busy and current == "Working...":
+                self.status_label.config(text="")
+
+    def delete_entry(self, entry):
+        if not messagebox.askyesno("Confirm", "Move this entry to Recycle Bin?", parent=self.root):
+            return
+
+        def work(task):
+            idx = self.store.delete(entry.id)
+            return idx, self.store.generation
+
+        def done(result, error):
+            if error:
+                messagebox.showerror("Error", str(error), parent=self.root)
+                return
+            idx, generation = result
+            if idx is None:
+                self._entry_changed(self.root)
+            else:
+                self.patch_entries("remove", idx, generation=generation)
+
+        self.tasks.submit(work, done)
+
+    def delete_all_entries(self):
+        if messagebox.askyesno("Confirm", "Move all entries to Recycle Bin?", parent=self.root):
+            self.tasks.submit(lambda task: self.store.delete_all(), self._after_bulk_change)
+
+    def _after_bulk_change(self, result, error):
+        if error:
+            messagebox.showerror("Error", str(error), parent=self.root)
+        if self.address_list is not None and self.address_list.canvas.winfo_exists():
+            self.refresh_entries()
+
+    # --- Recycle Bin Operations ---
+
+    def open_recycle_bin(self):
+        if self.recycle_window is not None:
+            self.recycle_window.lift()
+            return
+
+        self.recycle_window = tk.Toplevel(self.root)
+        self.recycle_window.title("Recycle Bin")
+        self.recycle_window.geometry("920x620")
+        self.recycle_window.configure(bg='white')
+        self.recycle_window.protocol("WM_DELETE_WINDOW", self._close_recycle_window)
+
+        top_frame = tk.Frame(self.recycle_window, bg='white')
+        top_frame.pack(fill='x', padx=10, pady=6)
+
+        ttk.Button(top_frame, text="Recover All", style="Accent.TButton", command=self._recover_all).pack(side='left', padx=8)
+        ttk.Button(top_frame, text="Delete All Permanently", command=self._delete_all_permanent).pack(side='left', padx=8)
+        self.recycle_count_label = tk.Label(top_frame, font=FONT_LABEL, bg='white', fg='#555555')
+        self.recycle_count_label.pack(side='right', padx=8)
+
+        list_frame = tk.Frame(self.recycle_window, bg='white')
+        list_frame.pack(fill='both', expand=True, padx=10, pady=6)
+        list_frame.columnconfigure(0, weight=1)
+        list_frame.rowconfigure(0, weight=1)
+
+        # Only the rows in view are built, however full the bin is
+        self.recycle_list = VirtualList(list_frame, self.make_recycle_row, self.bind_recycle_row)
+        self.recycle_list.canvas.grid(row=0, column=0, sticky="nsew")
+        self.recycle_list.vscroll.grid(row=0, column=1, sticky="ns")
+        self.recycle_empty_label = tk.Label(list_frame, text="Recycle Bin is Empty", font=FONT_TITLE, bg='white')
+
+        self._populate_recycle_entries()
+
+    def _populate_recycle_entries(self):
+        def done(recycle_items, error):
+            if self.recycle_window is None:
+                return
+            if error:
+                messagebox.showerror("Error", str(error), parent=self.recycle_window)
+                return
+            self._fill_recycle_entries(recycle_items)
+
+        self.tasks.submit(lambda task: list(self.store.recycled()), done)
+
+    def _fill_recycle_entries(self, recycle_items):
+        self.recycle_list.set_items(recycle_items)
+        if recycle_items:
+            self.recycle_empty_label.place_forget()
+        else:
+            self.recycle_empty_label.place(relx=0.5, y=20, anchor='n')
+        max_age, max_entries = self.recycle_limits
+        limits = []
+        if max_age is not None:
+            limits.append(f"kept {max_age / 86400:g} days")
+        if max_entries is not None:
+            limits.append(f"at most {max_entries}")
+        self.recycle_count_label.config(
+            text=f"{len(recycle_items)} entries" + (f" ({', '.join(limits)})" if limits else ""))
+
+    def make_recycle_row(self, parent):
+        fr = tk.Frame(parent, bg=RECYCLE_BG, bd=1, relief='ridge')
+
+        fr.label = tk.Label(fr, font=FONT_LABEL, bg=RECYCLE_BG, justify='left', anchor='w')
+        fr.label.pack(side='left', padx=8, pady=6, fill='x', expand=True)
+
+        buttons_frame = tk.Frame(fr, bg=RECYCLE_BG)
+        buttons_frame.pack(side='right', padx=8, pady=6)
+
+        fr.btn_rec = tk.Button(buttons_frame, text="Recover", font=FONT_BTN, fg='white', bg=SUCCESS_COLOR,
+                               relief='flat')
+        fr.btn_del = tk.Button(buttons_frame, text="Delete", font=FONT_BTN, fg='white', bg=DANGER_COLOR,
+                               relief='flat')
+        fr.btn_rec.pack(side='left', padx=4)
+        fr.btn_del.pack(side='left', padx=4)
+        return fr
+
+    def bind_recycle_row(self, fr, idx, entry):
+        deleted = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.deleted))
+        text = '\n'.join(f"{k}: {' '.join(entry[k].split())}" for k in ADDRESS_FIELDS)
+        fr.label.config(text=f"{text}\nDeleted: {deleted}")
+        fr.btn_rec.config(command=lambda e=entry: self._recover_one(e))
+        fr.btn_del.config(command=lambda e=entry: self._delete_one(e))
+
+    def _recover_one(self, entry):
+        def work(task):
+            record = self.store.recover(entry.id)
+            if record is None:
+                return None
+            return self.store.position(record), record, self.store.generation
+
+        def done(result, error):
+            if error:
+                messagebox.showerror("Error", str(error), parent=self.recycle_window)
+                return
+            if result is None:
+                self._populate_recycle_entries()
+                return
+            messagebox.showinfo("Recovered", "Entry has been recovered.", parent=self.recycle_window)
+            self._close_recycle_window()
+            idx, record, generation = result
+            self.patch_entries("insert", idx, record, generation)
+
+        self.tasks.submit(work, done)
+
+    def _delete_one(self, entry):
+        answer = messagebox.askyesno("Confirm Delete", "Delete the selected entry permanently?", parent=self.recycle_window)
+        if not answer:
+            return
+
+        def work(task):
+            return self.store.purge(entry.id) is not None
+
+        def done(purged, error):
+            if error:
+                messagebox.showerror("Error", str(error), parent=self.recycle_window)
+                return
+            if not purged:
+                self._populate_recycle_entries()
+                return
+            messagebox.showinfo("Deleted", "Entry deleted permanently.", parent=self.recycle_window)
+            self._close_recycle_window()
+
+        self.tasks.submit(work, done)
+
+    def _recover_all(self):
+        def work(task):
+            if not self.store.recycled():
+                return False
+            self.store.recover_all()
+            return True
+
+        def done(recovered, error):
+            if error:
+                messagebox.showerror("Error", str(error), parent=self.recycle_window)
+                return
+            if not recovered:
+                messagebox.showinfo("Empty", "Recycle bin is empty.", parent=self.recycle_window)
+                return
+            messagebox.showinfo("Recovered", "All entries have been recovered.", parent=self.recycle_window)
+            self._close_recycle_window()
+            self._after_bulk_change(None, None)
+
+        self.tasks.submit(work, done)
+
+    def _delete_all_permanent(self):
+        answer = messagebox.askyesno("Confirm Delete", "Delete all entries permanently?", parent=self.recycle_window)
+        if not answer:
+            return
+
+        def work(task):
+            if not self.store.recycled():
+                return False
+            self.store.purge_all()
+            return True
+
+        def done(purged, error):
+            if error:
+                messagebox.showerror("Error", str(error), parent=self.recycle_window)
+                return
+            if not purged:
+                messagebox.showinfo("Empty", "Recycle bin is empty.", parent=self.recycle_window)
+                return
+            messagebox.showinfo("Deleted", "All entries deleted permanently.", parent=self.recycle_window)
+            self._close_recycle_window()
+
+        self.tasks.submit(work, done)
+
+    def _close_recycle_window(self):
+        if self.recycle_window is not None:
+            self.recycle_window.destroy()
+            self.recycle_window = None
+            self.recycle_list = None
+
+
+# --- Command line ---
+
+def format_entry_line(number, entry):
+    return f"{number}\t" + "\t".join(" ".join(entry[k].split()) for k in ADDRESS_FIELDS)
+
+
+def parse_numbers(values, rows):
+    """Record ids of the rows numbered (from 1, as in `list` output) by values."""
+    record_ids = {}
+    for value in values:
+        if not 1 <= value <= len(rows):
+            raise SystemExit(f"No entry number {value}.")
+        record_ids[rows[value - 1].id] = None
+    return list(record_ids)
+
+
+def filter_options(args):
+    return {field: getattr(args, field.lower()) for field in FILTER_FIELDS}
+
+
+def cmd_add(store, args):
+    entry = {k: getattr(args, k.lower()).strip() for k in ADDRESS_FIELDS}
+    missing = missing_fields(entry)
+    if missing:
+        raise SystemExit("All fields are required; missing: " + ", ".join(missing))
+    store.add(entry)
+    print("Entry saved.")
+
+
+def cmd_list(store, args):
+    if args.recycle:
+        for number, entry in enumerate(store.recycled(), 1):
+            print(format_entry_line(number, entry))
+        return
+    rows = store.view(sort=args.sort, descending=args.descending, filters=filter_options(args))
+    # Numbers are book positions, as used by delete, whatever the order
+    for position, entry in zip(store.positions_of(rows), rows):
+        print(format_entry_line(position + 1, entry))
+
+
+def cmd_count(store, args):
+    for value, count in store.count_by(args.by, query=args.query, filters=filter_options(args)):
+        print(f"{value}\t{count}")
+
+
+def cmd_search(store, args):
+    for entry in store.search(args.query):
+        print(format_entry_line(store.position(entry) + 1, entry))
+
+
+def cmd_delete(store, args):
+    if args.all:
+        store.delete_all()
+    elif not args.numbers:
+        raise SystemExit("Give entry numbers or --all.")
+    else:
+        for record_id in parse_numbers(args.numbers, store.addresses()):
+            store.delete(record_id)
+    print("Moved to Recycle Bin.")
+
+
+def cmd_recover(store, args):
+    if args.all:
+        store.recover_all()
+    elif not args.numbers:
+        raise SystemExit("Give entry numbers or --all.")
+    else:
+        for record_id in parse_numbers(args.numbers, store.recycled()):
+            store.recover(record_id)
+    print("Recovered.")
+
+
+def cmd_claim(books, args):
+    if args.user is None:
+        raise SystemExit("Give the account to move the shared book to with --user.")
+    moved = claim_shared_book(books, args.user)
+    print(f"Moved {moved} entries from the shared book to {args.user}'s.")
+
+
+def cmd_expire(store, args):
+    max_age, max_entries = recycle_limits()
+    if args.days is not None:
+        max_age = args.days * 86400 if args.days > 0 else None
+    if args.max_entries is not None:
+        max_entries = args.max_entries if args.max_entries > 0 else None
+    print(f"Purged {store.expire(max_age, max_entries)} entries from the Recycle Bin.")
+
+
+def cmd_import(store, args):
+    def progress(stats):
+        print(f"\r{stats.read} read, {stats.imported} imported, {stats.rows_per_sec:,.0f} rows/sec",
+              end="", file=sys.stderr, flush=True)
+
+    stats = import_file(store, args.file, batch_size=args.batch_size, progress=progress)
+    print(file=sys.stderr)
+    for error in stats.errors:
+        print(error, file=sys.stderr)
+    print(stats.summary())
+
+
+def cmd_export(store, args):
+    rows = store.recycled() if args.recycle else store.addresses()
+    fmt = args.format or export_format_for(args.file)
+    if args.file == "-":
+        export_entries(rows, sys.stdout, fmt)
+        return
+    newline = '' if fmt in ("csv", "vcf") else None
+    with open(args.file, 'w', newline=newline, encoding='utf-8') as f:
+        export_entries(rows, f, fmt)
+    print(f"Exported {len(rows)} entries to {args.file}.", file=sys.stderr)
+
+
+def cmd_dedupe(store, args):
+    groups = store.duplicate_groups()
+    addresses = store.addresses()
+    merges = []
+    for positions, reasons in groups:
+        print(", ".join(reasons))
+        for position in positions:
+            print(format_entry_line(position + 1, addresses[position]))
+        merged = addresses[positions[0]]
+        for position in positions[1:]:
+            merged = merge_entries(merged, addresses[position])
+        print("  merge into " + str(positions[0] + 1) + ":\t" +
+              "\t".join(" ".join(merged[k].split()) for k in ADDRESS_FIELDS))
+        print()
+        merges.append((addresses[positions[0]].id, [addresses[p].id for p in positions[1:]], merged))
+    if not groups:
+        print("No likely duplicates found.")
+    elif args.merge:
+        store.merge(merges)
+        print(f"Merged {len(groups)} groups; the extra entries are in the recycle bin.")
+    else:
+        print(f"{len(groups)} groups of likely duplicates. Run with --merge to merge them.")
+
+
+def cmd_hash_benchmark(args):
+    current = PasswordHasher.from_config(load_config())
+    n, r, p = current.scrypt_params
+    settings = [PasswordHasher("scrypt", 2 ** e, r, p) for e in range(12, 17)]
+    settings += [PasswordHasher("pbkdf2", pbkdf2_iterations=i) for i in (100000, 300000, 600000, 1200000)]
+    if not any(str(h) == str(current) for h in settings):
+        settings.append(current)
+    for hasher, rate in benchmark_hashers(settings, args.seconds):
+        marker = "*" if str(hasher) == str(current) else " "
+        print(f"{marker} {hasher}\t{rate:,.1f} logins/sec")
+
+
+def add_filter_arguments(parser):
+    parser.add_argument("--type", choices=ADDRESS_TYPES, help="only entries of this type")
+    parser.add_argument("--state", help="only entries in this state")
+    parser.add_argument("--country", help="only entries in this country")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="addressbook",
+        description="Secure Address Book. Run without a command to open the window.",
+    )
+    parser.add_argument("--user", help="work on this account's address book instead of the shared one")
+    parser.add_argument("--startup-time", action="store_true",
+                        help="open the window, print how long it took to draw, and exit")
+    commands = parser.add_subparsers(dest="command")
+
+    add = commands.add_parser("add", help="add an entry")
+    defaults = {"State": "Delhi", "Country": "India", "Type": "Personal"}
+    for field in ADDRESS_FIELDS:
+        add.add_argument("--" + field.lower(), default=defaults.get(field, ""))
+    add.set_defaults(func=cmd_add)
+
+    list_cmd = commands.add_parser("list", help="list entries with their numbers")
+    list_cmd.add_argument("--recycle", action="store_true", help="list the recycle bin instead")
+    list_cmd.add_argument("--sort", choices=SORT_FIELDS, help="order by this field instead of book order")
+    list_cmd.add_argument("--descending", action="store_true")
+    add_filter_arguments(list_cmd)
+    list_cmd.set_defaults(func=cmd_list)
+
+    count = commands.add_parser("count", help="count entries per state, country or type")
+    count.add_argument("--by", choices=ENCODED_FIELDS, default="State", help="group by this field (default: State)")
+    count.add_argument("--query", default="", help="only entries matching this search")
+    add_filter_arguments(count)
+    count.set_defaults(func=cmd_count)
+
+    search = commands.add_parser("search", help="search entries")
+    search.add_argument("query")
+    search.set_defaults(func=cmd_search)
+
+    delete = commands.add_parser("delete", help="move entries to the recycle bin")
+    delete.add_argument("numbers", nargs="*", type=int)
+    delete.add_argument("--all", action="store_true")
+    delete.set_defaults(func=cmd_delete)
+
+    recover = commands.add_parser("recover", help="restore entries from the recycle bin")
+    recover.add_argument("numbers", nargs="*", type=int)
+    recover.add_argument("--all", action="store_true")
+    recover.set_defaults(func=cmd_recover)
+
+    expire = commands.add_parser("expire", help="purge recycle bin entries past the retention limits")
+    expire.add_argument("--days", type=float, help="purge entries deleted longer ago (default: from the config)")
+    expire.add_argument("--max-entries", type=int, help="keep at most this many entries (default: from the config)")
+    expire.set_defaults(func=cmd_expire)
+
+    claim = commands.add_parser("claim", help="move the shared book into the --user account's book")
+    claim.set_defaults(func=cmd_claim, whole_backend=True)
+
+    import_cmd = commands.add_parser("import", help="import entries from a CSV or vCard (.vcf) file")
+    import_cmd.add_argument("file")
+    import_cmd.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    import_cmd.set_defaults(func=cmd_import)
+
+    export = commands.add_parser("export", help="export entries to CSV, JSON Lines or vCard ('-' for stdout)")
+    export.add_argument("file")
+    export.add_argument("--format", choices=sorted(EXPORT_FORMATS),
+                        help="defaults to the file extension, or csv")
+    export.add_argument("--recycle", action="store_true", help="export the recycle bin instead")
+    export.set_defaults(func=cmd_export)
+
+    dedupe = commands.add_parser("dedupe", help="find likely duplicate entries and suggest merges")
+    dedupe.add_argument("--merge", action="store_true",
+                        help="apply the suggested merges, moving the extra entries to the recycle bin")
+    dedupe.set_defaults(func=cmd_dedupe)
+
+    bench = commands.add_parser("hash-benchmark", help="measure logins/sec for password hash settings")
+    bench.add_argument("--seconds", type=float, default=1.0, help="time spent on each setting")
+    bench.set_defaults(func=cmd_hash_benchmark, standalone=True)
+
+    return parser
+
+
+def run_gui(started=None):
+    """Open the window. With started (a time.perf_counter() value), only
+    report the time until the first window is drawn, then close it."""
+    if tk is None:
+        raise SystemExit("Tkinter is not installed; only the command line "
+                         "interface is available (see --help).")
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        raise SystemExit(f"Cannot open the window: {e}")
+    root.geometry("1230x740")
+    root.title("Secure Address Book")
+    app = AddressBookApp(root)
+    try:
+        if started is None:
+            root.mainloop()
+        else:
+            root.update()
+            print(f"First window drawn in {time.perf_counter() - started:.3f}s.")
+    finally:
+        # Lets queued writes reach the disk before the backend is closed
+        app.close()
+
+
+def main(argv=None):
+    started = time.perf_counter()
+    args = build_parser().parse_args(argv)
+    init_data()
+    if args.command is None:
+        run_gui(started if args.startup_time else None)
+        return
+    if getattr(args, "standalone", False):
+        args.func(args)
+        return
+    books, user_backend = open_backends()
+    try:
+        if args.user is not None and UserIndex(user_backend).find(args.user) is None:
+            raise SystemExit(f"No account named {args.user!r}.")
+        if getattr(args, "whole_backend", False):
+            args.func(books, args)
+            return
+        address_backend = books.open(args.user)
+        try:
+            args.func(AddressStore(address_backend), args)
+        finally:
+            address_backend.close()
+    finally:
+        books.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2899 @@
+"""The address book without its window: records, journal and SQLite
+storage, accounts and passwords, search, import, export and duplicate
+detection. It never imports Tk, so scripts and servers can use it on
+installs without a display; addressbook.py builds the window and the
+command line on top of it.
+"""
+
+import base64
+import configparser
+import csv
+import difflib
+import hashlib
+import heapq
+import hmac
+import html
+import io
+import json
+import os
+import re
+import secrets
+import shutil
+import sqlite3
+import string
+import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from itertools import groupby, islice
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: FileLock then only guards the threads of this process
+    fcntl = None
+
+# --- Data folder and files ---
+DATA_FOLDER = "data"
+
+USER_FILE = os.path.join(DATA_FOLDER, "users.csv")
+ADDRESS_FILE = os.path.join(DATA_FOLDER, "address_book.csv")
+RECYCLE_FILE = os.path.join(DATA_FOLDER, "recycle_bin.csv")
+JOURNAL_FILE = os.path.join(DATA_FOLDER, "journal.csv")
+DATABASE_FILE = os.path.join(DATA_FOLDER, "address_book.db")
+# One folder per account holding its own address book, recycle bin and journal
+BOOKS_FOLDER = os.path.join(DATA_FOLDER, "books")
+CONFIG_FILE = os.path.join(DATA_FOLDER, "config.ini")
+
+DEFAULT_CONFIG = {
+    "storage": {
+        # "csv" (journaled CSV files) or "sqlite" (DATABASE_FILE)
+        "backend": "csv",
+    },
+    "security": {
+        # "scrypt" or "pbkdf2". Stored hashes made with other settings are
+        # upgraded the next time their owner logs in
+        "password_hash": "scrypt",
+        "scrypt_n": 2 ** 14,
+        "scrypt_r": 8,
+        "scrypt_p": 1,
+        "pbkdf2_iterations": 600000,
+    },
+    "recycle": {
+        # Entries deleted longer ago than this are purged for good, as are
+        # the oldest ones past max_entries; 0 turns either limit off
+        "retention_days": 30,
+        "max_entries": 10000,
+    },
+}
+
+# Number of journal records after which the log is folded back into the CSVs
+JOURNAL_COMPACT_THRESHOLD = 1000
+
+USER_FIELDS = ["Username", "Email", "Mobile", "Password"]
+ADDRESS_FIELDS = [
+    "Name", "Phone", "Email", "Address", "City",
+    "State", "Pincode", "Country", "Type"
+]
+# Columns of the stored address book and recycle bin: each record's id
+# first, and in the bin the time it was deleted last
+RECORD_FIELDS = ["Id"] + ADDRESS_FIELDS
+RECYCLE_FIELDS = RECORD_FIELDS + ["Deleted"]
+
+# Fields the list can be sorted and filtered by
+SORT_FIELDS = ["Name", "City", "State", "Type"]
+FILTER_FIELDS = ["Type", "State", "Country"]
+
+# Fields whose words also match search terms as prefixes
+SEARCH_PREFIX_FIELDS = ["Name", "Email", "City"]
+SEARCH_OTHER_FIELDS = [k for k in ADDRESS_FIELDS if k not in SEARCH_PREFIX_FIELDS]
+
+# --- Indian States ---
+INDIAN_STATES = [
+    "Andhra Pradesh", "Arunachal Pradesh", "Assam", "Bihar", "Chhattisgarh",
+    "Goa", "Gujarat", "Haryana", "Himachal Pradesh", "Jharkhand",
+    "Karnataka", "Kerala", "Madhya Pradesh", "Maharashtra", "Manipur",
+    "Meghalaya", "Mizoram", "Nagaland", "Odisha", "Punjab", "Rajasthan",
+    "Sikkim", "Tamil Nadu", "Telangana", "Tripura", "Uttar Pradesh",
+    "Uttarakhand", "West Bengal", "Andaman and Nicobar Islands",
+    "Chandigarh", "Dadra and Nagar Haveli and Daman and Diu", "Delhi",
+    "Jammu & Kashmir", "Ladakh", "Lakshadweep", "Puducherry"
+]
+
+# --- Countries ---
+COUNTRIES = [
+    # List shortened for brevity; expand as needed
+    "Afghanistan","Albania","Algeria","Andorra","Angola","Argentina","Armenia","Australia","Austria","Azerbaijan",
+    "Bahamas","Bahrain","Bangladesh","Barbados","Belarus","Belgium","Belize","Bhutan","Bolivia","Bosnia and Herzegovina",
+    "Brazil","Brunei","Bulgaria","Burkina Faso","Burundi","Cambodia","Cameroon","Canada","Cape Verde","Central African Republic",
+    "Chad","Chile","China","Colombia","Comoros","Congo (Brazzaville)","Congo (Kinshasa)","Costa Rica","Croatia","Cuba",
+    "Cyprus","Czech Republic","Denmark","Djibouti","Dominica","Dominican Republic","East Timor","Ecuador","Egypt","El Salvador",
+    "Equatorial Guinea","Eritrea","Estonia","Ethiopia","Fiji","Finland","France","Gabon","Gambia","Georgia","Germany","Ghana",
+    "Greece","Grenada","Guatemala","Guinea","Guinea-Bissau","Guyana","Haiti","Honduras","Hungary","Iceland","India","Indonesia",
+    "Iran","Iraq","Ireland","Israel","Italy","Jamaica","Japan","Jordan","Kazakhstan","Kenya","Kiribati","Korea, North","Korea, South",
+    "Kuwait","Kyrgyzstan","Laos","Latvia","Lebanon","Lesotho","Liberia","Libya","Liechtenstein","Lithuania","Luxembourg","Madagascar",
+    "Malawi","Malaysia","Maldives","Mali","Malta","Marshall Islands","Mauritania","Mauritius","Mexico","Micronesia","Moldova",
+    "Monaco","Montenegro","Morocco","Mozambique","Myanmar","Namibia","Nauru","Nepal","Netherlands","New Zealand","Nicaragua",
+    "Niger","Nigeria","Norway","Oman","Pakistan","Palau","Panama","Papua New Guinea","Paraguay","Peru","Philippines","Poland",
+    "Portugal","Qatar","Romania","Russia","Rwanda","Saint Kitts and Nevis","Saint Lucia","Saint Vincent and the Grenadines","Samoa",
+    "San Marino","Sao Tome and Principe","Saudi Arabia","Senegal","Serbia","Seychelles","Sierra Leone","Singapore","Slovakia",
+    "Slovenia","Solomon Islands","Somalia","South Africa","Spain","Sri Lanka","Sudan","Suriname","Swaziland","Sweden","Switzerland",
+    "Syria","Taiwan","Tajikistan","Tanzania","Thailand","Togo","Tonga","Trinidad and Tobago","Tunisia","Turkey","Turkmenistan",
+    "Tuvalu","Uganda","Ukraine","United Arab Emirates","United Kingdom","United States","Uruguay","Uzbekistan","Vanuatu",
+    "Vatican City","Venezuela","Vietnam","Yemen","Zambia","Zimbabwe"
+]
+
+ADDRESS_TYPES = ["Personal", "Business"]
+
+# --- Utility functions ---
+
+def read_csv(filename):
+    if os.path.exists(filename):
+        with open(filename, newline='', encoding='utf-8') as f:
+            return list(csv.DictReader(f))
+    return []
+
+
+def read_addresses(filename):
+    """Like read_csv, but returning Address records."""
+    if not os.path.exists(filename):
+        return []
+    with open(filename, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return []
+        if header == RECORD_FIELDS:
+            return [Address.from_values(row[1:], int(row[0])) for row in reader if row]
+        if header == RECYCLE_FIELDS:
+            return [RecycledAddress.of(Address.from_values(row[1:-1], int(row[0])), int(row[-1]))
+                    for row in reader if row]
+        if header == ADDRESS_FIELDS:
+            return [Address.from_values(row) for row in reader if row]
+        # Columns in another order, or missing, as csv.DictReader would allow;
+        # files written before record ids have no Id column, and before
+        # deletion times no Deleted column
+        columns = [header.index(k) if k in header else None for k in ADDRESS_FIELDS]
+        id_column = header.index("Id") if "Id" in header else None
+        deleted_column = header.index("Deleted") if "Deleted" in header else None
+
+        def number(row, column):
+            value = row[column] if column is not None and column < len(row) else ""
+            return int(value) if value else None
+
+        records = []
+        for row in reader:
+            if not row:
+                continue
+            record = Address.from_values([row[i] if i is not None and i < len(row) else "" for i in columns],
+                                         number(row, id_column))
+            deleted = number(row, deleted_column)
+            records.append(record if deleted is None else RecycledAddress.of(record, deleted))
+        return records
+
+
+def fsync_dir(path):
+    # Make renames durable; not supported on every platform (e.g. Windows)
+    try:
+        fd = os.open(path or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def stage_csv(filename, data, fields):
+    """Write data to filename + ".tmp" and fsync it, without touching filename."""
+    tmp = filename + ".tmp"
+    with open(tmp, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(data)
+        f.flush()
+        os.fsync(f.fileno())
+    return tmp
+
+
+def write_csv(filename, data, fields):
+    # Never truncate in place: a crash leaves either the old or the new file
+    os.replace(stage_csv(filename, data, fields), filename)
+    fsync_dir(os.path.dirname(filename))
+
+
+def init_data(folder=DATA_FOLDER):
+    """Create the data folder on first run.
+
+    The CSV files are created by their first write; until then every reader
+    treats a missing file as empty, so starting up costs no file writes.
+    """
+    os.makedirs(folder, exist_ok=True)
+
+
+def load_config(filename=CONFIG_FILE):
+    config = configparser.ConfigParser()
+    config.read_dict(DEFAULT_CONFIG)
+    config.read(filename, encoding='utf-8')
+    return config
+
+
+class FileLock:
+    """Exclusive advisory lock shared by the threads of this process.
+
+    Re-entrant like threading.RLock. Across processes it is an fcntl.flock
+    on path, which other instances working on the same data folder take
+    before writing, so it only excludes them and no other programs.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def acquire(self):
+        self._lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            except BaseException:
+                if self._fd is not None:
+                    os.close(self._fd)
+                    self._fd = None
+                self._lock.release()
+                raise
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            # Closing the descriptor drops the flock
+            os.close(self._fd)
+            self._fd = None
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def stat_signature(paths):
+    """(mtime, size) of each path, used to notice changes made by other processes."""
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            signature.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+# --- Address records ---
+
+_ADDRESS_KEYS = dict.fromkeys(ADDRESS_FIELDS).keys()
+# Fields limited to a known set of values, kept as small integer codes
+ENCODED_FIELDS = ["State", "Country", "Type"]
+# The free-text fields are packed into one string, joined by the ASCII unit separator
+ADDRESS_PACKED_FIELDS = [k for k in ADDRESS_FIELDS if k not in ENCODED_FIELDS and k != "City"]
+_PACKED_INDEX = {k: i for i, k in enumerate(ADDRESS_PACKED_FIELDS)}
+_ENCODED_INDEX = {k: i for i, k in enumerate(ENCODED_FIELDS)}
+_UNIT_SEPARATOR = "\x1f"
+
+
+class Codebook:
+    """Dictionary encoding of one column: each distinct value gets a small int.
+
+    Codes are handed out in first-seen order starting from the column's known
+    values, so those always have the same code (their list index). Values
+    outside the list (older or hand-edited files) are added on first use.
+    """
+
+    def __init__(self, values=()):
+        self.values = []
+        self.codes = {}
+        self.lock = threading.Lock()
+        for value in values:
+            self.encode(value)
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            with self.lock:
+                code = self.codes.get(value)
+                if code is None:
+                    # values first, so a code is never seen before its value
+                    code = len(self.values)
+                    self.values.append(value)
+                    self.codes[value] = code
+        return code
+
+    def decode(self, code):
+        return self.values[code]
+
+
+# The known values of each of ENCODED_FIELDS, in code order
+FIELD_VALUES = {"State": INDIAN_STATES, "Country": COUNTRIES, "Type": ADDRESS_TYPES}
+CODEBOOKS = {field: Codebook(values) for field, values in FIELD_VALUES.items()}
+_CODEBOOK_LIST = [CODEBOOKS[field] for field in ENCODED_FIELDS]
+# (State, Country, Type) values -> their code tuple, shared by the records using it
+_CODE_TUPLES = {}
+
+
+class Address:
+    """One address book entry.
+
+    Compact, slotted record used for every cached row instead of a dict. The
+    free-text fields share one packed string (one object header instead of
+    five), City is interned, and State, Country and Type are stored as one
+    shared tuple of codes from CODEBOOKS (see ENCODED_FIELDS), so filters
+    and group-bys on them compare small ints. The unit separator used for
+    packing is a control character no form or file legitimately contains,
+    so it is replaced by a space in field values.
+
+    Records are read-only and behave like a dict for reading (entry["Name"],
+    get, keys, items), which is all csv.DictWriter and the rest of the code
+    need. id is the record's stable id in its book (entry["Id"] when written
+    out), assigned by AddressStore when the record is first stored and kept
+    when it moves to the recycle bin and back; it is None until then.
+    """
+
+    __slots__ = ("_packed", "City", "codes", "id")
+
+    def __init__(self, name, phone, email, address, city, state, pincode, country, entry_type, record_id=None):
+        packed = _UNIT_SEPARATOR.join((name, phone, email, address, pincode))
+        if packed.count(_UNIT_SEPARATOR) != len(ADDRESS_PACKED_FIELDS) - 1:
+            packed = _UNIT_SEPARATOR.join(v.replace(_UNIT_SEPARATOR, " ")
+                                          for v in (name, phone, email, address, pincode))
+        self._packed = packed
+        self.City = sys.intern(city)
+        key = (state, country, entry_type)
+        codes = _CODE_TUPLES.get(key)
+        if codes is None:
+            codes = _CODE_TUPLES.setdefault(key, tuple(book.encode(value)
+                                                       for book, value in zip(_CODEBOOK_LIST, key)))
+        self.codes = codes
+        self.id = record_id
+
+    @classmethod
+    def from_values(cls, values, record_id=None):
+        """Record from field values in ADDRESS_FIELDS order, padding short rows."""
+        if len(values) != len(ADDRESS_FIELDS):
+            values = (list(values) + [""] * len(ADDRESS_FIELDS))[:len(ADDRESS_FIELDS)]
+        return cls(*values, record_id)
+
+    @classmethod
+    def from_mapping(cls, entry):
+        if isinstance(entry, cls):
+            return entry
+        return cls(*[entry.get(k) or "" for k in ADDRESS_FIELDS])
+
+    def with_id(self, record_id):
+        """Copy of the record under another id."""
+        copy = Address.__new__(Address)
+        copy._packed, copy.City, copy.codes, copy.id = self._packed, self.City, self.codes, record_id
+        return copy
+
+    def code(self, field):
+        """Code of field (one of ENCODED_FIELDS) in CODEBOOKS[field]."""
+        return self.codes[_ENCODED_INDEX[field]]
+
+    def __getitem__(self, key):
+        index = _PACKED_INDEX.get(key)
+        if index is not None:
+            return self._packed.split(_UNIT_SEPARATOR)[index]
+        index = _ENCODED_INDEX.get(key)
+        if index is not None:
+            return _CODEBOOK_LIST[index].values[self.codes[index]]
+        if key == "City":
+            return self.City
+        if key == "Id":
+            return self.id
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        return self[key] if key in _ADDRESS_KEYS or key == "Id" else default
+
+    def keys(self):
+        return _ADDRESS_KEYS
+
+    def values(self):
+        name, phone, email, address, pincode = self._packed.split(_UNIT_SEPARATOR)
+        state, country, entry_type = [book.values[code] for book, code in zip(_CODEBOOK_LIST, self.codes)]
+        return [name, phone, email, address, self.City, state, pincode, country, entry_type]
+
+    def items(self):
+        return list(zip(ADDRESS_FIELDS, self.values()))
+
+    def __iter__(self):
+        return iter(ADDRESS_FIELDS)
+
+    def __len__(self):
+        return len(ADDRESS_FIELDS)
+
+    def __contains__(self, key):
+        return key in _ADDRESS_KEYS
+
+    def __repr__(self):
+        return f"Address({dict(self.items())!r})"
+
+
+class RecycledAddress(Address):
+    """An Address in the recycle bin, with the time it was deleted.
+
+    deleted is in whole seconds since the epoch (entry["Deleted"] when
+    written out). Only bin entries pay for the extra slot; with_id() gives
+    the plain Address back when an entry is recovered.
+    """
+
+    __slots__ = ("deleted",)
+
+    @classmethod
+    def of(cls, entry, deleted):
+        record = cls.__new__(cls)
+        record._packed, record.City, record.codes, record.id = entry._packed, entry.City, entry.codes, entry.id
+        record.deleted = deleted
+        return record
+
+    def __getitem__(self, key):
+        if key == "Deleted":
+            return self.deleted
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        if key == "Deleted":
+            return self.deleted
+        return super().get(key, default)
+
+
+# --- Journal storage ---
+
+class Journal:
+    """Append-only log of address book and recycle bin mutations.
+
+    Each mutation is a single CSV record appended to JOURNAL_FILE, naming the
+    entry by its record id, so adding, editing or deleting one entry costs
+    O(1) I/O regardless of the book size.
+    The canonical CSV files are only rewritten by compact(), which runs in a
+    background thread once the log grows past the threshold.
+
+    Records written together by append_many() form one batch: they are
+    written with a single fsync'd write ending in a commit marker, and replay
+    ignores a batch whose marker never made it to disk. A move between the
+    address book and the recycle bin therefore happens entirely or not at
+    all. compact() stages both CSVs, records the renames in a commit file and
+    only then renames, so an interrupted compaction is rolled forward on the
+    next start.
+
+    Several processes can share the files: file_lock is held around every
+    append and the renames of a compaction, and compact_lock serializes
+    compactions and recovery. Appends by others are picked up with poll(),
+    which reads only the journal tail past the last batch this Journal has
+    seen.
+    """
+
+    HEADER = ["#journal", "3"]
+    # Version 2 (and headerless) journals name entries by position instead
+    POSITIONAL_HEADER = ["#journal", "2"]
+    COMMIT = ["commit"]
+
+    def __init__(self, filename=JOURNAL_FILE, tables=None, threshold=JOURNAL_COMPACT_THRESHOLD):
+        self.filename = filename
+        self.compacting_file = filename + ".compacting"
+        self.commit_file = filename + ".commit"
+        self.tables = tables or {"address": ADDRESS_FILE, "recycle": RECYCLE_FILE}
+        self.threshold = threshold
+        self.lock = threading.RLock()
+        self.file_lock = FileLock(filename + ".lock")
+        self.compact_lock = FileLock(filename + ".compact.lock")
+        self.external_changes = 0
+        self._known_stats = None
+        # Byte offset in the journal up to which its records are in the last
+        # load_all() result (plus appends since), and the file's identity
+        self._offset = None
+        self._journal_key = None
+        with self.compact_lock, self.lock:
+            self._recover()
+            # Positional journals are folded into the CSVs, which gives their
+            # entries ids, before anything is appended to them
+            while self._positional(self.compacting_file) or self._positional(self.filename):
+                self._compact()
+        self.records = sum(1 for _ in self._read_records(self.filename))
+        self._compactor = None
+        if self.records >= self.threshold or os.path.exists(self.compacting_file):
+            self.compact_async()
+
+    def _recover(self):
+        if os.path.exists(self.commit_file):
+            self._roll_forward()
+        with self.file_lock:
+            self._cut_torn_tail()
+        # Staged files without a commit file belong to an unfinished compaction
+        for path in self.tables.values():
+            if os.path.exists(path + ".tmp"):
+                os.remove(path + ".tmp")
+
+    def _cut_torn_tail(self):
+        # Truncate the journal just past its last commit marker. What follows
+        # is a batch whose writer died mid-write; appending after it would
+        # join the next record onto its torn line and commit its records
+        # along with the next batch. Call with file_lock held
+        try:
+            f = open(self.filename, 'r+b')
+        except FileNotFoundError:
+            return
+        with f:
+            size = f.seek(0, os.SEEK_END)
+            if size == self._offset and self._file_key(f) == self._journal_key:
+                return
+            if self._offset and self._offset <= size and self._file_key(f) == self._journal_key:
+                # Only what others appended since this Journal last read it
+                end = self._offset
+            else:
+                f.seek(0)
+                header = f.readline()
+                if not header.endswith(b"\n"):
+                    # Torn before even the header was written
+                    header = b""
+                if next(csv.reader([header.decode('utf-8', 'replace')]), None) in (self.HEADER,
+                                                                                     self.POSITIONAL_HEADER):
+                    end = len(header)
+                elif header:
+                    # Headerless journals predate commit markers
+                    return
+                else:
+                    end = 0
+            if end:
+                for _, end in self._batches(f, end):
+                    pass
+            if end < size:
+                f.truncate(end)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _read_records(self, filename):
+        """Yield the records of every batch that reached its commit marker."""
+        if not os.path.exists(filename):
+            return
+        with open(filename, 'rb') as f:
+            for records, _ in self._batches(f):
+                yield from records
+
+    def _positional(self, filename):
+        try:
+            with open(filename, newline='', encoding='utf-8') as f:
+                header = next(csv.reader(f), None)
+        except FileNotFoundError:
+            return False
+        return header is not None and header != self.HEADER
+
+    def _batches(self, f, start=0):
+        """Yield (records, end) for each committed batch in the binary file f
+        from byte offset start (0 or the end of an earlier batch), end being
+        the offset just past the batch's commit marker.
+
+        Records are (table, op, record id, entry), or (table, op, position,
+        entry) in positional journals; entries added to the recycle bin have
+        their deletion time in an extra last column. Journals without a
+        header predate batch commits; all their records form one batch, and
+        end is None.
+        """
+        position = start
+
+        def lines():
+            nonlocal position
+            for line in f:
+                position += len(line)
+                yield line.decode('utf-8')
+
+        f.seek(start)
+        reader = csv.reader(lines())
+        batched, keyed = start > 0, True
+        if not batched:
+            header = next(reader, None)
+            batched = header in (self.HEADER, self.POSITIONAL_HEADER)
+            keyed = header == self.HEADER
+            if not batched:
+                position = 0
+                f.seek(0)
+                reader = csv.reader(lines())
+        pending = []
+        try:
+            for row in reader:
+                if row == self.COMMIT:
+                    yield pending, position
+                    pending = []
+                elif len(row) == 3 + len(ADDRESS_FIELDS):
+                    table, op, key = row[:3]
+                    key = int(key) if key else None
+                    entry = Address.from_values(row[3:], key if keyed else None)
+                    pending.append((table, op, key, entry))
+                elif len(row) == 4 + len(ADDRESS_FIELDS):
+                    table, op, key = row[:3]
+                    key = int(key)
+                    entry = RecycledAddress.of(Address.from_values(row[3:-1], key), int(row[-1]))
+                    pending.append((table, op, key, entry))
+        except (csv.Error, UnicodeDecodeError):
+            # A torn final batch; it was never committed
+            pass
+        if not batched:
+            yield pending, None
+
+    @staticmethod
+    def _file_key(f):
+        st = os.fstat(f.fileno())
+        return st.st_dev, st.st_ino
+
+    @staticmethod
+    def apply(rows, op, pos, entry):
+        if op == "add":
+            rows.append(entry)
+        elif op == "update":
+            rows[pos] = entry
+        elif op == "delete":
+            del rows[pos]
+        elif op == "clear":
+            rows.clear()
+
+    @staticmethod
+    def apply_keyed(rows, op, record_id, entry):
+        # rows maps record id to entry, in book order
+        if op in ("add", "update"):
+            rows[record_id] = entry
+        elif op == "delete":
+            del rows[record_id]
+        elif op == "clear":
+            rows.clear()
+
+    @staticmethod
+    def _number(tables):
+        # Entries from files written before record ids get the next free
+        # ids in file order, the same ones every time they are read
+        next_id = max((row.id for rows in tables.values() for row in rows if row.id is not None), default=0) + 1
+        for rows in tables.values():
+            for row in rows:
+                if row.id is None:
+                    row.id = next_id
+                    next_id += 1
+
+    def _tables_of(self, keyed):
+        # Lists from _replay's dicts. Bin entries from before deletion times
+        # count as deleted when the bin or the journal was last written, so
+        # none of them expires early
+        tables = {name: list(rows.values()) for name, rows in keyed.items()}
+        recycle = tables["recycle"]
+        if not all(isinstance(row, RecycledAddress) for row in recycle):
+            stats = stat_signature([self.tables["recycle"], self.compacting_file, self.filename])
+            default = max((st[0] // 10 ** 9 for st in stats if st is not None), default=int(time.time()))
+            tables["recycle"] = [row if isinstance(row, RecycledAddress) else RecycledAddress.of(row, default)
+                                 for row in recycle]
+        return tables
+
+    def _replay(self, filenames):
+        """The tables after the records of filenames, as {id: entry} dicts."""
+        tables = {name: read_addresses(path) for name, path in self.tables.items()}
+        self._number(tables)
+        keyed = {name: {row.id: row for row in rows} for name, rows in tables.items()}
+        for filename in filenames:
+            if self._positional(filename):
+                tables = {name: list(rows.values()) for name, rows in keyed.items()}
+                for table, op, pos, entry in self._read_records(filename):
+                    self.apply(tables[table], op, pos, entry)
+                self._number(tables)
+                keyed = {name: {row.id: row for row in rows} for name, rows in tables.items()}
+            else:
+                for table, op, record_id, entry in self._read_records(filename):
+                    self.apply_keyed(keyed[table], op, record_id, entry)
+        return keyed
+
+    def signature(self):
+        """Count of changes made by other processes, detected by file mtime/size.
+
+        Writes and compactions done by this Journal update the expected file
+        stats themselves, so they do not make callers reload their caches.
+        """
+        with self.lock:
+            self._check_external()
+            return self.external_changes
+
+    def _stats(self):
+        return stat_signature(list(self.tables.values()) + [self.compacting_file, self.filename])
+
+    def stale(self):
+        """Whether the files changed since this Journal last looked. Takes no
+        lock, so the UI can ask it cheaply; signature() gives the answer."""
+        return self._stats() != self._known_stats
+
+    def _check_external(self):
+        stats = self._stats()
+        if stats != self._known_stats:
+            self.external_changes += 1
+            self._known_stats = stats
+
+    def load_all(self):
+        with self.lock:
+            tables = self._replay([self.compacting_file])
+            self._offset, self._journal_key = 0, None
+            try:
+                f = open(self.filename, 'rb')
+            except FileNotFoundError:
+                f = None
+            if f is not None:
+                with f:
+                    self._journal_key = self._file_key(f)
+                    for records, self._offset in self._batches(f):
+                        for table, op, record_id, entry in records:
+                            self.apply_keyed(tables[table], op, record_id, entry)
+            return self._tables_of(tables)
+
+    def poll(self):
+        """Records other processes appended since the last load_all(), poll()
+        or append, oldest first.
+
+        Returns None if they did more than append (e.g. compacted); then
+        signature() changes and the data has to be loaded again.
+        """
+        with self.lock:
+            stats = self._stats()
+            if stats == self._known_stats:
+                return []
+            # Only the journal (the last stat) may have changed
+            if self._known_stats is None or stats[:-1] != self._known_stats[:-1] or self._offset is None:
+                return None
+            try:
+                f = open(self.filename, 'rb')
+            except FileNotFoundError:
+                return None
+            with f:
+                key = self._file_key(f)
+                if key != self._journal_key and not (self._journal_key is None and self._offset == 0):
+                    return None
+                records = []
+                for batch, self._offset in self._batches(f, self._offset):
+                    records.extend(batch)
+            self._journal_key = key
+            self._known_stats = stats
+            return records
+
+    def load(self, table):
+        return self.load_all()[table]
+
+    def append(self, table, op, record_id=None, entry=None):
+        self.append_many([(table, op, record_id, entry)])
+
+    def append_many(self, records):
+        """Write (table, op, record id, entry) records as one batch."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for table, op, record_id, entry in records:
+            row = [table, op, "" if record_id is None else record_id] + [(entry or {}).get(k, "") for k in ADDRESS_FIELDS]
+            if isinstance(entry, RecycledAddress):
+                row.append(entry.deleted)
+            writer.writerow(row)
+        writer.writerow(self.COMMIT)
+
+        with self.lock, self.file_lock:
+            self._check_external()
+            self._cut_torn_tail()
+            with open(self.filename, 'a', newline='', encoding='utf-8') as f:
+                if self._offset is not None and f.tell() != self._offset:
+                    # Batches nobody here has read precede this one
+                    self.external_changes += 1
+                if f.tell() == 0:
+                    csv.writer(f).writerow(self.HEADER)
+                f.write(buffer.getvalue())
+                f.flush()
+                os.fsync(f.fileno())
+                self._offset = f.tell()
+                self._journal_key = self._file_key(f)
+            self._known_stats = self._stats()
+            self.records += len(records)
+            if self.records >= self.threshold:
+                self.compact_async()
+
+    def close(self):
+        # Let a running compaction finish instead of dying with the process
+        if self._compactor is not None:
+            self._compactor.join()
+
+    def compact_async(self):
+        with self.lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            self._compactor = threading.Thread(target=self.compact, daemon=True)
+            self._compactor.start()
+
+    def compact(self):
+        with self.compact_lock:
+            self._compact()
+
+    def _compact(self):
+        with self.lock, self.file_lock:
+            # New mutations go to a fresh journal while the old one is folded in
+            if not os.path.exists(self.compacting_file):
+                if not os.path.exists(self.filename):
+                    return
+                self._check_external()
+                os.replace(self.filename, self.compacting_file)
+                self._offset, self._journal_key = 0, None
+                self._known_stats = self._stats()
+            self.records = 0
+
+        tables = self._tables_of(self._replay([self.compacting_file]))
+        staged = [(stage_csv(path, tables[name], RECYCLE_FIELDS if name == "recycle" else RECORD_FIELDS), path)
+                  for name, path in self.tables.items()]
+
+        with self.lock, self.file_lock:
+            commit_tmp = self.commit_file + ".tmp"
+            with open(commit_tmp, 'w', newline='', encoding='utf-8') as f:
+                csv.writer(f).writerows(staged)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(commit_tmp, self.commit_file)
+            fsync_dir(os.path.dirname(self.commit_file))
+            self._check_external()
+            self._roll_forward()
+            self._known_stats = self._stats()
+
+    def _roll_forward(self):
+        with open(self.commit_file, newline='', encoding='utf-8') as f:
+            staged = [row for row in csv.reader(f) if len(row) == 2]
+        for tmp, path in staged:
+            if os.path.exists(tmp):
+                os.replace(tmp, path)
+        if os.path.exists(self.compacting_file):
+            os.remove(self.compacting_file)
+        fsync_dir(os.path.dirname(self.commit_file))
+        os.remove(self.commit_file)
+
+
+# --- Search index ---
+
+WORD_RE = re.compile(r"\w+")
+
+
+def tokenize(value):
+    return WORD_RE.findall(value.casefold())
+
+
+class SearchIndex:
+    """Inverted index from word to rows over every field in ADDRESS_FIELDS.
+
+    Rows are keyed by identity, so the index is updated one row at a time as
+    entries are added, edited or deleted. Words from SEARCH_PREFIX_FIELDS are
+    also kept in a sorted vocabulary, letting a search term match them as a
+    prefix with a bisect instead of a scan.
+
+    The matches of the last few queries are kept until the index changes, so
+    a query typed one key at a time starts from the one before it.
+    """
+
+    # Queries whose matches are kept
+    CACHE_SIZE = 4
+    # Up to this many candidate rows are narrowed down by checking their
+    # words instead of looking the new term up in the index
+    NARROW_LIMIT = 256
+
+    def __init__(self, rows=()):
+        self.rows = {}
+        self.postings = defaultdict(set)
+        self.prefix_postings = defaultdict(set)
+        self._cache = {}
+        # Sorted once after the bulk build rather than insorted word by word
+        self.vocabulary = None
+        for row in rows:
+            self.add(row)
+        self.vocabulary = sorted(self.prefix_postings)
+
+    @staticmethod
+    def _tokens(row):
+        prefix = set(tokenize(" ".join(row[k] for k in SEARCH_PREFIX_FIELDS)))
+        other = set(tokenize(" ".join(row[k] for k in SEARCH_OTHER_FIELDS)))
+        return prefix, prefix | other
+
+    def add(self, row):
+        key = id(row)
+        self._cache.clear()
+        self.rows[key] = row
+        prefix, tokens = self._tokens(row)
+        for token in tokens:
+            self.postings[token].add(key)
+        for token in prefix:
+            postings = self.prefix_postings[token]
+            if not postings and self.vocabulary is not None:
+                insort(self.vocabulary, token)
+            postings.add(key)
+
+    def remove(self, row):
+        key = id(row)
+        if self.rows.pop(key, None) is None:
+            return
+        self._cache.clear()
+        prefix, tokens = self._tokens(row)
+        for token in tokens:
+            postings = self.postings[token]
+            postings.discard(key)
+            if not postings:
+                del self.postings[token]
+        for token in prefix:
+            postings = self.prefix_postings[token]
+            postings.discard(key)
+            if not postings:
+                del self.prefix_postings[token]
+                del self.vocabulary[bisect_left(self.vocabulary, token)]
+
+    def clear(self):
+        self._cache.clear()
+        self.rows.clear()
+        self.postings.clear()
+        self.prefix_postings.clear()
+        self.vocabulary.clear()
+
+    def _match(self, term):
+        keys = set(self.postings.get(term, ()))
+        i = bisect_left(self.vocabulary, term)
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(term):
+            keys |= self.prefix_postings[self.vocabulary[i]]
+            i += 1
+        return keys
+
+    @classmethod
+    def matches(cls, row, terms):
+        """Whether row matches every one of terms, checked against its own words."""
+        prefix, tokens = cls._tokens(row)
+        return all(term in tokens or any(token.startswith(term) for token in prefix) for term in terms)
+
+    def cached(self, terms):
+        """keys(terms) if they are at hand, else None."""
+        return self._cache.get(tuple(terms))
+
+    def keys(self, terms):
+        """Keys (row ids) of the rows matching every one of terms, the words
+        of a query as split by tokenize(). Do not modify the returned set."""
+        terms = tuple(terms)
+        if not terms:
+            return set()
+        keys = self._cache.get(terms)
+        if keys is not None:
+            return keys
+        *earlier, term = terms
+        base = self.keys(earlier) if earlier else None
+        # The same query with a shorter last term: its rows are the only
+        # ones the longer term can match as a prefix
+        shorter = None
+        for i in range(len(term) - 1, 0, -1):
+            shorter = self._cache.get(tuple(earlier) + (term[:i],))
+            if shorter is not None:
+                break
+        if shorter is not None and len(shorter) <= self.NARROW_LIMIT:
+            exact = self.postings.get(term, set())
+            keys = {key for key in shorter if self.matches(self.rows[key], (term,))}
+            keys |= exact if base is None else exact & base
+        elif base is not None and len(base) <= self.NARROW_LIMIT:
+            keys = {key for key in base if self.matches(self.rows[key], (term,))}
+        else:
+            keys = self._match(term)
+            if base is not None:
+                keys &= base
+        if len(self._cache) >= self.CACHE_SIZE:
+            del self._cache[next(iter(self._cache))]
+        self._cache[terms] = keys
+        return keys
+
+    def search(self, query):
+        """Return the rows matching every word of the query."""
+        return [self.rows[key] for key in self.keys(tokenize(query))]
+
+
+# --- Sorting and filtering ---
+
+def sort_key(value):
+    return " ".join(value.casefold().split())
+
+
+class ViewIndex:
+    """Sort orders and filter indexes over the address book.
+
+    For each of SORT_FIELDS the rows are kept in a list sorted by
+    (sort key, sequence), where the sequence number preserves book order
+    among equal keys; for each of ENCODED_FIELDS there is a map from value
+    code to row ids, used for filters and group counts. Both are built once
+    and patched on every mutation, so changing the sort costs a pass over a
+    ready list instead of a sort.
+    """
+
+    def __init__(self, rows=()):
+        self.rows = {}
+        self.sequence = {}
+        self.next_sequence = 0
+        self.groups = [defaultdict(set) for _ in ENCODED_FIELDS]
+        for row in rows:
+            self._file(row, self._next())
+        # (key, sequence, id) tuples hold no containers, so the collector
+        # does not have to traverse millions of them
+        self.orders = {field: sorted((sort_key(row[field]), self.sequence[key], key)
+                                     for key, row in self.rows.items())
+                       for field in SORT_FIELDS}
+
+    def _next(self):
+        self.next_sequence += 1
+        return self.next_sequence
+
+    def _file(self, row, sequence):
+        key = id(row)
+        self.rows[key] = row
+        self.sequence[key] = sequence
+        for groups, code in zip(self.groups, row.codes):
+            groups[code].add(key)
+
+    def _unfile(self, row):
+        key = id(row)
+        sequence = self.sequence.pop(key)
+        del self.rows[key]
+        for groups, code in zip(self.groups, row.codes):
+            ids = groups[code]
+            ids.discard(key)
+            if not ids:
+                del groups[code]
+        for field in SORT_FIELDS:
+            order = self.orders[field]
+            del order[bisect_left(order, (sort_key(row[field]), sequence, key))]
+        return sequence
+
+    def _insert(self, row, sequence):
+        self._file(row, sequence)
+        for field in SORT_FIELDS:
+            insort(self.orders[field], (sort_key(row[field]), sequence, id(row)))
+
+    def add(self, row):
+        self._insert(row, self._next())
+
+    def replace(self, old, new):
+        # An edited row keeps its place in book order
+        self._insert(new, self._unfile(old))
+
+    def remove(self, row):
+        self._unfile(row)
+
+    def clear(self):
+        self.__init__()
+
+    def matching(self, filters):
+        """Ids of the rows matching every {field: value} in filters, or None for no filter."""
+        allowed = None
+        for name, value in filters.items():
+            code = CODEBOOKS[name].codes.get(value)
+            ids = self.groups[_ENCODED_INDEX[name]].get(code, set())
+            allowed = ids if allowed is None else allowed & ids
+        return allowed
+
+    def counts(self, field, filters=None):
+        """{value: number of rows} for field (one of ENCODED_FIELDS) among the
+        rows matching filters."""
+        allowed = self.matching(filters or {})
+        values = CODEBOOKS[field].values
+        counts = {}
+        for code, ids in self.groups[_ENCODED_INDEX[field]].items():
+            count = len(ids) if allowed is None else len(allowed.intersection(ids))
+            if count:
+                counts[values[code]] = count
+        return counts
+
+    def select(self, field, descending=False, filters=None):
+        """Rows ordered by field and matching every {field: value} in filters."""
+        allowed = self.matching(filters or {})
+        # Descending is the ascending order reversed, ties included
+        order = reversed(self.orders[field]) if descending else self.orders[field]
+        rows = self.rows
+        if allowed is None:
+            return [rows[key] for _, _, key in order]
+        return [rows[key] for _, _, key in order if key in allowed]
+
+
+# --- Address store ---
+
+class PositionIndex:
+    """Record id -> position of the row in one table.
+
+    Each row keeps the slot it had when the index was built (rows added
+    since get slots past the end). A delete leaves a gap behind instead of
+    moving every later row up, and a row's position is its slot minus the
+    gaps before it, so deletes and lookups cost a bisect over the gaps.
+    """
+
+    # Gaps the owner lets accumulate before building a fresh index
+    MAX_GAPS = 1024
+
+    def __init__(self, rows):
+        self.slots = {row.id: i for i, row in enumerate(rows)}
+        self.end = len(rows)
+        self.gaps = []
+
+    def get(self, record_id, default=None):
+        slot = self.slots.get(record_id)
+        if slot is None:
+            return default
+        return slot - bisect_left(self.gaps, slot) if self.gaps else slot
+
+    def __getitem__(self, record_id):
+        slot = self.slots[record_id]
+        return slot - bisect_left(self.gaps, slot) if self.gaps else slot
+
+    def __contains__(self, record_id):
+        return record_id in self.slots
+
+    def add(self, record_id):
+        self.slots[record_id] = self.end
+        self.end += 1
+
+    def remove(self, record_id):
+        insort(self.gaps, self.slots.pop(record_id))
+
+
+class AddressStore:
+    """In-memory model of the address book and recycle bin.
+
+    Both tables are loaded once and served from memory; every mutation is
+    written through to the storage backend (Journal or SqliteBackend). What
+    other processes append is applied to the cache on the next read, if the
+    backend can poll() for it; any other outside change (detected by the
+    backend's signature) makes the cache reload. The search index and the
+    record id to position maps are derived lazily from the cache.
+
+    Entries are edited, deleted and recovered by record id, looked up under
+    the backend's file lock, which writes hold from that check to the write;
+    an id that is gone (deleted elsewhere) makes them return None.
+    """
+
+    # Runs of more deletes from one table than this are applied in a single
+    # pass over the table instead of one list deletion each
+    BULK_DELETE = 64
+    # Searches matching more than 1/SCAN_RATIO of the book are put in book
+    # order by a pass over the book instead of a sort by position
+    SCAN_RATIO = 8
+
+    def __init__(self, backend=None):
+        self.backend = backend or Journal()
+        self._tables = None
+        self._signature = None
+        self._search_index = None
+        self._duplicate_index = None
+        self._view_index = None
+        self._view_cache = {}
+        # (version, terms, rows) of the last search
+        self._last_search = None
+        # PositionIndex per table
+        self._positions = {table: None for table in ("address", "recycle")}
+        # Next record id to hand out; derived from the ids in use when needed
+        self._next_id = None
+        # Bumped whenever the cache changes other than by this store's own
+        # writes (a reload, another process), so views know to redraw
+        self.generation = 0
+        # Bumped on every write or reload; identifies a state of the data
+        self.version = 0
+        # Other processes' changes applied since the last sync(), and the
+        # generation before the first of them
+        self._external = []
+        self._external_since = 0
+
+    def _ensure_loaded(self):
+        with self.backend.lock:
+            poll = getattr(self.backend, "poll", None)
+            if self._tables is not None and poll is not None:
+                self._apply_external(poll())
+            signature = self.backend.signature()
+            if self._tables is None or signature != self._signature:
+                self._tables = self.backend.load_all()
+                self._signature = signature
+                self._search_index = None
+                self._duplicate_index = None
+                self._view_index = None
+                self._positions = {table: None for table in self._tables}
+                self._next_id = None
+                self._external = []
+                self.generation += 1
+                self.version += 1
+            return self._tables
+
+    def _apply_external(self, records):
+        # None (the backend cannot follow the change) is left to signature()
+        if not records:
+            return
+        if not self._external:
+            self._external_since = self.generation
+        changes = self._apply(records)
+        if changes is None:
+            # Out of step with the backend; read it all again
+            self._tables = None
+            return
+        self._external.extend(changes)
+        self.generation += 1
+        self.version += 1
+
+    def _apply(self, records):
+        # Apply (table, op, record id, entry) records to the cache and return
+        # them as (table, op, position, entry) changes, each position as of
+        # when it was applied; None if a record names an id that is not there
+        changes = []
+        for (table, op), run in groupby(records, key=lambda record: record[:2]):
+            rows = self._tables[table]
+            run = list(run)
+            if op == "delete" and len(run) > self.BULK_DELETE:
+                positions = self._position_map(table)
+                doomed = sorted((positions.get(record_id, -1) for _, _, record_id, _ in run), reverse=True)
+                if doomed[-1] < 0:
+                    return None
+                # Last first, so each position is still right when reported
+                self._positions[table] = None
+                for pos in doomed:
+                    self._track(table, rows, op, pos, None)
+                ids = {record_id for _, _, record_id, _ in run}
+                rows[:] = [row for row in rows if row.id not in ids]
+                changes.extend((table, op, pos, None) for pos in doomed)
+                continue
+            for _, _, record_id, entry in run:
+                if op == "add":
+                    pos = len(rows)
+                    if self._next_id is not None:
+                        self._next_id = max(self._next_id, record_id + 1)
+                elif op == "clear":
+                    pos = None
+                else:
+                    pos = self._position_map(table).get(record_id)
+                    if pos is None:
+                        return None
+                self._track(table, rows, op, pos, entry)
+                Journal.apply(rows, op, pos, entry)
+                changes.append((table, op, pos, entry))
+        return changes
+
+    def sync(self):
+        """Pick up changes made by other processes.
+
+        Returns (since, generation, changes): the (table, op, position, entry)
+        changes that took the data from generation since to the current one,
+        each position as of when it was applied. If the data was reloaded
+        instead, changes is empty and since is the current generation.
+        """
+        with self.backend.lock:
+            self._ensure_loaded()
+            changes, self._external = self._external, []
+            since = self._external_since if changes else self.generation
+            return since, self.generation, changes
+
+    def outdated(self):
+        """Whether sync() may have changes to report. Lock-free and cheap for
+        backends with stale(); others always may."""
+        stale = getattr(self.backend, "stale", None)
+        return self._tables is None or bool(self._external) or stale is None or stale()
+
+    def invalidate(self):
+        self._tables = None
+
+    def addresses(self):
+        return self._ensure_loaded()["address"]
+
+    def recycled(self):
+        return self._ensure_loaded()["recycle"]
+
+    def _write(self, records):
+        # Records are (table, op, record id, entry). The cache holds Address
+        # records; dicts from forms and imports are converted here, so
+        # callers use the returned record from then on
+        records = [(table, op, record_id, None if entry is None else Address.from_mapping(entry))
+                   for table, op, record_id, entry in records]
+        with self.backend.lock, self.backend.file_lock:
+            self._ensure_loaded()
+            now = int(time.time())
+            records = [self._stamp(*record, now) for record in records]
+            self.backend.append_many(records)
+            if self._apply(records) is None:
+                self._tables = None
+            self._signature = self.backend.signature()
+            self.version += 1
+        return [entry for _, _, _, entry in records]
+
+    def _stamp(self, table, op, record_id, entry, now):
+        # New entries get the next id; entries moving between the book and
+        # the bin keep theirs, and a replacement takes the id it replaces.
+        # Entries going into the bin are dated, and lose the date coming out
+        if op == "add" and entry.id is None:
+            entry.id = self._new_id()
+        if op == "add" and (table == "recycle") != isinstance(entry, RecycledAddress):
+            entry = RecycledAddress.of(entry, now) if table == "recycle" else entry.with_id(entry.id)
+        elif op == "update" and entry.id != record_id:
+            if entry.id is None:
+                entry.id = record_id
+            else:
+                entry = entry.with_id(record_id)
+        if entry is not None:
+            record_id = entry.id
+        return table, op, record_id, entry
+
+    def _new_id(self):
+        if self._next_id is None:
+            self._next_id = max((row.id for rows in self._tables.values() for row in rows), default=0) + 1
+        self._next_id += 1
+        return self._next_id - 1
+
+    def _track(self, table, rows, op, pos, entry):
+        # Keep the derived indexes and positions in step with one record
+        if table == "address":
+            for index in (self._search_index, self._duplicate_index):
+                if index is None:
+                    continue
+                if op in ("update", "delete"):
+                    index.remove(rows[pos])
+                if op in ("add", "update"):
+                    index.add(entry)
+                if op == "clear":
+                    index.clear()
+            view = self._view_index
+            if view is not None:
+                if op == "add":
+                    view.add(entry)
+                elif op == "update":
+                    view.replace(rows[pos], entry)
+                elif op == "delete":
+                    view.remove(rows[pos])
+                elif op == "clear":
+                    view.clear()
+        positions = self._positions[table]
+        if positions is not None:
+            if op == "add":
+                positions.add(entry.id)
+            elif op == "delete":
+                positions.remove(rows[pos].id)
+                if len(positions.gaps) > positions.MAX_GAPS:
+                    self._positions[table] = None
+            elif op == "clear":
+                self._positions[table] = None
+
+    def _position_map(self, table="address"):
+        positions = self._positions[table]
+        if positions is None:
+            positions = self._positions[table] = PositionIndex(self._tables[table])
+        return positions
+
+    def _find(self, table, record_id):
+        self._ensure_loaded()
+        return self._position_map(table).get(record_id)
+
+    def position(self, row):
+        """Index of row's record in addresses(), or None if it is no longer there."""
+        with self.backend.lock:
+            return self._find("address", row.id)
+
+    def positions_of(self, rows):
+        """position() of each row, checking for outside changes only once."""
+        with self.backend.lock:
+            self._ensure_loaded()
+            positions = self._position_map()
+            return [positions.get(row.id) for row in rows]
+
+    def _search_keys(self, query):
+        if self._search_index is None:
+            self._search_index = SearchIndex(self._tables["address"])
+        return self._search_index.keys(tokenize(query))
+
+    def _book_order(self, keys, limit=None, reverse=False):
+        # The rows with SearchIndex keys, in book order (or reversed), only
+        # the first limit of them if given
+        addresses = self._tables["address"]
+        if len(keys) * self.SCAN_RATIO > len(addresses):
+            rows = (row for row in (reversed(addresses) if reverse else addresses) if id(row) in keys)
+            return list(islice(rows, limit))
+        rows = [self._search_index.rows[key] for key in keys]
+        positions = self._position_map()
+        if limit is not None:
+            pick = heapq.nlargest if reverse else heapq.nsmallest
+            return pick(limit, rows, key=lambda row: positions[row.id])
+        rows.sort(key=lambda row: positions[row.id], reverse=reverse)
+        return rows
+
+    def _extends_last_search(self, terms):
+        # Whether terms are those of the last search with more typed after
+        last = self._last_search
+        if last is None or last[0] != self.version or not last[1] or len(terms) < len(last[1]):
+            return False
+        *earlier, term = last[1]
+        return list(terms[:len(earlier)]) == earlier and terms[len(earlier)].startswith(term)
+
+    def search(self, query):
+        """Addresses matching query, in book order."""
+        # Held so a background import cannot change the index mid-query
+        with self.backend.lock:
+            self._ensure_loaded()
+            terms = tuple(tokenize(query))
+            keys = self._search_keys(query)
+            if self._extends_last_search(terms):
+                # A query extending the last one mostly keeps to its rows,
+                # already in order; but a longer word can match a word of
+                # the other fields whole that its start did not
+                rows = [row for row in self._last_search[2] if id(row) in keys]
+                if len(rows) < len(keys):
+                    found = {id(row) for row in rows}
+                    positions = self._position_map()
+                    rows = list(heapq.merge(rows, self._book_order(keys - found),
+                                            key=lambda row: positions[row.id]))
+            else:
+                rows = self._book_order(keys)
+            self._last_search = (self.version, terms, rows)
+            return list(rows)
+
+    def view_head(self, count, query="", sort=None, descending=False, filters=None):
+        """The first count rows of view(query, sort, descending, filters),
+        found without putting the rest of the matches in order."""
+        filters = {k: v for k, v in (filters or {}).items() if v}
+        with self.backend.lock:
+            self._ensure_loaded()
+            cached = self._view_cache.get((self.version, query, sort, descending, tuple(sorted(filters.items()))))
+            if cached is not None:
+                return cached[:count]
+            if not query:
+                # Served from the view index, which has them in order already
+                return self.view(query, sort, descending, filters)[:count]
+            terms = tokenize(query)
+            if not terms:
+                return []
+            addresses = self._tables["address"]
+            if (not sort and self._extends_last_search(terms) and
+                    len(self._last_search[2]) * self.SCAN_RATIO <= len(addresses)):
+                # Narrowing down a last search of few rows is as quick as any head
+                return self.view(query, sort, descending, filters)[:count]
+            if not sort and (self._search_index is None or self._search_index.cached(terms) is None):
+                # A common search has its head among the first rows of the
+                # book; checking those one by one is quicker than gathering
+                # all of its matches
+                codes = [(_ENCODED_INDEX[field], CODEBOOKS[field].codes.get(value)) for field, value in filters.items()]
+                head = []
+                scan = count * self.SCAN_RATIO
+                for row in islice(reversed(addresses) if descending else addresses, scan):
+                    if all(row.codes[index] == code for index, code in codes) and SearchIndex.matches(row, terms):
+                        head.append(row)
+                        if len(head) == count:
+                            return head
+                if len(addresses) <= scan:
+                    return head
+            keys = self._search_keys(query)
+            if filters:
+                rows = self._search_index.rows
+                for field, value in filters.items():
+                    index, code = _ENCODED_INDEX[field], CODEBOOKS[field].codes.get(value)
+                    keys = {key for key in keys if rows[key].codes[index] == code}
+            if not sort:
+                return self._book_order(keys, count, descending)
+            positions = self._position_map()
+            pick = heapq.nlargest if descending else heapq.nsmallest
+            return pick(count, [self._search_index.rows[key] for key in keys],
+                        key=lambda row: (sort_key(row[sort]), positions[row.id]))
+
+    def view(self, query="", sort=None, descending=False, filters=None):
+        """Addresses matching query and filters, ordered by sort (a field of
+        SORT_FIELDS) or in book order, reversed if descending.
+
+        Results are cached until the next write, so switching back and forth
+        between views of an unchanged book is a dictionary lookup.
+        """
+        filters = {k: v for k, v in (filters or {}).items() if v}
+        if not query and not sort and not filters and not descending:
+            return self.addresses()
+        with self.backend.lock:
+            addresses = self.addresses()
+            key = (self.version, query, sort, descending, tuple(sorted(filters.items())))
+            cached = self._view_cache.get(key)
+            if cached is not None:
+                return cached
+            if query:
+                rows = self.search(query)
+                for field, value in filters.items():
+                    index, code = _ENCODED_INDEX[field], CODEBOOKS[field].codes.get(value)
+                    rows = [row for row in rows if row.codes[index] == code]
+                if sort:
+                    rows.sort(key=lambda row: sort_key(row[sort]))
+                if descending:
+                    rows.reverse()
+            elif sort or filters:
+                if sort:
+                    rows = self._views(addresses).select(sort, descending, filters)
+                else:
+                    allowed = self._views(addresses).matching(filters)
+                    rows = [row for row in addresses if id(row) in allowed]
+                    if descending:
+                        rows.reverse()
+            else:
+                rows = addresses[::-1]
+            if self._view_cache and next(iter(self._view_cache))[0] != self.version:
+                self._view_cache.clear()
+            self._view_cache[key] = rows
+            return rows
+
+    def _views(self, addresses):
+        if self._view_index is None:
+            self._view_index = ViewIndex(addresses)
+        return self._view_index
+
+    def count_by(self, field, query="", filters=None):
+        """Number of addresses per value of field (one of ENCODED_FIELDS),
+        among those matching query and filters, as (value, count) pairs with
+        the largest groups first."""
+        filters = {k: v for k, v in (filters or {}).items() if v}
+        with self.backend.lock:
+            if query:
+                index, values = _ENCODED_INDEX[field], CODEBOOKS[field].values
+                codes = Counter(row.codes[index] for row in self.view(query, filters=filters))
+                counts = {values[code]: count for code, count in codes.items()}
+            else:
+                counts = self._views(self.addresses()).counts(field, filters)
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+
+    def _duplicates(self, addresses):
+        if self._duplicate_index is None:
+            self._duplicate_index = DuplicateIndex(addresses)
+        return self._duplicate_index
+
+    def duplicates_of(self, entry):
+        """Likely duplicates of entry in the book, best first, as (position, row, reasons)."""
+        with self.backend.lock:
+            addresses = self.addresses()
+            positions = self._position_map()
+            return [(positions[row.id], row, reasons)
+                    for score, row, reasons in self._duplicates(addresses).matches(entry)]
+
+    def duplicate_groups(self):
+        """Likely duplicates as (positions, reasons), positions ascending.
+
+        Matching pairs are joined transitively, so A~B and B~C form one group.
+        """
+        with self.backend.lock:
+            addresses = self.addresses()
+            positions = self._position_map()
+            parent = {}
+            reasons = defaultdict(set)
+
+            def root(position):
+                while position in parent:
+                    position = parent[position]
+                return position
+
+            for score, a, b, why in self._duplicates(addresses).pairs():
+                pa, pb = positions[a.id], positions[b.id]
+                ra, rb = root(pa), root(pb)
+                if ra != rb:
+                    parent[max(ra, rb)] = min(ra, rb)
+                reasons[pa].update(why)
+                reasons[pb].update(why)
+
+        groups = defaultdict(list)
+        for position in reasons:
+            groups[root(position)].append(position)
+        return [(sorted(group), sorted(set().union(*(reasons[p] for p in group))))
+                for _, group in sorted(groups.items())]
+
+    def add(self, entry):
+        """Append entry; returns the stored Address record."""
+        return self._write([("address", "add", None, entry)])[0]
+
+    def add_many(self, entries):
+        """Add entries as one journal batch / transaction."""
+        self._write([("address", "add", None, entry) for entry in entries])
+
+    def update(self, record_id, entry):
+        """Replace the entry with record_id; returns the stored Address
+        record, or None if the entry is no longer in the book."""
+        with self.backend.lock, self.backend.file_lock:
+            if self._find("address", record_id) is None:
+                return None
+            return self._write([("address", "update", record_id, entry)])[0]
+
+    def delete(self, record_id):
+        """Move the entry with record_id to the recycle bin; returns the
+        position it had, or None if it is no longer in the book."""
+        with self.backend.lock, self.backend.file_lock:
+            idx = self._find("address", record_id)
+            if idx is None:
+                return None
+            entry = self._tables["address"][idx]
+            self._write([("address", "delete", record_id, None), ("recycle", "add", None, entry)])
+            return idx
+
+    def delete_all(self):
+        with self.backend.lock, self.backend.file_lock:
+            addresses = self.addresses()
+            self._write([("recycle", "add", None, entry) for entry in addresses] +
+                        [("address", "clear", None, None)])
+
+    def recover(self, record_id):
+        """Move the recycle bin entry with record_id back to the end of the
+        book; returns the restored Address record, or None if the entry is
+        no longer in the bin."""
+        with self.backend.lock, self.backend.file_lock:
+            idx = self._find("recycle", record_id)
+            if idx is None:
+                return None
+            entry = self._tables["recycle"][idx]
+            return self._write([("recycle", "delete", record_id, None), ("address", "add", None, entry)])[1]
+
+    def recover_all(self):
+        with self.backend.lock, self.backend.file_lock:
+            recycle = self.recycled()
+            self._write([("address", "add", None, entry) for entry in recycle] +
+                        [("recycle", "clear", None, None)])
+
+    def absorb(self, other):
+        """Move every entry of other's book and recycle bin to the end of
+        this one's, under new ids; bin entries keep their deletion dates.
+        Returns the number moved."""
+        with other.backend.lock, other.backend.file_lock:
+            addresses, recycle = other.addresses(), other.recycled()
+            self._write([("address", "add", None, entry.with_id(None)) for entry in addresses] +
+                        [("recycle", "add", None, RecycledAddress.of(entry.with_id(None), entry.deleted))
+                         for entry in recycle])
+            # Emptied only once the copy is stored, so a crash leaves both
+            moved = len(addresses) + len(recycle)
+            other._write([("address", "clear", None, None), ("recycle", "clear", None, None)])
+            return moved
+
+    def merge(self, merges):
+        """Apply (keep, others, entry) merges, by record id, as one batch.
+
+        Each entry keep is replaced by its merged entry and the others are
+        moved to the recycle bin. Returns the stored merged records, None for
+        a keep that is no longer in the book.
+        """
+        with self.backend.lock, self.backend.file_lock:
+            self._ensure_loaded()
+            addresses, positions = self._tables["address"], self._position_map()
+            found = [keep in positions for keep, _, _ in merges]
+            records = [("address", "update", keep, entry) for keep, others, entry in merges if keep in positions]
+            others = [record_id for _, others, _ in merges for record_id in others if record_id in positions]
+            # Moved to the bin last in the book first, as deleting them one by one would
+            for record_id in sorted(others, key=positions.get, reverse=True):
+                records += [("address", "delete", record_id, None),
+                            ("recycle", "add", None, addresses[positions[record_id]])]
+            stored = iter(self._write(records))
+            return [next(stored) if kept else None for kept in found]
+
+    def purge(self, record_id):
+        """Drop the recycle bin entry with record_id for good; returns the
+        position it had, or None if it is no longer in the bin."""
+        with self.backend.lock, self.backend.file_lock:
+            idx = self._find("recycle", record_id)
+            if idx is None:
+                return None
+            self._write([("recycle", "delete", record_id, None)])
+            return idx
+
+    def purge_all(self):
+        self._write([("recycle", "clear", None, None)])
+
+    def expire(self, max_age=None, max_entries=None, now=None):
+        """Purge recycle bin entries deleted more than max_age seconds
+        before now, then the longest-deleted ones past max_entries, as one
+        batch; None means no limit. Returns the number purged."""
+        now = time.time() if now is None else now
+        with self.backend.lock, self.backend.file_lock:
+            recycle = self.recycled()
+            doomed = set()
+            if max_age is not None:
+                doomed.update(row.id for row in recycle if row.deleted < now - max_age)
+            if max_entries is not None and len(recycle) - len(doomed) > max_entries:
+                kept = sorted((row for row in recycle if row.id not in doomed), key=lambda row: row.deleted)
+                doomed.update(row.id for row in kept[:len(kept) - max_entries])
+            if doomed:
+                self._write([("recycle", "delete", row.id, None) for row in recycle if row.id in doomed])
+            return len(doomed)
+
+
+# --- Export ---
+
+# Number of entries rendered into one string before it is written out
+EXPORT_CHUNK_SIZE = 1000
+
+
+def csv_pieces(entries):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=ADDRESS_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    yield buffer.getvalue()
+    for entry in entries:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(entry)
+        yield buffer.getvalue()
+
+
+def jsonl_pieces(entries):
+    for entry in entries:
+        yield json.dumps({k: entry[k] for k in ADDRESS_FIELDS}, ensure_ascii=False) + "\n"
+
+
+def _vcard_escape(value):
+    return (value.replace("\\", "\\\\").replace(",", "\\,").replace(";", "\\;")
+            .replace("\r\n", "\n").replace("\n", "\\n"))
+
+
+def vcard_pieces(entries):
+    for entry in entries:
+        e = {k: _vcard_escape(entry[k]) for k in ADDRESS_FIELDS}
+        kind = "WORK" if entry["Type"] == "Business" else "HOME"
+        yield ("BEGIN:VCARD\r\n"
+               "VERSION:3.0\r\n"
+               f"FN:{e['Name']}\r\n"
+               f"N:{e['Name']};;;;\r\n"
+               f"TEL:{e['Phone']}\r\n"
+               f"EMAIL:{e['Email']}\r\n"
+               f"ADR;TYPE={kind}:;;{e['Address']};{e['City']};{e['State']};{e['Pincode']};{e['Country']}\r\n"
+               f"CATEGORIES:{e['Type']}\r\n"
+               "END:VCARD\r\n")
+
+
+PRINT_PAGE_HEAD = string.Template(
+    "<html><head><meta charset='utf-8'><title>$title</title></head><body>\n"
+    "<h2>Address Book - Print Preview</h2>\n$nav\n"
+)
+PRINT_PAGE_FOOT = string.Template("$nav\n$script</body></html>\n")
+PRINT_ENTRY = string.Template("<div style='border:1px solid #ccc; margin:10px; padding:10px;'>$fields</div>\n")
+PRINT_FIELD = string.Template("<b>$label:</b> $value<br>")
+PRINT_INDEX_ITEM = string.Template("<li><a href='$href'>Page $number</a> (entries $first to $last)</li>\n")
+PRINT_SCRIPT = "<script>window.print();</script>"
+
+
+def html_entry(entry):
+    fields = "".join(PRINT_FIELD.substitute(label=k, value=html.escape(entry[k])) for k in ADDRESS_FIELDS)
+    return PRINT_ENTRY.substitute(fields=fields)
+
+
+def html_pieces(entries, title="Address Book", nav="", script=PRINT_SCRIPT):
+    yield PRINT_PAGE_HEAD.substitute(title=title, nav=nav)
+    for entry in entries:
+        yield html_entry(entry)
+    yield PRINT_PAGE_FOOT.substitute(nav=nav, script=script)
+
+
+EXPORT_FORMATS = {
+    "csv": csv_pieces,
+    "jsonl": jsonl_pieces,
+    "vcf": vcard_pieces,
+    "html": html_pieces,
+}
+
+
+def export_format_for(path):
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    return {"vcard": "vcf", "json": "jsonl", "htm": "html"}.get(ext, ext if ext in EXPORT_FORMATS else "csv")
+
+
+def write_chunks(f, pieces, chunk_size=EXPORT_CHUNK_SIZE):
+    """Write pieces to f, joining chunk_size of them per write call."""
+    chunk = []
+    written = 0
+    for piece in pieces:
+        chunk.append(piece)
+        if len(chunk) >= chunk_size:
+            f.write("".join(chunk))
+            written += len(chunk)
+            chunk.clear()
+    if chunk:
+        f.write("".join(chunk))
+        written += len(chunk)
+    return written
+
+
+def export_entries(entries, f, fmt="csv"):
+    """Stream entries (any iterable) to the open text file f in the given format."""
+    return write_chunks(f, EXPORT_FORMATS[fmt](entries))
+
+
+# --- Print preview ---
+
+# Entries per print preview page; longer books get an index page
+PRINT_PAGE_SIZE = 500
+PRINT_DIR_PREFIX = "addressbook-print-"
+# Print previews older than this at startup are left over from earlier runs
+PRINT_DIR_MAX_AGE = 3600
+
+
+def remove_stale_print_dirs(folder=None, max_age=PRINT_DIR_MAX_AGE, now=None):
+    """Remove print preview folders older than max_age seconds from folder
+    (the temp folder). Previews are kept while the app runs, as the browser
+    may still be reading them. Returns the number removed."""
+    folder = folder or tempfile.gettempdir()
+    now = time.time() if now is None else now
+    removed = 0
+    try:
+        candidates = list(os.scandir(folder))
+    except OSError:
+        return 0
+    for item in candidates:
+        try:
+            stale = (item.name.startswith(PRINT_DIR_PREFIX) and item.is_dir(follow_symlinks=False)
+                     and item.stat(follow_symlinks=False).st_mtime < now - max_age)
+        except OSError:
+            continue
+        if stale:
+            shutil.rmtree(item.path, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+def _print_nav(number, has_next):
+    links = ["<a href='index.html'>Index</a>"]
+    if number > 1:
+        links.insert(0, f"<a href='page-{number - 1:04d}.html'>Previous</a>")
+    if has_next:
+        links.append(f"<a href='page-{number + 1:04d}.html'>Next</a>")
+    return "<p>" + " | ".join(links) + "</p>"
+
+
+def render_print_pages(entries, directory, page_size=PRINT_PAGE_SIZE):
+    """Write entries as page_size-entry HTML pages and return the file to open.
+
+    Pages are rendered one at a time from the entries iterator. A single page
+    is printed directly; otherwise an index.html linking to every page is
+    written and returned.
+    """
+    os.makedirs(directory, exist_ok=True)
+    it = iter(entries)
+    page = list(islice(it, page_size))
+    pages = []
+    while page:
+        following = list(islice(it, page_size))
+        number = len(pages) + 1
+        name = f"page-{number:04d}.html"
+        single = number == 1 and not following
+        nav = "" if single else _print_nav(number, bool(following))
+        script = PRINT_SCRIPT if single else ""
+        with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+            write_chunks(f, html_pieces(page, f"Address Book - Page {number}", nav, script))
+        first = (number - 1) * page_size + 1
+        pages.append(PRINT_INDEX_ITEM.substitute(href=name, number=number,
+                                                 first=first, last=first + len(page) - 1))
+        page = following
+
+    if len(pages) == 1:
+        return os.path.join(directory, "page-0001.html")
+    index = os.path.join(directory, "index.html")
+    with open(index, 'w', encoding='utf-8') as f:
+        f.write(PRINT_PAGE_HEAD.substitute(title="Address Book - Index", nav=""))
+        f.write("<ul>\n")
+        write_chunks(f, pages)
+        f.write("</ul>\n</body></html>\n")
+    return index
+
+
+# --- User index ---
+
+class UserFile:
+    """CSV storage for accounts, the user half of the "csv" backend."""
+
+    def __init__(self, filename=USER_FILE):
+        self.filename = filename
+        self.lock = threading.RLock()
+        self.file_lock = FileLock(filename + ".lock")
+
+    def signature(self):
+        return stat_signature([self.filename])
+
+    def load_users(self):
+        return read_csv(self.filename)
+
+    def insert_user(self, user):
+        with self.lock:
+            new_file = not os.path.exists(self.filename) or os.path.getsize(self.filename) == 0
+            with open(self.filename, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=USER_FIELDS)
+                if new_file:
+                    writer.writeheader()
+                writer.writerow(user)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def update_user(self, username, user, users):
+        with self.lock:
+            write_csv(self.filename, users, USER_FIELDS)
+
+    def delete_user(self, username, users):
+        with self.lock:
+            write_csv(self.filename, users, USER_FIELDS)
+
+
+class UserIndex:
+    """Accounts indexed by casefolded username, email and mobile.
+
+    The backend is read once and the hash maps are kept in sync on every
+    write, so login and uniqueness checks are O(1). Like AddressStore, the
+    index is rebuilt if the backend's signature changes underneath it.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or UserFile()
+        self.by_username = {}
+        self.by_email = {}
+        self.by_mobile = {}
+        self._loaded = False
+        self._signature = None
+
+    @staticmethod
+    def keys(user):
+        return user["Username"].strip().casefold(), user["Email"].strip().casefold(), user["Mobile"].strip()
+
+    def _ensure_loaded(self):
+        signature = self.backend.signature()
+        if not self._loaded or signature != self._signature:
+            self.by_username.clear()
+            self.by_email.clear()
+            self.by_mobile.clear()
+            for user in self.backend.load_users():
+                self._index(user)
+            self._loaded = True
+            self._signature = signature
+
+    def _index(self, user):
+        username, email, mobile = self.keys(user)
+        self.by_username[username] = user
+        self.by_email[email] = user
+        self.by_mobile[mobile] = user
+
+    def _unindex(self, user):
+        username, email, mobile = self.keys(user)
+        self.by_username.pop(username, None)
+        self.by_email.pop(email, None)
+        self.by_mobile.pop(mobile, None)
+
+    def find(self, username):
+        self._ensure_loaded()
+        return self.by_username.get(username.strip().casefold())
+
+    def conflict(self, data, ignore=None):
+        """Return the first of Username/Email/Mobile already used by another account."""
+        self._ensure_loaded()
+        username, email, mobile = self.keys(data)
+        for field, index, key in (("Username", self.by_username, username),
+                                  ("Email", self.by_email, email),
+                                  ("Mobile", self.by_mobile, mobile)):
+            owner = index.get(key)
+            if owner is not None and owner is not ignore:
+                return field
+        return None
+
+    # Writes hold the backend's file lock from the reload check to the
+    # write, so accounts changed by another instance are not overwritten
+
+    def add(self, user):
+        with self.backend.file_lock:
+            self._ensure_loaded()
+            self.backend.insert_user(user)
+            self._index(user)
+            self._signature = self.backend.signature()
+
+    def _current(self, user):
+        # user may be from before a reload; changes go to the loaded copy
+        return self.by_username.get(self.keys(user)[0], user)
+
+    def update(self, user, **changes):
+        with self.backend.file_lock:
+            self._ensure_loaded()
+            current = self._current(user)
+            username = current["Username"]
+            self._unindex(current)
+            current.update(changes)
+            self._index(current)
+            self.backend.update_user(username, current, list(self.by_username.values()))
+            self._signature = self.backend.signature()
+        if current is not user:
+            user.update(changes)
+
+    def remove(self, user):
+        with self.backend.file_lock:
+            self._ensure_loaded()
+            current = self._current(user)
+            self._unindex(current)
+            self.backend.delete_user(current["Username"], list(self.by_username.values()))
+            self._signature = self.backend.signature()
+
+
+# --- Passwords ---
+
+class PasswordHasher:
+    """Salted password hashes with hashlib.scrypt or pbkdf2_hmac.
+
+    Hashes are stored as "scrypt$n$r$p$salt$hash" or
+    "pbkdf2_sha256$iterations$salt$hash", so each one records the cost it
+    was made with. Anything else in the Password column is a plaintext
+    password from before hashing; it still verifies, and needs_rehash()
+    reports it (and hashes made with an outdated cost) for upgrading.
+    """
+
+    SALT_BYTES = 16
+
+    def __init__(self, method="scrypt", scrypt_n=2 ** 14, scrypt_r=8, scrypt_p=1, pbkdf2_iterations=600000):
+        if method not in ("scrypt", "pbkdf2"):
+            raise ValueError(f"Unknown password hash: {method!r}")
+        self.method = method
+        self.scrypt_params = (scrypt_n, scrypt_r, scrypt_p)
+        self.pbkdf2_iterations = pbkdf2_iterations
+
+    @classmethod
+    def from_config(cls, config):
+        section = config["security"]
+        return cls(section.get("password_hash"),
+                   section.getint("scrypt_n"), section.getint("scrypt_r"), section.getint("scrypt_p"),
+                   section.getint("pbkdf2_iterations"))
+
+    def __str__(self):
+        if self.method == "scrypt":
+            return "scrypt n={} r={} p={}".format(*self.scrypt_params)
+        return f"pbkdf2 iterations={self.pbkdf2_iterations}"
+
+    @staticmethod
+    def _b64(data):
+        return base64.b64encode(data).decode('ascii')
+
+    @staticmethod
+    def _scrypt(password, salt, n, r, p):
+        # The default 32 MiB limit is too small for n above 2**14
+        return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r * p, dklen=32)
+
+    @staticmethod
+    def _pbkdf2(password, salt, iterations):
+        return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+
+    def hash(self, password):
+        salt = secrets.token_bytes(self.SALT_BYTES)
+        if self.method == "scrypt":
+            n, r, p = self.scrypt_params
+            digest = self._scrypt(password, salt, n, r, p)
+            return f"scrypt${n}${r}${p}${self._b64(salt)}${self._b64(digest)}"
+        digest = self._pbkdf2(password, salt, self.pbkdf2_iterations)
+        return f"pbkdf2_sha256${self.pbkdf2_iterations}${self._b64(salt)}${self._b64(digest)}"
+
+    @staticmethod
+    def _parse(stored):
+        parts = stored.split("$")
+        try:
+            if parts[0] == "scrypt" and len(parts) == 6:
+                return "scrypt", tuple(int(v) for v in parts[1:4]), base64.b64decode(parts[4]), base64.b64decode(parts[5])
+            if parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+                return "pbkdf2", (int(parts[1]),), base64.b64decode(parts[2]), base64.b64decode(parts[3])
+        except ValueError:
+            pass
+        return None
+
+    def verify(self, password, stored):
+        parsed = self._parse(stored)
+        if parsed is None:
+            return hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8'))
+        method, params, salt, digest = parsed
+        try:
+            if method == "scrypt":
+                candidate = self._scrypt(password, salt, *params)
+            else:
+                candidate = self._pbkdf2(password, salt, *params)
+        except (ValueError, OverflowError):
+            # A hash that parses but has impossible parameters is corrupt
+            return False
+        return hmac.compare_digest(candidate, digest)
+
+    def needs_rehash(self, stored):
+        parsed = self._parse(stored)
+        if parsed is None or parsed[0] != self.method:
+            return True
+        if self.method == "scrypt":
+            return parsed[1] != self.scrypt_params
+        return parsed[1] != (self.pbkdf2_iterations,)
+
+
+def authenticate(users, hasher, username, password):
+    """The account of username if password is right, else None. A stored
+    password in plaintext or at an outdated cost is hashed again with
+    hasher's settings on the way."""
+    user = users.find(username)
+    if not user or not hasher.verify(password, user["Password"]):
+        return None
+    if hasher.needs_rehash(user["Password"]):
+        users.update(user, Password=hasher.hash(password))
+    return user
+
+
+def benchmark_hashers(settings, seconds=1.0):
+    """Yield (hasher, logins per second) for each hasher in settings."""
+    for hasher in settings:
+        stored = hasher.hash("benchmark password")
+        count = 0
+        start = time.perf_counter()
+        while True:
+            hasher.verify("benchmark password", stored)
+            count += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= seconds:
+                break
+        yield hasher, count / elapsed
+
+
+# --- Per-user books ---
+
+def owner_key(username):
+    """Partition key of an account; usernames are unique ignoring case."""
+    return username.strip().casefold()
+
+
+class CsvBooks:
+    """Per-user address books for the "csv" backend.
+
+    Each account's book lives in its own folder under BOOKS_FOLDER, so
+    logging in only reads that user's CSVs and journal. open(None) returns
+    the shared book in DATA_FOLDER, which the command line uses by default.
+    The book from before the split stays the shared one until
+    claim_shared_book() moves it into a single account's.
+    """
+
+    def __init__(self, folder=BOOKS_FOLDER):
+        self.folder = folder
+        self.lock = threading.RLock()
+        # Guards the folders against other instances
+        self.file_lock = FileLock(folder + ".lock")
+
+    def path(self, username):
+        # Hashed so any username is a safe folder name
+        digest = hashlib.sha256(owner_key(username).encode('utf-8')).hexdigest()
+        return os.path.join(self.folder, digest[:24])
+
+    def _create(self, path):
+        # Built in a temporary folder and renamed, so a crash leaves no half-made book
+        staging = path + ".tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        write_csv(os.path.join(staging, "address_book.csv"), [], RECORD_FIELDS)
+        write_csv(os.path.join(staging, "recycle_bin.csv"), [], RECYCLE_FIELDS)
+        os.replace(staging, path)
+        fsync_dir(self.folder)
+
+    def open(self, username=None):
+        """The Journal of username's book, or of the shared book if None."""
+        if username is None:
+            return Journal()
+        path = self.path(username)
+        with self.lock, self.file_lock:
+            if not os.path.isdir(path):
+                self._create(path)
+        return Journal(os.path.join(path, "journal.csv"),
+                       tables={"address": os.path.join(path, "address_book.csv"),
+                               "recycle": os.path.join(path, "recycle_bin.csv")})
+
+    def rename(self, old_username, new_username):
+        old, new = self.path(old_username), self.path(new_username)
+        if old == new:
+            return
+        with self.lock, self.file_lock:
+            if os.path.isdir(old):
+                os.replace(old, new)
+                fsync_dir(self.folder)
+
+    def remove(self, username):
+        with self.lock, self.file_lock:
+            shutil.rmtree(self.path(username), ignore_errors=True)
+
+    def close(self):
+        pass
+
+
+# --- SQLite storage ---
+
+class SqliteBackend:
+    """Users, addresses and the recycle bin in one SQLite database.
+
+    Implements the UserFile interface used by UserIndex; open() returns a
+    SqliteBook, the Journal interface used by AddressStore, over one user's
+    rows. Address rows carry an owner column (casefolded username, "" for the
+    shared book) so each book is read through the (owner, id) indexes, and
+    the entry's record id, unique within the owner's book and bin; id, the
+    rowid, only keeps the book order. State, Country and Type are stored as
+    integer codes, with the value of each code in the codes table.
+    """
+
+    TABLES = {"address": "addresses", "recycle": "recycle_bin"}
+    # Per-field indexes of older databases. Books are always read whole by
+    # owner, so they were never used and only slowed every write
+    UNUSED_INDEXES = ["Name", "Email", "Phone", "City", "Pincode"]
+
+    def __init__(self, filename=DATABASE_FILE):
+        self.filename = filename
+        self.lock = threading.RLock()
+        # SQLite serializes transactions itself; this spans the read-check-
+        # write sequences of AddressStore and UserIndex across instances
+        self.file_lock = FileLock(filename + ".lock")
+        self.conn = sqlite3.connect(filename, check_same_thread=False)
+        self._create_schema()
+        self.load_codes()
+        if self._has_text_codes():
+            self._encode_columns()
+        if self.conn.execute("SELECT 1 FROM meta WHERE key = 'migrated'").fetchone() is None:
+            migrate_csv_to_sqlite(self)
+
+    def _create_schema(self):
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS codes (field TEXT NOT NULL, code INTEGER NOT NULL, "
+                "value TEXT NOT NULL, PRIMARY KEY (field, code), UNIQUE (field, value))"
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO codes (field, code, value) VALUES (?, ?, ?)",
+                [(field, code, value) for field, values in FIELD_VALUES.items() for code, value in enumerate(values)]
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, " +
+                ", ".join(f'"{k}" TEXT NOT NULL' for k in USER_FIELDS) + ")"
+            )
+            self.conn.execute('CREATE INDEX IF NOT EXISTS users_username ON users ("Username" COLLATE NOCASE)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS users_email ON users ("Email" COLLATE NOCASE)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS users_mobile ON users ("Mobile")')
+            numbered = True
+            for sql_table in self.TABLES.values():
+                self._create_table(sql_table)
+                existing = [row[1] for row in self.conn.execute(f"PRAGMA table_info({sql_table})")]
+                if "owner" not in existing:
+                    self.conn.execute(f"ALTER TABLE {sql_table} ADD COLUMN owner TEXT NOT NULL DEFAULT ''")
+                if "record_id" not in existing:
+                    self.conn.execute(f"ALTER TABLE {sql_table} ADD COLUMN record_id INTEGER")
+                    numbered = False
+                if "deleted" not in existing:
+                    self.conn.execute(f"ALTER TABLE {sql_table} ADD COLUMN deleted INTEGER")
+                    # Nothing tells when older bin entries were deleted; their
+                    # retention starts with the upgrade
+                    if sql_table == "recycle_bin":
+                        self.conn.execute("UPDATE recycle_bin SET deleted = CAST(strftime('%s', 'now') AS INTEGER)")
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS {sql_table}_owner ON {sql_table} (owner, id)")
+            if not numbered:
+                # Rows from before record ids: book rows take their rowid and
+                # bin rows follow the highest of those, so no two collide
+                self.conn.execute("UPDATE addresses SET record_id = id")
+                self.conn.execute("UPDATE recycle_bin SET record_id = id + (SELECT COALESCE(MAX(id), 0) FROM addresses)")
+            for sql_table in self.TABLES.values():
+                self.conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {sql_table}_record "
+                                  f"ON {sql_table} (owner, record_id)")
+            for field in self.UNUSED_INDEXES:
+                self.conn.execute(f"DROP INDEX IF EXISTS addresses_{field.lower()}")
+
+    def _create_table(self, sql_table):
+        columns = ", ".join(f'"{k}" INTEGER NOT NULL' if k in ENCODED_FIELDS else f'"{k}" TEXT NOT NULL DEFAULT \'\''
+                            for k in ADDRESS_FIELDS)
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {sql_table} "
+                          f"(id INTEGER PRIMARY KEY, {columns}, owner TEXT NOT NULL DEFAULT '', record_id INTEGER, "
+                          f"deleted INTEGER)")
+
+    def _has_text_codes(self):
+        types = {row[1]: row[2] for row in self.conn.execute("PRAGMA table_info(addresses)")}
+        return types[ENCODED_FIELDS[0]] != "INTEGER"
+
+    def _encode_columns(self):
+        # Databases from before the codes table keep State, Country and Type
+        # as text; rebuild both tables with code columns (SQLite cannot
+        # change a column's type in place)
+        columns = ", ".join(f'"{k}"' for k in ADDRESS_FIELDS)
+        selects = ", ".join(f'(SELECT code FROM codes WHERE field = \'{k}\' AND value = old."{k}")'
+                            if k in ENCODED_FIELDS else f'old."{k}"' for k in ADDRESS_FIELDS)
+        with self.lock:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                for sql_table in self.TABLES.values():
+                    for field in ENCODED_FIELDS:
+                        for (value,) in self.conn.execute(f'SELECT DISTINCT "{field}" FROM {sql_table}').fetchall():
+                            self.encode(field, value)
+                    self.conn.execute(f"ALTER TABLE {sql_table} RENAME TO {sql_table}_text")
+                    self._create_table(sql_table)
+                    self.conn.execute(f"INSERT INTO {sql_table} (id, owner, record_id, deleted, {columns}) "
+                                      f"SELECT old.id, old.owner, old.record_id, old.deleted, {selects} "
+                                      f"FROM {sql_table}_text old")
+                    # Takes the renamed indexes with it; _create_schema makes new ones
+                    self.conn.execute(f"DROP TABLE {sql_table}_text")
+            self._create_schema()
+            self.conn.execute("VACUUM")
+
+    def load_codes(self):
+        """Read the codebook of each of ENCODED_FIELDS from the codes table."""
+        with self.lock:
+            self.codebooks = {field: Codebook() for field in ENCODED_FIELDS}
+            for field, code, value in self.conn.execute("SELECT field, code, value FROM codes ORDER BY field, code"):
+                book = self.codebooks[field]
+                book.values.append(value)
+                book.codes[value] = code
+
+    def encode(self, field, value):
+        """Code of value in field's codebook, adding it to the codes table if
+        new. Call within the transaction that stores the code."""
+        book = self.codebooks[field]
+        code = book.codes.get(value)
+        if code is None:
+            code = book.encode(value)
+            self.conn.execute("INSERT INTO codes (field, code, value) VALUES (?, ?, ?)", (field, code, value))
+        return code
+
+    def row_values(self, entry):
+        """Column values of entry in ADDRESS_FIELDS order, with codes for ENCODED_FIELDS."""
+        return [self.encode(k, entry.get(k) or "") if k in ENCODED_FIELDS else entry.get(k) or ""
+                for k in ADDRESS_FIELDS]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def signature(self):
+        # data_version changes whenever another connection commits
+        with self.lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    # Per-user books
+
+    def open(self, username=None):
+        """The SqliteBook of username, or of the shared book if None."""
+        return SqliteBook(self, "" if username is None else owner_key(username))
+
+    def rename(self, old_username, new_username):
+        old, new = owner_key(old_username), owner_key(new_username)
+        if old == new:
+            return
+        with self.lock, self.conn:
+            for sql_table in self.TABLES.values():
+                self.conn.execute(f"UPDATE {sql_table} SET owner = ? WHERE owner = ?", (new, old))
+
+    def remove(self, username):
+        owner = owner_key(username)
+        with self.lock, self.conn:
+            for sql_table in self.TABLES.values():
+                self.conn.execute(f"DELETE FROM {sql_table} WHERE owner = ?", (owner,))
+
+    # Users
+
+    def load_users(self):
+        columns = ", ".join(f'"{k}"' for k in USER_FIELDS)
+        with self.lock:
+            rows = self.conn.execute(f"SELECT {columns} FROM users ORDER BY id").fetchall()
+        return [dict(zip(USER_FIELDS, row)) for row in rows]
+
+    def insert_user(self, user):
+        columns = ", ".join(f'"{k}"' for k in USER_FIELDS)
+        with self.lock, self.conn:
+            self.conn.execute(f"INSERT INTO users ({columns}) VALUES (?, ?, ?, ?)",
+                              [user[k] for k in USER_FIELDS])
+
+    def update_user(self, username, user, users):
+        assignments = ", ".join(f'"{k}" = ?' for k in USER_FIELDS)
+        with self.lock, self.conn:
+            self.conn.execute(f'UPDATE users SET {assignments} WHERE "Username" = ?',
+                              [user[k] for k in USER_FIELDS] + [username])
+
+    def delete_user(self, username, users):
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM users WHERE "Username" = ?', (username,))
+
+
+class SqliteBook:
+    """One owner's address book and recycle bin inside a SqliteBackend.
+
+    Shares the database connection and lock. Records are written by their
+    record id through the (owner, record_id) indexes. Multi-record writes
+    (e.g. delete -> recycle) run in a single transaction.
+    """
+
+    TABLES = SqliteBackend.TABLES
+
+    def __init__(self, db, owner=""):
+        self.db = db
+        self.owner = owner
+        self.conn = db.conn
+        self.lock = db.lock
+        self.file_lock = db.file_lock
+
+    def close(self):
+        pass
+
+    def signature(self):
+        return self.db.signature()
+
+    def load_all(self):
+        columns = ", ".join(f'"{k}"' for k in ADDRESS_FIELDS)
+        with self.lock:
+            # Another connection may have added codes since they were read
+            self.db.load_codes()
+            states, countries, types = [self.db.codebooks[field].values for field in ENCODED_FIELDS]
+            tables = {}
+            for table, sql_table in self.TABLES.items():
+                rows = self.conn.execute(
+                    f"SELECT record_id, deleted, {columns} FROM {sql_table} WHERE owner = ? ORDER BY id",
+                    (self.owner,)
+                ).fetchall()
+                tables[table] = [Address(name, phone, email, address, city, states[state],
+                                         pincode, countries[country], types[entry_type], record_id)
+                                 for record_id, _, name, phone, email, address, city, state, pincode, country,
+                                 entry_type in rows]
+                if table == "recycle":
+                    now = int(time.time())
+                    tables[table] = [RecycledAddress.of(entry, row[1] or now) for entry, row in zip(tables[table], rows)]
+            return tables
+
+    def append(self, table, op, record_id=None, entry=None):
+        self.append_many([(table, op, record_id, entry)])
+
+    def append_many(self, records):
+        """Write (table, op, record id, entry) records in one transaction."""
+        columns = ", ".join(f'"{k}"' for k in ADDRESS_FIELDS)
+        placeholders = ", ".join("?" for _ in ADDRESS_FIELDS)
+        assignments = ", ".join(f'"{k}" = ?' for k in ADDRESS_FIELDS)
+        with self.lock:
+            try:
+                with self.conn:
+                    for table, op, record_id, entry in records:
+                        sql_table = self.TABLES[table]
+                        values = self.db.row_values(entry) if entry else []
+                        if op == "add":
+                            self.conn.execute(
+                                f"INSERT INTO {sql_table} (owner, record_id, deleted, {columns}) "
+                                f"VALUES (?, ?, ?, {placeholders})",
+                                [self.owner, record_id, getattr(entry, "deleted", None)] + values
+                            )
+                        elif op == "update":
+                            self.conn.execute(
+                                f"UPDATE {sql_table} SET {assignments} WHERE owner = ? AND record_id = ?",
+                                values + [self.owner, record_id]
+                            )
+                        elif op == "delete":
+                            self.conn.execute(f"DELETE FROM {sql_table} WHERE owner = ? AND record_id = ?",
+                                              (self.owner, record_id))
+                        elif op == "clear":
+                            self.conn.execute(f"DELETE FROM {sql_table} WHERE owner = ?", (self.owner,))
+            except Exception:
+                # The transaction was rolled back, new codes included
+                self.db.load_codes()
+                raise
+
+
+def migrate_csv_to_sqlite(db, journal=None, user_file=None, books=None):
+    """One-shot copy of the CSV files (including pending journal records)
+    into db: the shared book, the accounts, and each account's own book."""
+    tables = (journal or Journal()).load_all()
+    users = (user_file or UserFile()).load_users()
+    books = books or CsvBooks()
+    owned = []
+    for user in users:
+        # Only books that were opened exist; open() would create the rest
+        if os.path.isdir(books.path(user["Username"])):
+            book = books.open(user["Username"])
+            owned.append((owner_key(user["Username"]), book.load_all()))
+            book.close()
+    columns = "owner, record_id, deleted, " + ", ".join(f'"{k}"' for k in ADDRESS_FIELDS)
+    with db.lock:
+        with db.conn:
+            for owner, book_tables in [("", tables)] + owned:
+                for table, sql_table in db.TABLES.items():
+                    db.conn.executemany(
+                        f"INSERT INTO {sql_table} ({columns}) VALUES (?, ?, ?, " +
+                        ", ".join("?" for _ in ADDRESS_FIELDS) + ")",
+                        [[owner, entry.id, getattr(entry, "deleted", None)] + db.row_values(entry)
+                         for entry in book_tables[table]]
+                    )
+            db.conn.executemany(
+                "INSERT INTO users (" + ", ".join(f'"{k}"' for k in USER_FIELDS) + ") VALUES (?, ?, ?, ?)",
+                [[u.get(k) or "" for k in USER_FIELDS] for u in users]
+            )
+            db.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated', '1')")
+
+
+def open_backends(config=None):
+    """Return the (books, user) storage backends selected in the config.
+
+    books.open(username) gives the address backend of one account's book.
+    """
+    config = config or load_config()
+    backend = config.get("storage", "backend")
+    if backend == "sqlite":
+        db = SqliteBackend()
+        return db, db
+    if backend == "csv":
+        return CsvBooks(), UserFile()
+    raise ValueError(f"Unknown storage backend: {backend!r}")
+
+
+def claim_shared_book(books, username):
+    """Move the shared book, the one from before accounts had their own,
+    into username's book. Returns the number of entries moved."""
+    shared, own = books.open(None), books.open(username)
+    try:
+        return AddressStore(own).absorb(AddressStore(shared))
+    finally:
+        own.close()
+        shared.close()
+
+
+def shared_book_size(books):
+    """Number of entries, bin included, left in the shared book."""
+    shared = AddressStore(books.open(None))
+    try:
+        return len(shared.addresses()) + len(shared.recycled())
+    finally:
+        shared.backend.close()
+
+
+def recycle_limits(config=None):
+    """(max_age, max_entries) for AddressStore.expire() from the config's
+    recycle section, max_age in seconds; None for a limit that is off."""
+    section = (config or load_config())["recycle"]
+    days, entries = section.getfloat("retention_days"), section.getint("max_entries")
+    return (days * 86400 if days > 0 else None), (entries if entries > 0 else None)
+
+
+# --- Bulk import ---
+
+IMPORT_BATCH_SIZE = 1000
+
+_CANONICAL_STATES = {s.casefold(): s for s in INDIAN_STATES}
+_CANONICAL_COUNTRIES = {c.casefold(): c for c in COUNTRIES}
+_CANONICAL_TYPES = {t.casefold(): t for t in ADDRESS_TYPES}
+
+
+def missing_fields(entry):
+    return [k for k in ADDRESS_FIELDS if not (entry.get(k) or "").strip()]
+
+
+def iter_csv_entries(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            yield {k: row.get(k) or "" for k in ADDRESS_FIELDS}
+
+
+def _vcard_unescape(value):
+    return re.sub(r"\\([\\,;nN])", lambda m: "\n" if m.group(1) in "nN" else m.group(1), value)
+
+
+def _vcard_to_entry(props):
+    adr = props.get("ADR", "")
+    parts = (re.split(r"(?<!\\);", adr) + [""] * 7)[:7]
+    _, _, street, city, region, postcode, country = [_vcard_unescape(p) for p in parts]
+    categories = props.get("CATEGORIES", "").casefold()
+    if "business" in categories or ("ORG" in props and "personal" not in categories):
+        entry_type = "Business"
+    else:
+        entry_type = "Personal"
+    return {
+        "Name": _vcard_unescape(props.get("FN", "")),
+        "Phone": _vcard_unescape(props.get("TEL", "")),
+        "Email": _vcard_unescape(props.get("EMAIL", "")),
+        "Address": street,
+        "City": city,
+        "State": region,
+        "Pincode": postcode,
+        "Country": country or "India",
+        "Type": entry_type,
+    }
+
+
+def _unfold_lines(f):
+    # Lines starting with a space or tab continue the previous one (RFC 6350, 3.2)
+    logical = None
+    for raw in f:
+        raw = raw.rstrip("\r\n")
+        if raw[:1] in (" ", "\t") and logical is not None:
+            logical += raw[1:]
+            continue
+        if logical is not None:
+            yield logical
+        logical = raw
+    if logical is not None:
+        yield logical
+
+
+def iter_vcard_entries(path):
+    """Yield one entry per BEGIN:VCARD ... END:VCARD block, reading line by line."""
+    props = None
+    with open(path, encoding='utf-8-sig') as f:
+        for line in _unfold_lines(f):
+            name, _, value = line.partition(":")
+            name = name.split(";", 1)[0].split(".")[-1].upper()
+            if name == "BEGIN" and value.upper() == "VCARD":
+                props = {}
+            elif name == "END" and value.upper() == "VCARD":
+                if props is not None:
+                    yield _vcard_to_entry(props)
+                props = None
+            elif props is not None:
+                # Keep the first TEL/EMAIL/ADR; the book stores one of each
+                props.setdefault(name, value)
+
+
+def normalize_entry(entry):
+    """Return (entry, None) with canonical spellings, or (None, reason)."""
+    entry = {k: (entry.get(k) or "").strip() for k in ADDRESS_FIELDS}
+    missing = missing_fields(entry)
+    if missing:
+        return None, "missing " + ", ".join(missing)
+    country = _CANONICAL_COUNTRIES.get(entry["Country"].casefold())
+    if country is None:
+        return None, f"unknown country {entry['Country']!r}"
+    entry["Country"] = country
+    if country == "India":
+        state = _CANONICAL_STATES.get(entry["State"].casefold())
+        if state is None:
+            return None, f"unknown state {entry['State']!r}"
+        entry["State"] = state
+    entry_type = _CANONICAL_TYPES.get(entry["Type"].casefold())
+    if entry_type is None:
+        return None, f"unknown type {entry['Type']!r}"
+    entry["Type"] = entry_type
+    return entry, None
+
+
+def dedupe_key(entry):
+    """A 16-byte digest of the casefolded name and email and the phone digits.
+
+    The import's seen-set holds one per unique entry, so its memory grows
+    with the number of unique keys, at a fixed size per key however long
+    the fields are. A 128-bit digest makes it vanishingly unlikely that two
+    distinct contacts collide and one is dropped as a duplicate.
+    """
+    phone = re.sub(r"\D", "", entry["Phone"])
+    key = repr((entry["Name"].casefold(), phone, entry["Email"].casefold()))
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+
+
+class ImportStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.read = 0
+        self.imported = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self.errors = []
+        self.cancelled = False
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_sec(self):
+        elapsed = self.elapsed
+        return self.read / elapsed if elapsed else 0.0
+
+    def summary(self):
+        text = (f"Imported {self.imported} of {self.read} entries "
+                f"({self.invalid} invalid, {self.duplicates} duplicates) "
+                f"in {self.elapsed:.2f}s, {self.rows_per_sec:,.0f} rows/sec.")
+        return text + (" Cancelled." if self.cancelled else "")
+
+
+def import_entries(store, rows, batch_size=IMPORT_BATCH_SIZE, progress=None, cancel=None):
+    """Validate, dedupe and add rows (any iterable of dicts) in batches.
+
+    Only one batch is held at a time. progress(stats) is called after each
+    batch is committed; setting the cancel Event stops after the current one.
+    """
+    stats = ImportStats()
+    seen = {dedupe_key(entry) for entry in store.addresses()}
+    batch = []
+
+    def commit():
+        store.add_many(batch)
+        stats.imported += len(batch)
+        batch.clear()
+        if progress:
+            progress(stats)
+
+    for row in rows:
+        if cancel is not None and cancel.is_set():
+            stats.cancelled = True
+            break
+        stats.read += 1
+        entry, error = normalize_entry(row)
+        if error:
+            stats.invalid += 1
+            if len(stats.errors) < 20:
+                stats.errors.append(f"row {stats.read}: {error}")
+            continue
+        key = dedupe_key(entry)
+        if key in seen:
+            stats.duplicates += 1
+            continue
+        seen.add(key)
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            commit()
+    if batch:
+        commit()
+    elif progress:
+        progress(stats)
+    return stats
+
+
+def import_file(store, path, **kwargs):
+    """Import a .csv or .vcf/.vcard file; see import_entries for the options."""
+    if os.path.splitext(path)[1].lower() in (".vcf", ".vcard"):
+        rows = iter_vcard_entries(path)
+    else:
+        rows = iter_csv_entries(path)
+    return import_entries(store, rows, **kwargs)
+
+
+# --- Duplicate detection ---
+
+# Digits of a phone number compared for equality; shorter numbers compare whole
+PHONE_MATCH_DIGITS = 10
+# Digits of the phone suffix used as a blocking key
+PHONE_BLOCK_DIGITS = 7
+# Name similarity (difflib ratio of the sorted name words) counted as a match
+NAME_SIMILARITY = 0.85
+# Blocks bigger than this are too unselective to compare pairwise
+DEDUPE_MAX_BLOCK = 500
+
+
+def normalize_phone(phone):
+    return re.sub(r"\D", "", phone)[-PHONE_MATCH_DIGITS:]
+
+
+def normalize_email(email):
+    local, _, domain = email.strip().casefold().partition("@")
+    # "name+tag@domain" reaches the same mailbox as "name@domain"
+    return local.split("+", 1)[0] + "@" + domain if domain else local
+
+
+def normalize_name(name):
+    return " ".join(sorted(tokenize(name)))
+
+
+class DuplicateIndex:
+    """Blocking index for finding likely duplicates of a contact.
+
+    Each row is filed under a few blocking keys: its phone suffix, its
+    Pincode with the first name word, and its normalized email. Only rows
+    sharing a block are compared, so checking one entry costs O(block size)
+    and a batch pass is near-linear in the book size. Like SearchIndex, rows
+    are keyed by identity and updated incrementally.
+    """
+
+    def __init__(self, rows=()):
+        self.rows = {}
+        self.normalized = {}
+        self.blocks = defaultdict(set)
+        for row in rows:
+            self.add(row)
+
+    @staticmethod
+    def normalize(entry):
+        return (normalize_name(entry["Name"]), normalize_phone(entry["Phone"]),
+                normalize_email(entry["Email"]), entry["Pincode"].strip())
+
+    @staticmethod
+    def keys(normalized):
+        name, phone, email, pincode = normalized
+        first = name.split(" ", 1)[0]
+        keys = []
+        if len(phone) >= PHONE_BLOCK_DIGITS:
+            keys.append(("phone", phone[-PHONE_BLOCK_DIGITS:]))
+        if pincode and first:
+            keys.append(("pin", pincode, first))
+        # The whole address rather than just the domain: a domain alone
+        # would put most of a book in one gmail.com block
+        if "@" in email:
+            keys.append(("email", email))
+        return keys
+
+    def add(self, row):
+        key = id(row)
+        normalized = self.normalize(row)
+        self.rows[key] = row
+        self.normalized[key] = normalized
+        for block in self.keys(normalized):
+            self.blocks[block].add(key)
+
+    def remove(self, row):
+        key = id(row)
+        if self.rows.pop(key, None) is None:
+            return
+        for block in self.keys(self.normalized.pop(key)):
+            members = self.blocks[block]
+            members.discard(key)
+            if not members:
+                del self.blocks[block]
+
+    def clear(self):
+        self.rows.clear()
+        self.normalized.clear()
+        self.blocks.clear()
+
+    def matches(self, entry):
+        """Rows that look like the same contact as entry, best first, as (score, row, reasons)."""
+        normalized = self.normalize(entry)
+        candidates = set()
+        for block in self.keys(normalized):
+            members = self.blocks.get(block, set())
+            if len(members) <= DEDUPE_MAX_BLOCK:
+                candidates |= members
+        candidates.discard(id(entry))
+        found = []
+        matcher = difflib.SequenceMatcher(None, "", normalized[0])
+        for key in candidates:
+            score, reasons = compare_normalized(normalized, self.normalized[key], matcher)
+            if reasons:
+                found.append((score, self.rows[key], reasons))
+        found.sort(key=lambda match: -match[0])
+        return found
+
+    def pairs(self):
+        """Yield (score, row, other, reasons) once for each likely duplicate pair."""
+        # Pairs sharing several blocks are compared more than once, which
+        # is cheaper than remembering every pair that was compared
+        reported = set()
+        for members in self.blocks.values():
+            if len(members) < 2 or len(members) > DEDUPE_MAX_BLOCK:
+                continue
+            members = sorted(members)
+            for i, a in enumerate(members):
+                norm_a = self.normalized[a]
+                # The matcher caches its analysis of the second sequence
+                matcher = difflib.SequenceMatcher(None, "", norm_a[0])
+                for b in members[i + 1:]:
+                    score, reasons = compare_normalized(norm_a, self.normalized[b], matcher)
+                    if reasons and (a, b) not in reported:
+                        reported.add((a, b))
+                        yield score, self.rows[a], self.rows[b], reasons
+
+
+def compare_entries(a, b):
+    """Return (score, reasons) for two entries; reasons is empty unless they look like one contact."""
+    return compare_normalized(DuplicateIndex.normalize(a), DuplicateIndex.normalize(b))
+
+
+def compare_normalized(a, b, matcher=None):
+    # A similar name plus any one shared phone, email or Pincode is a match,
+    # as is a shared phone and email under different names. matcher, if
+    # given, is a SequenceMatcher whose second sequence is a's name
+    name_a, phone_a, email_a, pincode_a = a
+    name_b, phone_b, email_b, pincode_b = b
+    same_phone = phone_a == phone_b and len(phone_a) >= PHONE_BLOCK_DIGITS
+    same_email = email_a == email_b and "@" in email_a
+    same_pincode = pincode_a == pincode_b
+    if not (same_phone or same_email or same_pincode):
+        return 0.0, []
+    similarity = 0.0
+    if name_a == name_b:
+        similarity = 1.0
+    elif 2 * min(len(name_a), len(name_b)) >= NAME_SIMILARITY * (len(name_a) + len(name_b)):
+        if matcher is None:
+            matcher = difflib.SequenceMatcher(None, "", name_a)
+        matcher.set_seq1(name_b)
+        if matcher.quick_ratio() >= NAME_SIMILARITY:
+            similarity = matcher.ratio()
+    similar_name = similarity >= NAME_SIMILARITY
+
+    score = similarity + same_phone + same_email + 0.5 * same_pincode
+    if not ((similar_name and (same_phone or same_email or same_pincode)) or (same_phone and same_email)):
+        return score, []
+    reasons = []
+    if similar_name:
+        reasons.append("same name" if name_a == name_b else "similar name")
+    if same_phone:
+        reasons.append("same phone")
+    if same_email:
+        reasons.append("same email")
+    if same_pincode:
+        reasons.append("same Pincode")
+    return score, reasons
+
+
+def merge_entries(keep, other):
+    """Suggested merge of two entries: per field, keep's value unless other's is more complete."""
+    merged = {}
+    for field in ADDRESS_FIELDS:
+        a, b = keep[field].strip(), other[field].strip()
+        merged[field] = b if len(b) > len(a) and field not in ("State", "Country", "Type") else a
+    return merged
@@ -0,0 +1,521 @@
+"""Benchmarks for the address book's storage, search and rendering hot paths.
+
+Generates synthetic books of the requested sizes, times the operations the
+app runs most and writes the results as JSON, so runs of two versions can be
+compared:
+
+    python benchmark.py --sizes 1000 100000 --output new.json
+    python benchmark.py --module ../old/addressbook.py --output old.json
+    python benchmark.py --compare old.json new.json
+
+Versions from before AddressStore and UserIndex are timed through their
+read_csv/write_csv, the way their app used them; benchmarks of code a
+version lacks are recorded as errors.
+
+Each size runs in its own temporary data folder. The window is only timed
+when Tk can open a display: the current one, or a virtual X server started
+through the optional xvfbwrapper package. Otherwise those results are
+recorded as skipped.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_REPEAT = 3
+# Mutations timed per round-trip benchmark
+ROUND_TRIPS = 100
+LOOKUPS = 1000
+# A result this much slower than the baseline counts as a regression
+DEFAULT_TOLERANCE = 0.2
+
+FIRST_NAMES = ["Aarav", "Vivaan", "Aditya", "Arjun", "Ravi", "Ishaan", "Kabir", "Rohan", "Ananya",
+               "Diya", "Pooja", "Priya", "Saanvi", "Meera", "Kavya", "Neha", "Sneha", "Zara"]
+LAST_NAMES = ["Sharma", "Verma", "Gupta", "Singh", "Reddy", "Iyer", "Nair", "Patel", "Mehta",
+              "Das", "Khan", "Joshi", "Rao", "Kulkarni", "Chopra", "Bose"]
+CITIES = ["Delhi", "Mumbai", "Bengaluru", "Chennai", "Kolkata", "Hyderabad", "Pune", "Jaipur",
+          "Lucknow", "Panaji", "Kochi", "Indore"]
+SEARCH_QUERIES = ["pooja", "sharma delhi", "9876", "ananya gmail"]
+# Typed into the search box one key at a time
+TYPED_QUERY = "sharma del"
+# Rows the window shows before the rest of a search is ordered
+FIRST_PAGE = 50
+
+
+def load_module(path):
+    # Newer versions import addressbook_core from beside them; make sure it
+    # is the one of the same checkout
+    sys.path.insert(0, os.path.dirname(path))
+    sys.modules.pop("addressbook_core", None)
+    spec = importlib.util.spec_from_file_location("addressbook", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["addressbook"] = module
+    # Older versions make their data folder on import; keep it out of here
+    workdir = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="addressbook-bench-") as folder:
+        os.chdir(folder)
+        try:
+            spec.loader.exec_module(module)
+        finally:
+            os.chdir(workdir)
+    return module
+
+
+def git_revision(path):
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(path),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# --- Synthetic data ---
+
+def make_entries(ab, count, seed=0):
+    """count address book entries built from ADDRESS_FIELDS, the state list and the country list."""
+    rnd = random.Random(seed)
+    entries = []
+    for i in range(count):
+        first, last = rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES)
+        values = {
+            "Name": f"{first} {last}",
+            "Phone": str(rnd.randint(6000000000, 9999999999)),
+            "Email": f"{first.lower()}.{last.lower()}{i}@{rnd.choice(['gmail.com', 'yahoo.com', 'example.in'])}",
+            "Address": f"{rnd.randint(1, 999)}, Sector {rnd.randint(1, 60)}",
+            "City": rnd.choice(CITIES),
+            "State": rnd.choice(ab.INDIAN_STATES),
+            "Pincode": str(rnd.randint(110001, 855999)),
+            # Mostly Indian contacts, like a real book
+            "Country": "India" if rnd.random() < 0.9 else rnd.choice(ab.COUNTRIES),
+            "Type": rnd.choice(getattr(ab, "ADDRESS_TYPES", ["Personal", "Business"])),
+        }
+        entries.append({k: values[k] for k in ab.ADDRESS_FIELDS})
+    return entries
+
+
+class CsvFileStore:
+    """The AddressStore calls the benchmarks use, for versions from before
+    it: like their app, every call reads the CSV files again and writes
+    back whole files through read_csv/write_csv. Entries are addressed by
+    position. Searches and views did not exist, so timing them records an
+    error."""
+
+    def __init__(self, ab):
+        self.ab = ab
+
+    def _read(self):
+        return self.ab.read_csv(self.ab.ADDRESS_FILE), self.ab.read_csv(self.ab.RECYCLE_FILE)
+
+    def _write(self, addresses, recycle):
+        self.ab.write_csv(self.ab.ADDRESS_FILE, addresses, self.ab.ADDRESS_FIELDS)
+        self.ab.write_csv(self.ab.RECYCLE_FILE, recycle, self.ab.ADDRESS_FIELDS)
+
+    def addresses(self):
+        return self._read()[0]
+
+    def recycled(self):
+        return self._read()[1]
+
+    def add(self, entry):
+        addresses = self.ab.read_csv(self.ab.ADDRESS_FILE)
+        addresses.append(entry)
+        self.ab.write_csv(self.ab.ADDRESS_FILE, addresses, self.ab.ADDRESS_FIELDS)
+
+    def update(self, pos, entry):
+        addresses = self.ab.read_csv(self.ab.ADDRESS_FILE)
+        addresses[pos] = entry
+        self.ab.write_csv(self.ab.ADDRESS_FILE, addresses, self.ab.ADDRESS_FIELDS)
+
+    def delete(self, pos):
+        addresses, recycle = self._read()
+        recycle.append(addresses.pop(pos))
+        self._write(addresses, recycle)
+
+    def recover(self, pos):
+        addresses, recycle = self._read()
+        addresses.append(recycle.pop(pos))
+        self._write(addresses, recycle)
+
+
+def make_users(count):
+    return [{"Username": f"user{i}", "Email": f"user{i}@example.in",
+             "Mobile": str(7000000000 + i), "Password": "x"} for i in range(count)]
+
+
+# --- Timing ---
+
+def measure(work, repeat, setup=None, count=1):
+    """Time work() repeat times, calling setup() untimed before each run.
+
+    Returns min and median seconds; with count, also the median per item.
+    """
+    times = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        start = time.perf_counter()
+        work(state) if setup else work()
+        times.append(time.perf_counter() - start)
+    result = {"min": min(times), "median": statistics.median(times), "repeat": repeat}
+    if count > 1:
+        result["per_item"] = result["median"] / count
+        result["items"] = count
+    return result
+
+
+class Suite:
+    """Collects results as {"<size>/<group>/<name>": {...}}."""
+
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = {}
+
+    def run(self, key, work, **kwargs):
+        kwargs.setdefault("repeat", self.repeat)
+        try:
+            result = measure(work, **kwargs)
+        except Exception as e:
+            # Older versions may lack the code being timed
+            result = {"error": f"{type(e).__name__}: {e}"}
+        self.record(key, result)
+
+    def record(self, key, result):
+        self.results[key] = result
+        print(f"{key:45} {format_result(result)}", file=sys.stderr)
+
+    def skip(self, key, reason):
+        self.results[key] = {"skipped": reason}
+        print(f"{key:45} skipped: {reason}", file=sys.stderr)
+
+
+def format_result(result):
+    if "median" not in result:
+        return result.get("error") or "skipped: " + result.get("skipped", "")
+    text = f"{result['median'] * 1000:10.2f} ms"
+    if "per_item" in result:
+        text += f"  ({result['per_item'] * 1e6:.1f} us each)"
+    return text
+
+
+# --- Benchmarks ---
+
+def bench_csv(ab, suite, prefix, entries):
+    path = ab.ADDRESS_FILE
+    suite.run(prefix + "csv/write_csv", lambda: ab.write_csv(path, entries, ab.ADDRESS_FIELDS))
+    suite.run(prefix + "csv/read_csv", lambda: ab.read_csv(path))
+    if hasattr(ab, "read_addresses"):
+        suite.run(prefix + "csv/read_addresses", lambda: ab.read_addresses(path))
+
+
+def bench_store(ab, suite, prefix, open_store, entries):
+    """Load, search, view and mutate one book through AddressStore."""
+    rnd = random.Random(1)
+    extra = make_entries(ab, ROUND_TRIPS, seed=2)
+    fresh_store = open_store
+
+    def loaded_store():
+        store = fresh_store()
+        store.addresses()
+        return store
+
+    suite.run(prefix + "load", lambda store: store.addresses(), setup=fresh_store)
+    store = fresh_store()
+    store.addresses()
+    suite.run(prefix + "search/first", lambda s: s.search(SEARCH_QUERIES[0]), setup=loaded_store, repeat=1)
+    suite.run(prefix + "search/warm", lambda: [store.search(q) for q in SEARCH_QUERIES],
+              count=len(SEARCH_QUERIES))
+
+    def indexed_store():
+        store = loaded_store()
+        store.search(SEARCH_QUERIES[-1])
+        return store
+
+    # One query per key, each extending the last; per_item is one keystroke.
+    # The window asks for the first page of each before the whole list
+    typed = [TYPED_QUERY[:i] for i in range(1, len(TYPED_QUERY) + 1)]
+    suite.run(prefix + "search/typing", lambda s: [s.view(q) for q in typed],
+              setup=indexed_store, count=len(typed))
+    suite.run(prefix + "search/typing_paged", lambda s: [(s.view_head(FIRST_PAGE, q), s.view(q)) for q in typed],
+              setup=indexed_store, count=len(typed))
+    if hasattr(store, "view"):
+        suite.run(prefix + "view/sort_first", lambda s: s.view(sort="Name"), setup=loaded_store, repeat=1)
+        suite.run(prefix + "view/sort_desc", lambda: store.view(sort="City", descending=True))
+        suite.run(prefix + "view/filter", lambda: store.view(filters={"Type": "Business", "Country": "India"}))
+
+    # Round trips: the per-item time is the latency of one click. Stores
+    # from before record ids take positions instead
+    keyed = hasattr(ab, "RECORD_FIELDS")
+
+    def pick(rows, pos):
+        return rows[pos].id if keyed else pos
+
+    def adds():
+        for entry in extra:
+            store.add(entry)
+
+    def edits():
+        for entry in extra:
+            rows = store.addresses()
+            store.update(pick(rows, rnd.randrange(len(rows))), entry)
+
+    def deletes():
+        for _ in extra:
+            rows = store.addresses()
+            store.delete(pick(rows, rnd.randrange(len(rows))))
+
+    def recovers():
+        for _ in extra:
+            rows = store.recycled()
+            store.recover(pick(rows, len(rows) - 1))
+
+    for name, work in (("add", adds), ("edit", edits), ("delete", deletes), ("recover", recovers)):
+        suite.run(prefix + "round_trip/" + name, work, count=len(extra), repeat=1)
+    close = getattr(getattr(store, "backend", None), "close", None)
+    if close:
+        close()
+
+
+def bench_users(ab, suite, prefix, count):
+    users = make_users(count)
+    ab.write_csv(ab.USER_FILE, users, ab.USER_FIELDS)
+    names = [u["Username"] for u in random.Random(3).sample(users, min(LOOKUPS, count))]
+
+    def fresh_index():
+        if hasattr(ab, "UserIndex"):
+            return ab.UserIndex(ab.UserFile())
+        # Older versions scanned the whole file at every login
+        return CsvUserIndex(ab)
+
+    suite.run(prefix + "users/first_lookup", lambda index: index.find(names[0]), setup=fresh_index)
+    index = fresh_index()
+    index.find(names[0])
+    # Password hashing is left out; hash-benchmark times that
+    suite.run(prefix + "users/lookup", lambda: [index.find(name) for name in names], count=len(names))
+
+
+class CsvUserIndex:
+    """UserIndex.find() for versions from before it."""
+
+    def __init__(self, ab):
+        self.ab = ab
+
+    def find(self, username):
+        return next((u for u in self.ab.read_csv(self.ab.USER_FILE) if u["Username"] == username), None)
+
+
+def open_display():
+    """Start a virtual X server if there is no display; returns it (or None) and why Tk cannot run."""
+    import tkinter as tk
+    display = None
+    if not os.environ.get("DISPLAY") and sys.platform.startswith("linux"):
+        try:
+            from xvfbwrapper import Xvfb
+        except ImportError:
+            return None, "no display and xvfbwrapper is not installed"
+        display = Xvfb(width=1280, height=800)
+        try:
+            display.start()
+        except Exception as e:
+            return None, f"could not start Xvfb: {e}"
+    try:
+        tk.Tk().destroy()
+    except tk.TclError as e:
+        if display:
+            display.stop()
+        return None, f"Tk cannot open a display: {e}"
+    return display, None
+
+
+def bench_window(ab, suite, prefix):
+    """Time refresh_entries, from request to a drawn list, in a real window."""
+    root = ab.tk.Tk()
+    root.geometry("1230x740")
+    app = ab.AddressBookApp(root)
+    try:
+        # The backends may still be opening on the storage worker
+        settle(root, app)
+        app.store = ab.AddressStore(app.books.open(None))
+        app.store.addresses()
+        app.show_address_book()
+        settle(root, app)
+
+        def refresh():
+            app.refresh_entries()
+            settle(root, app)
+
+        suite.run(prefix + "window/refresh_entries", refresh)
+        if app.sort_var is not None:
+            app.sort_var.set("Name")
+            suite.run(prefix + "window/refresh_sorted", refresh)
+            app.sort_var.set("Book order")
+        app.search_var.set(SEARCH_QUERIES[0])
+        suite.run(prefix + "window/refresh_search", refresh)
+    finally:
+        close = getattr(app, "close", None)
+        if close:
+            close()
+        root.destroy()
+
+
+def bench_startup(ab, suite, prefix):
+    """Time cold starts of the app up to its first drawn window.
+
+    startup_process is the wall time of the whole process (interpreter,
+    imports, closing down); first_window is what the app reports itself.
+    """
+    command = [sys.executable, ab.__file__, "--startup-time"]
+    drawn = []
+
+    def start():
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        drawn.append(float(re.search(r"drawn in ([\d.]+)s", output).group(1)))
+
+    suite.run(prefix + "window/startup_process", start)
+    if drawn:
+        suite.record(prefix + "window/first_window",
+                     {"min": min(drawn), "median": statistics.median(drawn), "repeat": len(drawn)})
+
+
+def settle(root, app):
+    # Pumps the event loop until queued work has been delivered and drawn
+    tasks = getattr(app, "tasks", None)
+    root.update()
+    while tasks is not None and (tasks.pending or not tasks.results.empty()):
+        time.sleep(0.001)
+        root.update()
+    root.update_idletasks()
+
+
+def run_size(ab, suite, size, backends, window):
+    entries = make_entries(ab, size)
+    prefix = f"{size}/"
+    workdir = os.getcwd()
+    for backend in backends:
+        with tempfile.TemporaryDirectory(prefix="addressbook-bench-") as folder:
+            os.chdir(folder)
+            try:
+                if hasattr(ab, "init_data"):
+                    ab.init_data()
+                else:
+                    os.makedirs(ab.DATA_FOLDER, exist_ok=True)
+                ab.write_csv(ab.ADDRESS_FILE, entries, ab.ADDRESS_FIELDS)
+                if backend == "csv":
+                    bench_csv(ab, suite, prefix, entries)
+                    bench_users(ab, suite, prefix, size)
+                    if hasattr(ab, "AddressStore"):
+                        bench_store(ab, suite, prefix + "csv/", lambda: ab.AddressStore(ab.Journal()), entries)
+                    else:
+                        bench_store(ab, suite, prefix + "csv/", lambda: CsvFileStore(ab), entries)
+                    if window and not hasattr(ab, "run_gui"):
+                        # Older windows neither report when they are drawn
+                        # nor close by themselves
+                        suite.record(prefix + "window", {"error": "no --startup-time in this version"})
+                    elif window:
+                        bench_startup(ab, suite, prefix)
+                        bench_window(ab, suite, prefix)
+                elif not hasattr(ab, "SqliteBackend"):
+                    suite.record(prefix + "sqlite", {"error": "no SqliteBackend in this version"})
+                elif backend == "sqlite":
+                    # The first open copies the CSV book into the database
+                    suite.run(prefix + "sqlite/migrate", lambda: ab.SqliteBackend().close(), repeat=1)
+                    db = ab.SqliteBackend()
+                    open_book = (lambda: db.open(None)) if hasattr(db, "open") else (lambda: db)
+                    bench_store(ab, suite, prefix + "sqlite/", lambda: ab.AddressStore(open_book()), entries)
+                    db.close()
+            finally:
+                os.chdir(workdir)
+
+
+# --- Comparison ---
+
+def compare(baseline_file, current_file, tolerance=DEFAULT_TOLERANCE):
+    """Print the ratio of each median to the baseline; returns the regressed keys."""
+    with open(baseline_file, encoding='utf-8') as f:
+        baseline = json.load(f)["results"]
+    with open(current_file, encoding='utf-8') as f:
+        current = json.load(f)["results"]
+    regressions = []
+    for key, result in current.items():
+        old = baseline.get(key, {})
+        if "median" not in result or "median" not in old:
+            continue
+        ratio = result["median"] / old["median"] if old["median"] else float("inf")
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        elif ratio < 1 - tolerance:
+            flag = "  faster"
+        print(f"{key:45} {old['median'] * 1000:10.2f} -> {result['median'] * 1000:10.2f} ms  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the address book's hot paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="book sizes to generate (default: %(default)s)")
+    parser.add_argument("--backends", nargs="+", choices=["csv", "sqlite"], default=["csv", "sqlite"])
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="runs per measurement")
+    parser.add_argument("--no-window", action="store_true", help="skip the window benchmarks")
+    parser.add_argument("--module", default=os.path.join(HERE, "addressbook.py"),
+                        help="addressbook.py to benchmark, e.g. from an older checkout")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="compare two result files instead of running")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="slowdown reported as a regression (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        regressions = compare(*args.compare, tolerance=args.tolerance)
+        if regressions:
+            raise SystemExit(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}.")
+        return
+
+    module = os.path.abspath(args.module)
+    ab = load_module(module)
+    suite = Suite(args.repeat)
+    display, window_skipped = (None, "disabled with --no-window") if args.no_window else open_display()
+    try:
+        for size in args.sizes:
+            if window_skipped and "csv" in args.backends:
+                suite.skip(f"{size}/window", window_skipped)
+            run_size(ab, suite, size, args.backends, window=window_skipped is None)
+    finally:
+        if display:
+            display.stop()
+
+    report = {
+        "meta": {
+            "module": module,
+            "revision": git_revision(module),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "sizes": args.sizes,
+            "repeat": args.repeat,
+        },
+        "results": suite.results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding='utf-8') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
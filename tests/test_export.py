@@ -0,0 +1,101 @@
+import csv
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import addressbook  # noqa: E402
+from test_journal import entry  # noqa: E402
+
+TRICKY = dict(entry("Rao, Asha; \"Ash\""), Address="Flat 2\\B\n1 Main Road, Kothrud", Type="Business")
+
+
+def export(entries, fmt, chunk_size=addressbook.EXPORT_CHUNK_SIZE):
+    f = io.StringIO()
+    written = addressbook.write_chunks(f, addressbook.EXPORT_FORMATS[fmt](entries), chunk_size)
+    return f.getvalue(), written
+
+
+class ExportFormatTest(unittest.TestCase):
+
+    def test_csv(self):
+        text, _ = export([entry("Asha"), TRICKY], "csv")
+        rows = list(csv.DictReader(io.StringIO(text, newline='')))
+        self.assertEqual(rows, [entry("Asha"), TRICKY])
+
+    def test_jsonl(self):
+        text, _ = export(iter([entry("Asha"), TRICKY]), "jsonl")
+        lines = text.splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [entry("Asha"), TRICKY])
+        self.assertEqual(list(json.loads(lines[0])), addressbook.ADDRESS_FIELDS)
+
+    def test_vcard_round_trip(self):
+        text, _ = export([entry("Asha"), TRICKY], "vcf")
+        self.assertIn("ADR;TYPE=WORK:;;Flat 2\\\\B\\n1 Main Road\\, Kothrud;Pune;", text)
+        folder = tempfile.mkdtemp(prefix="addressbook-test-")
+        self.addCleanup(shutil.rmtree, folder, ignore_errors=True)
+        path = os.path.join(folder, "out.vcf")
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            f.write(text)
+        self.assertEqual(list(addressbook.iter_vcard_entries(path)), [entry("Asha"), TRICKY])
+
+    def test_html_is_escaped(self):
+        text, _ = export([dict(entry("<b>Asha</b> & co"))], "html")
+        self.assertIn("&lt;b&gt;Asha&lt;/b&gt; &amp; co", text)
+        self.assertNotIn("<b>Asha</b>", text)
+
+    def test_records_export_like_dicts(self):
+        record = addressbook.Address.from_mapping(TRICKY)
+        for fmt in addressbook.EXPORT_FORMATS:
+            with self.subTest(fmt=fmt):
+                self.assertEqual(export([record], fmt)[0], export([TRICKY], fmt)[0])
+
+    def test_chunks(self):
+        entries = [entry(f"Name{i}") for i in range(5)]
+        text, written = export(entries, "jsonl", chunk_size=2)
+        self.assertEqual(written, 5)
+        self.assertEqual(text, export(entries, "jsonl")[0])
+
+    def test_format_for_path(self):
+        for path, fmt in (("a.csv", "csv"), ("a.VCF", "vcf"), ("a.vcard", "vcf"), ("a.json", "jsonl"),
+                          ("a.jsonl", "jsonl"), ("a.htm", "html"), ("a.txt", "csv"), ("-", "csv")):
+            with self.subTest(path=path):
+                self.assertEqual(addressbook.export_format_for(path), fmt)
+
+
+class PrintPreviewTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="addressbook-test-")
+        self.addCleanup(shutil.rmtree, self.folder, ignore_errors=True)
+
+    def test_pages_and_index(self):
+        path = addressbook.render_print_pages([entry(f"Name{i}") for i in range(5)], self.folder, page_size=2)
+        self.assertEqual(os.path.basename(path), "index.html")
+        self.assertEqual(sorted(os.listdir(self.folder)),
+                         ["index.html", "page-0001.html", "page-0002.html", "page-0003.html"])
+        single = os.path.join(self.folder, "single")
+        os.mkdir(single)
+        path = addressbook.render_print_pages([entry("Asha")], single)
+        self.assertEqual(os.path.basename(path), "page-0001.html")
+
+    def test_only_stale_previews_are_removed(self):
+        now = time.time()
+        for name, age in (("addressbook-print-old", 7200), ("addressbook-print-new", 60), ("other-old", 7200)):
+            path = os.path.join(self.folder, name)
+            os.mkdir(path)
+            with open(os.path.join(path, "page-0001.html"), 'w') as f:
+                f.write("x")
+            os.utime(path, (now - age, now - age))
+        self.assertEqual(addressbook.remove_stale_print_dirs(self.folder, max_age=3600, now=now), 1)
+        self.assertEqual(sorted(os.listdir(self.folder)), ["addressbook-print-new", "other-old"])
+
+
+if __name__ == "__main__":
+    unittest.main()
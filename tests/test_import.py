@@ -0,0 +1,138 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import addressbook  # noqa: E402
+from test_journal import entry  # noqa: E402
+
+
+class ImportTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="addressbook-test-")
+        self.addCleanup(shutil.rmtree, self.folder, ignore_errors=True)
+        tables = {"address": os.path.join(self.folder, "address_book.csv"),
+                  "recycle": os.path.join(self.folder, "recycle_bin.csv")}
+        journal = addressbook.Journal(os.path.join(self.folder, "journal.csv"), tables)
+        self.addCleanup(journal.close)
+        self.store = addressbook.AddressStore(journal)
+
+    def write(self, name, text):
+        path = os.path.join(self.folder, name)
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def names(self):
+        return [row["Name"] for row in self.store.addresses()]
+
+
+class NormalizeEntryTest(unittest.TestCase):
+
+    def test_canonical_spellings(self):
+        normalized, error = addressbook.normalize_entry(
+            dict(entry("Asha"), State=" maharashtra ", Country="INDIA", Type="business"))
+        self.assertIsNone(error)
+        self.assertEqual((normalized["State"], normalized["Country"], normalized["Type"]),
+                         ("Maharashtra", "India", "Business"))
+
+    def test_state_is_free_text_outside_india(self):
+        normalized, error = addressbook.normalize_entry(dict(entry("Asha"), State="Bavaria", Country="germany"))
+        self.assertIsNone(error)
+        self.assertEqual((normalized["State"], normalized["Country"]), ("Bavaria", "Germany"))
+
+    def test_rejections(self):
+        for changes, reason in (({"Phone": " ", "City": ""}, "missing Phone, City"),
+                                ({"Country": "Atlantis"}, "unknown country 'Atlantis'"),
+                                ({"State": "Nowhere"}, "unknown state 'Nowhere'"),
+                                ({"Type": "Family"}, "unknown type 'Family'")):
+            with self.subTest(reason=reason):
+                self.assertEqual(addressbook.normalize_entry(dict(entry("Asha"), **changes)), (None, reason))
+
+
+class DedupeKeyTest(unittest.TestCase):
+
+    def test_normalized(self):
+        key = addressbook.dedupe_key(entry("Asha"))
+        self.assertEqual(len(key), 16)
+        same = dict(entry("Asha"), Name="ASHA", Email="Asha@Example.com", Phone="98765-43210")
+        self.assertEqual(addressbook.dedupe_key(same), key)
+
+    def test_fields_do_not_run_together(self):
+        a = dict(entry("Asha"), Name="ab", Email="c")
+        b = dict(entry("Asha"), Name="a", Email="bc")
+        self.assertNotEqual(addressbook.dedupe_key(a), addressbook.dedupe_key(b))
+        self.assertNotEqual(addressbook.dedupe_key(entry("Asha")),
+                            addressbook.dedupe_key(dict(entry("Asha"), Phone="9876543211")))
+
+
+class ImportEntriesTest(ImportTestCase):
+
+    def test_duplicates_and_invalid_rows(self):
+        self.store.add(entry("Asha"))
+        rows = [entry("Bala"), dict(entry("Asha"), Name="asha"), dict(entry("Chitra"), Type="Family"),
+                entry("Bala"), entry("Devi")]
+        stats = addressbook.import_entries(self.store, rows)
+        self.assertEqual((stats.read, stats.imported, stats.duplicates, stats.invalid), (5, 2, 2, 1))
+        self.assertEqual(stats.errors, ["row 3: unknown type 'Family'"])
+        self.assertEqual(self.names(), ["Asha", "Bala", "Devi"])
+
+    def test_batches_and_cancel(self):
+        cancel = threading.Event()
+        seen = []
+
+        def progress(stats):
+            seen.append(stats.imported)
+            cancel.set()
+
+        rows = [entry(f"Name{i}") for i in range(5)]
+        stats = addressbook.import_entries(self.store, rows, batch_size=2, progress=progress, cancel=cancel)
+        self.assertTrue(stats.cancelled)
+        # Stops before the next row; the closing report repeats the count
+        self.assertEqual(seen, [2, 2])
+        self.assertEqual(self.names(), ["Name0", "Name1"])
+
+
+class ImportFileTest(ImportTestCase):
+
+    def test_csv_with_byte_order_mark(self):
+        path = self.write("contacts.csv",
+                          "﻿Name,Phone,Email,Address,City,State,Pincode,Country,Type,Extra\r\n"
+                          "Asha,9876543210,asha@example.com,\"1 Main Road, Kothrud\",Pune,maharashtra,"
+                          "411001,India,Personal,x\r\n")
+        stats = addressbook.import_file(self.store, path)
+        self.assertEqual(stats.imported, 1)
+        row = self.store.addresses()[0]
+        self.assertEqual((row["Address"], row["State"]), ("1 Main Road, Kothrud", "Maharashtra"))
+
+    def test_vcard(self):
+        path = self.write("contacts.vcf",
+                          "BEGIN:VCARD\r\n"
+                          "VERSION:3.0\r\n"
+                          "FN:Asha\r\n"
+                          " Rao\r\n"
+                          "item1.TEL;TYPE=CELL:9876543210\r\n"
+                          "TEL:1111111111\r\n"
+                          "EMAIL:asha@example.com\r\n"
+                          "ADR;TYPE=HOME:;;1 Main Road\\, Kothrud\\nFlat 2;Pune;Maharashtra;411001;\r\n"
+                          "ORG:Rao & Co\r\n"
+                          "END:VCARD\r\n"
+                          "BEGIN:VCARD\r\n"
+                          "FN:No Address\r\n"
+                          "END:VCARD\r\n")
+        entries = list(addressbook.iter_vcard_entries(path))
+        self.assertEqual(entries[0], {"Name": "AshaRao", "Phone": "9876543210", "Email": "asha@example.com",
+                                      "Address": "1 Main Road, Kothrud\nFlat 2", "City": "Pune",
+                                      "State": "Maharashtra", "Pincode": "411001", "Country": "India",
+                                      "Type": "Business"})
+        stats = addressbook.import_file(self.store, path)
+        self.assertEqual((stats.imported, stats.invalid), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
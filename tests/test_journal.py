@@ -0,0 +1,153 @@
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import addressbook  # noqa: E402
+
+
+def entry(name):
+    return {"Name": name, "Phone": "9876543210", "Email": f"{name.lower()}@example.com",
+            "Address": "1 Main Road", "City": "Pune", "State": "Maharashtra", "Pincode": "411001",
+            "Country": "India", "Type": "Personal"}
+
+
+class TornJournalTailTest(unittest.TestCase):
+    """A batch cut short by a crash must not swallow or corrupt later writes."""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="addressbook-test-")
+        self.addCleanup(shutil.rmtree, self.folder, ignore_errors=True)
+        self.journal_file = os.path.join(self.folder, "journal.csv")
+
+    def journal(self):
+        tables = {"address": os.path.join(self.folder, "address_book.csv"),
+                  "recycle": os.path.join(self.folder, "recycle_bin.csv")}
+        journal = addressbook.Journal(self.journal_file, tables, threshold=10 ** 9)
+        self.addCleanup(journal.close)
+        return journal
+
+    def names(self, rows):
+        return [row["Name"] for row in rows]
+
+    def tear(self, tail):
+        with open(self.journal_file, 'a', newline='', encoding='utf-8') as f:
+            f.write(tail)
+
+    TORN = ("address,delete,1,,,,,,,,,\r\n"
+            "recycle,add,1,Asha,9876543210,asha@example.com,1 Main Road,Pune,Maharash")
+
+    def test_append_after_torn_tail(self):
+        store = addressbook.AddressStore(self.journal())
+        store.add(entry("Asha"))
+        self.tear(self.TORN)
+        store.add(entry("Bala"))
+        self.assertEqual(self.names(store.addresses()), ["Asha", "Bala"])
+        reread = addressbook.AddressStore(self.journal())
+        self.assertEqual(self.names(reread.addresses()), ["Asha", "Bala"])
+        self.assertEqual(reread.recycled(), [])
+
+    def test_open_quote_does_not_hide_later_batches(self):
+        store = addressbook.AddressStore(self.journal())
+        store.add(entry("Asha"))
+        self.tear('address,add,,"Chitra')
+        store.add(entry("Bala"))
+        store.add(entry("Devi"))
+        reread = addressbook.AddressStore(self.journal())
+        self.assertEqual(self.names(reread.addresses()), ["Asha", "Bala", "Devi"])
+
+    def test_torn_tail_cut_on_open(self):
+        store = addressbook.AddressStore(self.journal())
+        store.add(entry("Asha"))
+        self.tear(self.TORN)
+        store.backend.close()
+        reopened = addressbook.AddressStore(self.journal())
+        with open(self.journal_file, 'rb') as f:
+            self.assertTrue(f.read().endswith(b"commit\r\n"))
+        reopened.add(entry("Bala"))
+        self.assertEqual(self.names(addressbook.AddressStore(self.journal()).addresses()), ["Asha", "Bala"])
+
+
+class JournalUpgradeTest(unittest.TestCase):
+    """Books from before record ids are numbered once and keep working."""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="addressbook-test-")
+        self.addCleanup(shutil.rmtree, self.folder, ignore_errors=True)
+        self.journal_file = os.path.join(self.folder, "journal.csv")
+        self.tables = {"address": os.path.join(self.folder, "address_book.csv"),
+                       "recycle": os.path.join(self.folder, "recycle_bin.csv")}
+
+    def write(self, path, rows):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows(rows)
+
+    def values(self, name):
+        return [entry(name)[k] for k in addressbook.ADDRESS_FIELDS]
+
+    def store(self):
+        journal = addressbook.Journal(self.journal_file, dict(self.tables), threshold=10 ** 9)
+        self.addCleanup(journal.close)
+        return addressbook.AddressStore(journal)
+
+    def old_book(self):
+        # Plain ADDRESS_FIELDS files, as the app wrote them before ids
+        self.write(self.tables["address"], [addressbook.ADDRESS_FIELDS] +
+                   [self.values(name) for name in ("Asha", "Bala", "Chitra")])
+        self.write(self.tables["recycle"], [addressbook.ADDRESS_FIELDS, self.values("Zoya")])
+
+    def check_upgraded(self, store, addresses, recycled):
+        self.assertEqual([row["Name"] for row in store.addresses()], addresses)
+        self.assertEqual([row["Name"] for row in store.recycled()], recycled)
+        ids = [row.id for row in store.addresses() + store.recycled()]
+        self.assertEqual(len(set(ids)), len(ids))
+        with open(self.tables["address"], newline='', encoding='utf-8') as f:
+            self.assertEqual(next(csv.reader(f)), addressbook.RECORD_FIELDS)
+        # The positional journal was folded into the CSVs
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, newline='', encoding='utf-8') as f:
+                self.assertEqual(next(csv.reader(f), addressbook.Journal.HEADER), addressbook.Journal.HEADER)
+
+    def test_version_2_journal(self):
+        self.old_book()
+        self.write(self.journal_file, [
+            addressbook.Journal.POSITIONAL_HEADER,
+            ["address", "update", "0"] + self.values("Anu"),
+            addressbook.Journal.COMMIT,
+            ["address", "delete", "1"] + [""] * len(addressbook.ADDRESS_FIELDS),
+            ["recycle", "add", ""] + self.values("Bala"),
+            addressbook.Journal.COMMIT,
+            # Torn: never committed
+            ["address", "add", ""] + self.values("Devi"),
+        ])
+        store = self.store()
+        self.check_upgraded(store, ["Anu", "Chitra"], ["Zoya", "Bala"])
+        # Ids given by the upgrade address the same entries after a reload
+        store.delete(store.addresses()[1].id)
+        store.recover(store.recycled()[1].id)
+        reread = self.store()
+        self.assertEqual([row["Name"] for row in reread.addresses()], ["Anu", "Bala"])
+        self.assertEqual([row["Name"] for row in reread.recycled()], ["Zoya", "Chitra"])
+        self.assertEqual([row.id for row in reread.addresses()], [row.id for row in store.addresses()])
+
+    def test_headerless_journal(self):
+        self.old_book()
+        self.write(self.journal_file, [["address", "add", ""] + self.values("Devi"),
+                                       ["address", "delete", "0"] + [""] * len(addressbook.ADDRESS_FIELDS)])
+        self.check_upgraded(self.store(), ["Bala", "Chitra", "Devi"], ["Zoya"])
+
+    def test_files_without_journal(self):
+        self.old_book()
+        store = self.store()
+        self.assertEqual([row.id for row in store.addresses()], [1, 2, 3])
+        self.assertEqual([row.id for row in store.recycled()], [4])
+        self.assertEqual(store.add(entry("Devi")).id, 5)
+        self.assertEqual([row.id for row in self.store().addresses()], [1, 2, 3, 5])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import addressbook  # noqa: E402
+
+# Far below the real costs, so the tests run quickly
+SCRYPT = addressbook.PasswordHasher("scrypt", scrypt_n=16, scrypt_r=8, scrypt_p=1)
+PBKDF2 = addressbook.PasswordHasher("pbkdf2", pbkdf2_iterations=1000)
+
+
+class PasswordHasherTest(unittest.TestCase):
+
+    def test_hash_and_verify(self):
+        for hasher, prefix in ((SCRYPT, "scrypt$16$8$1$"), (PBKDF2, "pbkdf2_sha256$1000$")):
+            stored = hasher.hash("s3cret pass")
+            self.assertTrue(stored.startswith(prefix))
+            self.assertTrue(hasher.verify("s3cret pass", stored))
+            self.assertFalse(hasher.verify("s3cret pasS", stored))
+            self.assertFalse(hasher.needs_rehash(stored))
+
+    def test_salted(self):
+        self.assertNotEqual(SCRYPT.hash("same"), SCRYPT.hash("same"))
+
+    def test_plaintext_verifies_and_needs_rehash(self):
+        self.assertTrue(SCRYPT.verify("legacy", "legacy"))
+        self.assertFalse(SCRYPT.verify("Legacy", "legacy"))
+        self.assertTrue(SCRYPT.needs_rehash("legacy"))
+
+    def test_switching_method_or_cost(self):
+        # Stored hashes carry their own settings, so they still verify
+        stored = SCRYPT.hash("pw")
+        self.assertTrue(PBKDF2.verify("pw", stored))
+        self.assertTrue(PBKDF2.needs_rehash(stored))
+        stored = PBKDF2.hash("pw")
+        self.assertTrue(SCRYPT.verify("pw", stored))
+        self.assertTrue(SCRYPT.needs_rehash(stored))
+        stronger = addressbook.PasswordHasher("pbkdf2", pbkdf2_iterations=2000)
+        self.assertTrue(stronger.verify("pw", stored))
+        self.assertTrue(stronger.needs_rehash(stored))
+
+    def test_corrupt_hashes_fail_verification(self):
+        for stored in ("scrypt$3$8$1$$", "scrypt$1180591620717411303424$8$1$$",
+                       "pbkdf2_sha256$0$$", "pbkdf2_sha256$-5$$"):
+            with self.subTest(stored=stored):
+                self.assertFalse(SCRYPT.verify("pw", stored))
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            addressbook.PasswordHasher("md5")
+
+
+class AuthenticateTest(unittest.TestCase):
+
+    def setUp(self):
+        folder = tempfile.mkdtemp(prefix="addressbook-test-")
+        self.addCleanup(shutil.rmtree, folder, ignore_errors=True)
+        self.user_file = os.path.join(folder, "users.csv")
+        self.users = addressbook.UserIndex(addressbook.UserFile(self.user_file))
+        self.users.add({"Username": "asha", "Email": "asha@example.com", "Mobile": "9876543210",
+                        "Password": "legacy"})
+
+    def stored(self):
+        users = addressbook.UserIndex(addressbook.UserFile(self.user_file))
+        return users.find("asha")["Password"]
+
+    def test_login_rehashes_plaintext(self):
+        user = addressbook.authenticate(self.users, SCRYPT, "asha", "legacy")
+        self.assertEqual(user["Username"], "asha")
+        stored = self.stored()
+        self.assertTrue(stored.startswith("scrypt$16$"))
+        self.assertTrue(addressbook.authenticate(self.users, SCRYPT, "asha", "legacy"))
+        # Only upgraded again when the settings change
+        self.assertEqual(self.stored(), stored)
+        addressbook.authenticate(self.users, PBKDF2, "asha", "legacy")
+        self.assertTrue(self.stored().startswith("pbkdf2_sha256$1000$"))
+
+    def test_failed_login_changes_nothing(self):
+        self.assertIsNone(addressbook.authenticate(self.users, SCRYPT, "asha", "wrong"))
+        self.assertIsNone(addressbook.authenticate(self.users, SCRYPT, "nobody", "legacy"))
+        self.assertEqual(self.stored(), "legacy")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import addressbook  # noqa: E402
+from test_journal import entry  # noqa: E402
+
+
+def names(rows):
+    return [row["Name"] for row in rows]
+
+
+class DataFolderTest(unittest.TestCase):
+    """Runs in a fresh working directory, as the storage paths are relative."""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="addressbook-test-")
+        self.addCleanup(shutil.rmtree, self.folder, ignore_errors=True)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.folder)
+        addressbook.init_data()
+
+    def user(self, users, username):
+        addressbook.UserIndex(users).add({"Username": username, "Email": f"{username}@example.com",
+                                          "Mobile": str(9000000000 + len(username)), "Password": "x"})
+
+
+class CsvToSqliteMigrationTest(DataFolderTest):
+
+    def test_shared_and_per_user_books_are_migrated(self):
+        users, books = addressbook.UserFile(), addressbook.CsvBooks()
+        self.user(users, "Bob")
+        self.user(users, "carol")
+        shared = addressbook.AddressStore(addressbook.Journal())
+        shared.add(entry("Asha"))
+        shared.backend.close()
+        own = addressbook.AddressStore(books.open("Bob"))
+        own.add(entry("Bala"))
+        own.add(entry("Chitra"))
+        own.delete(own.addresses()[0].id)
+        own.backend.close()
+
+        db = addressbook.SqliteBackend()
+        self.addCleanup(db.close)
+        self.assertEqual([u["Username"] for u in db.load_users()], ["Bob", "carol"])
+        self.assertEqual(names(addressbook.AddressStore(db.open(None)).addresses()), ["Asha"])
+        bob = addressbook.AddressStore(db.open("bob"))
+        self.assertEqual(names(bob.addresses()), ["Chitra"])
+        self.assertEqual(names(bob.recycled()), ["Bala"])
+        self.assertIsNotNone(bob.recycled()[0].deleted)
+        self.assertEqual(addressbook.AddressStore(db.open("carol")).addresses(), [])
+        # Ids survive, so a new entry does not take a migrated one's
+        self.assertNotIn(bob.add(entry("Devi")).id, [row.id for row in bob.recycled()])
+
+
+class SchemaUpgradeTest(DataFolderTest):
+    """Databases made before owners, record ids, deletion times and codes."""
+
+    def old_database(self):
+        # The schema of the first SQLite backend, text columns throughout
+        conn = sqlite3.connect(addressbook.DATABASE_FILE)
+        columns = ", ".join(f'"{k}" TEXT NOT NULL DEFAULT \'\'' for k in addressbook.ADDRESS_FIELDS)
+        with conn:
+            conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("INSERT INTO meta VALUES ('migrated', '1')")
+            conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, " +
+                         ", ".join(f'"{k}" TEXT NOT NULL' for k in addressbook.USER_FIELDS) + ")")
+            for sql_table, names in (("addresses", ["Asha", "Bala", "Chitra"]), ("recycle_bin", ["Zoya"])):
+                conn.execute(f"CREATE TABLE {sql_table} (id INTEGER PRIMARY KEY, {columns})")
+                conn.executemany(
+                    f"INSERT INTO {sql_table} VALUES (NULL, " + ", ".join("?" for _ in addressbook.ADDRESS_FIELDS) + ")",
+                    [[entry(name)[k] for k in addressbook.ADDRESS_FIELDS] for name in names])
+            conn.execute('CREATE INDEX addresses_name ON addresses ("Name")')
+            conn.execute("DELETE FROM addresses WHERE \"Name\" = 'Bala'")
+            conn.execute("UPDATE addresses SET \"Type\" = 'Vendor' WHERE \"Name\" = 'Chitra'")
+        conn.close()
+
+    def test_upgrade(self):
+        self.old_database()
+        db = addressbook.SqliteBackend()
+        self.addCleanup(db.close)
+        store = addressbook.AddressStore(db.open(None))
+        self.assertEqual(names(store.addresses()), ["Asha", "Chitra"])
+        self.assertEqual(names(store.recycled()), ["Zoya"])
+        # Book rows take their rowid, bin rows follow the highest of those
+        self.assertEqual([row.id for row in store.addresses()], [1, 3])
+        self.assertEqual([row.id for row in store.recycled()], [4])
+        self.assertIsNotNone(store.recycled()[0].deleted)
+        # Values outside the known lists get codes of their own
+        self.assertEqual([row["Type"] for row in store.addresses()], ["Personal", "Vendor"])
+        self.assertEqual(store.addresses()[0]["State"], "Maharashtra")
+        types = {row[1]: row[2] for row in db.conn.execute("PRAGMA table_info(addresses)")}
+        self.assertEqual(types["State"], "INTEGER")
+        indexes = {row[1] for row in db.conn.execute("PRAGMA index_list(addresses)")}
+        self.assertEqual(indexes, {"addresses_owner", "addresses_record"})
+
+        store.recover(4)
+        self.assertEqual(store.add(entry("Devi")).id, 5)
+        db.close()
+        reopened = addressbook.SqliteBackend()
+        self.addCleanup(reopened.close)
+        store = addressbook.AddressStore(reopened.open(None))
+        self.assertEqual([(row.id, row["Name"]) for row in store.addresses()],
+                         [(1, "Asha"), (3, "Chitra"), (4, "Zoya"), (5, "Devi")])
+
+
+if __name__ == "__main__":
+    unittest.main()